@@ -1,57 +1,29 @@
 from typing import *
+import os
+import sys
+from time import perf_counter
 from SAT_structs import *
+from inprocess import Inprocessor
+try:
+    import resource
+except ImportError:
+    resource = None     # Not available on Windows, memory budgets are ignored there
 
-# Represents a node in the SAT problem tree
-class SAT_node: 
-    def __init__(self, assign: Tuple[int, bool], parents: List['SAT_node']):
+# Peak memory of this process in MB, 0 if it cant be measured
+def peak_memory() -> float:
+    if (resource is None):
+        return 0
+    # ru_maxrss is in bytes on macOS and in KB elsewhere
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
 
-        # Assignment that resulted in a branch to this node
-        self.assign: Tuple[int, bool] = assign
-
-        # Variable that is assigned by left/right children 
-        self.next_var: int = 0
-
-        # List of ancestors/parents
-        if (parents is None): 
-            self.parents: List[SAT_node] = []
-        else:
-            self.parents: List[SAT_node] = parents.copy()
-
-
-        self.isUnsat: bool = False          # True if this all children of this node  (or the node itself) are UNSAT
-        self.unsatClause: CNF_Clause = None   # If the variable assignment at this location resulted in UNSAT, stores clause that resulted in UNSAT
-        
-        # Node children
-        self.choice_true: SAT_node = None
-        self.choice_false: SAT_node = None
-    
-    # Generates an assignment list from the parent list. 
-    # Assignment list is indexed by the var number
-    def assign_list(self, num_vars) -> List[bool]: 
-        assignl = [None] * (num_vars + 1)
-
-        for i in self.parents:
-            if (i is not None and i.assign is not None):
-                assignl[i.assign[0]] = i.assign[1]
-
-        if (self.assign is not None):
-            assignl[self.assign[0]] = self.assign[1]
-
-        return assignl
-    
-    # Stores list of integers that represent a variables assignment.
-    # If a number is negitive, this represents a 0 assignment 
-    def assign_list_condensed(self) -> List[int]:
-        assignl = []
-
-        for i in self.parents:
-            if (i is not None and i.assign is not None):
-                assignl.append(i.assign[0] if i.assign[1] else -i.assign[0])
-
-        if (self.assign is not None):
-            assignl.append(self.assign[0] if self.assign[1] else -self.assign[0])
-
-        return assignl
+# Memory this process uses now (its resident set) in MB, None if the OS doesnt report it. Linux has it in /proc
+def current_memory() -> float:
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
 
 class SAT_solver: 
 
@@ -59,142 +31,602 @@ class SAT_solver:
         self.formula:CNF_Formula = formula
         self.log = log
         self.iter_count = 0
+        self.conflict_cnt = 0
+        self.decision_cnt = 0
+        self.restart_cnt = 0
+        self.propagation_cnt = 0        # Literals assigned by propagation
+        self.learned_cnt = 0
+        self.learned_lits = 0           # Total length of the learned clauses
+        self.learned_lbd = 0            # Total LBD of the learned clauses
+
+        # If profile is set, the time spent in propagation and conflict analysis is measured
+        self.profile = False
+        self.propagate_time = 0.0
+        self.analyze_time = 0.0
+
+        # If set, a DRATWriter that every learned and deleted clause is logged to (see drat.py)
+        self.proof = None
+
+        # If set, the binary implication graph is simplified between restarts (see inprocess.py)
+        self.inprocess = True
+
+        # Budgets of each solve call, see set_budget. None is no limit
+        self.conflict_budget: int = None
+        self.propagation_budget: int = None
+        self.time_budget: float = None      # Seconds
+        self.memory_budget: int = None      # MB of memory the process uses
+        self.memory_peak: float = None      # Peak memory at the start of the current solve call, see memory_used
+        self.conflict_limit: int = None     # Budgets of the current solve call, as counter values
+        self.propagation_limit: int = None
+        self.deadline: float = None
+        self.interrupted = False            # Set by interrupt
+        self.status: str = None             # SAT, UNSAT or UNKNOWN, the answer of the last solve call
+        self.stop_reason: str = None        # Why the last UNKNOWN call stopped: conflicts, propagations, time, memory or interrupt
+
+        # Progress hook, called with a stats snapshot every progress_interval conflicts. See set_progress_hook
+        self.progress_hook: Callable[[Dict[str, Any]], None] = None
+        self.progress_interval = 0
+        self.next_progress = 0
+
+        # Search state, created by the first solve call and kept by later calls
+        self.propagator: CNF_Propagator = None
+        self.learnts: CNF_LearntDB = None
+        self.vsids: VSIDS = None
+        self.inprocessor: Inprocessor = None
+        self.share = None
+        self.ok = True                  # False once the formula is UNSAT without assumptions
+        self.core: List[int] = []       # Failed assumptions of the last solve call that returned UNSAT
+        self.appearances_stale = False  # Clauses were added after the formula counted its appearances
+        self.seed_phases: List[bool] = None     # Phases given to set_phases before the propagator existed
+        self.seed_vars: List[int] = None        # Variables given to prefer_vars before VSIDS existed
         
         # self.isSAT = None
 
     # Solves SAT problem
-    # Returns assignList if SAT, None if unsat
-    def solve(self, useVSIDS = False) -> List[bool]:
+    # restarts is a name from RESTART_POLICIES. If phaseSaving is set, decisions reuse the last value of the variable
+    # decay, defaultPhase and seed configure VSIDS (decay factor, sign of unassigned variables, random initial activities)
+    # share is an optional clause exchange (see portfolio.py) that learned units and binaries are sent to and received from
+    # assumptions are literal codes that are decided first, in order. They only hold for this call
+    # The solver can be called again after add_clause or with other assumptions. Learned clauses, activities and saved phases are kept,
+    # and the counters add up over all calls. VSIDS settings only apply to the first call that uses VSIDS
+    # Returns assignList if SAT, None if unsat. If UNSAT because of the assumptions, self.core has the assumptions that failed
+    # self.status is the answer. It is UNKNOWN, and None is returned, if a budget ran out or the solver was interrupted. Calling solve
+    # again continues the search
+    def solve(self, useVSIDS = False, restarts: str = "glucose", phaseSaving = True, decay: float = 0.95, defaultPhase: bool = False,
+              seed: int = None, share = None, assumptions: Sequence[int] = ()) -> List[bool]:
+        self.core = []
+        self.status = "UNSAT"
+        self.stop_reason = None
+        if (not self.ok):
+            return None
+        self.grow(max((lit >> 1 for lit in assumptions), default=0))
 
-        # Create head
-        head = SAT_node(assign = None, parents = [])
-        curr = head
-        backtracked = False
-        self.iter_count = 0
-        
+        if (self.propagator is None):
+            self.init_search()
+        prop = self.propagator
+        prop.cancel_until(0)
+        prop.save_phases = phaseSaving
+        phase = prop.phase if phaseSaving else None
+        restart_policy = RESTART_POLICIES[restarts]()
+        learnts = self.learnts
+        proof = self.proof
+        learnts.proof = proof
+        inprocessor = self.inprocessor
+        # Assumptions on substituted variables are decided on their representatives
+        assumed = inprocessor.map_lits(assumptions)
+
+        # Once created, the heap is kept up to date even in calls that dont use it
         vsids  = None
         if useVSIDS == True:
-            vsids = VSIDS(self.formula)
+            if (self.vsids is None):
+                self.vsids = VSIDS(self.formula, decay, defaultPhase, seed)
+                prop.order = self.vsids
+                if (self.seed_vars is not None):
+                    self.prefer_vars(self.seed_vars)
+                    self.seed_vars = None
+                for var_idx in inprocessor.substituted:
+                    self.vsids.remove(var_idx)
+            vsids = self.vsids
+        self.share = share
+        log = self.log
+        profile = self.profile
+
+        # Budgets count from the start of this call
+        self.conflict_limit = None if self.conflict_budget is None else self.conflict_cnt + self.conflict_budget
+        self.propagation_limit = None if self.propagation_budget is None else self.propagation_cnt + self.propagation_budget
+        self.deadline = None if self.time_budget is None else perf_counter() + self.time_budget
+        self.memory_peak = None if self.memory_budget is None else peak_memory()
+        budgeted = (self.conflict_limit is not None or self.propagation_limit is not None or self.deadline is not None
+                    or self.memory_budget is not None)
+
+        # Propagate unit clauses before any branching
+        if (prop.assign_units() is not None):
+            self.ok = False
+            if (proof is not None):
+                proof.add([])
+            return None
 
         while (True):
             self.iter_count += 1
+            if (self.interrupted):
+                self.interrupted = False
+                return self.stop("interrupt")
 
-            assigns = curr.assign_list(self.formula.num_vars)
-            sat, curr.unsatClause = self.formula.eval(assigns, backtracked)
-
-            backtracked = False
-
-            if (self.log):
-                print(f"var: {curr.next_var}, sat: {sat}, assigns: {curr.assign_list_condensed()}")
-
-            # If formula is SAT, return assigns to indicate 
-            if (sat == CNF_IsSAT.SAT):
-                return assigns
-            
-            # If unresolved, choose new branch to explore
-            elif (sat == CNF_IsSAT.UNRESOLVED):
-                # If next var hasnt been choosen for this node, choose a next var
-                if (curr.next_var == 0): 
-                    choice = SAT_solver.decider_iter.choice(self.formula, assigns, vsids)
-                    if (choice[0] != 0):
-                        curr.next_var = choice[0]
-                    else: 
-                        print("ERROR: Assigned all literals but still unresolved?")
-                        exit(1)
-
-                    # choose pos or neg branch
-                    if (choice[1]):
-                        if (self.log):
-                            print(f"First branch {curr.next_var}")
-                        curr.choice_true = SAT_node(choice, parents=curr.parents + [curr])
-                        curr = curr.choice_true
-                    else:
-                        if (self.log):
-                            print(f"First branch -{curr.next_var}")
-                        curr.choice_false = SAT_node(choice, parents=curr.parents + [curr])
-                        curr = curr.choice_false
-
-                # Since one path was expored already, try the other path
-                elif(curr.choice_true is None):
-                    if (self.log):
-                        print(f"Exploring unexplored {curr.next_var}")
-                    curr.choice_true = SAT_node((curr.next_var, True), parents=curr.parents + [curr])
-                    curr = curr.choice_true
-                elif(curr.choice_false is None):
-                    if (self.log):
-                        print(f"Exploring unexplored -{curr.next_var}")
-                    curr.choice_false = SAT_node((curr.next_var, False), parents=curr.parents + [curr])
-                    curr = curr.choice_false
-
-                # Since both paths were explored, find path that is only partially explored
-                elif (not curr.choice_true.isUnsat):
-                    if (self.log):
-                        print(f"Exploring partially explored {curr.next_var}")
-                    curr = curr.choice_true
-                elif (not curr.choice_false.isUnsat):
-                    if (self.log):
-                        print(f"Exploring partially explored -{curr.next_var}")
-                    curr = curr.choice_false
-
-                # All branches fully explored, backtrack one step
-                else: 
-                    if (self.log):
-                        print("All branches explored, attempting backtrack")
-                    curr.isUnsat = True
-                    if (len(curr.parents) != 0):
-                        # Generate conflict clause if possible
-                        if (curr.choice_true.unsatClause is not None and curr.choice_false.unsatClause is not None):
-                            new_clause = self.formula.add_conflict_clause(curr.choice_true.unsatClause, curr.choice_false.unsatClause, curr.next_var)
-                            if useVSIDS == True:
-                                vsids.update_activity_factors(new_clause)
-                                vsids.increase_bump_amount()
-                            #print(f"Adding f{new_clause}")
-
-                        curr = curr.parents[-1]
-                        backtracked = True
-                    else: # We are at the head, so formula is UNSAT
+            trail_size = len(prop.trail)
+            if (profile):
+                start_time = perf_counter()
+                conflict = prop.propagate()
+                self.propagate_time += perf_counter() - start_time
+            else:
+                conflict = prop.propagate()
+            self.propagation_cnt += len(prop.trail) - trail_size
+
+            if (log):
+                print(f"level: {prop.decision_level()}, sat: {'UNSAT' if conflict else 'UNRESOLVED'}, assigns: {len(prop.trail)}")
+
+            # Choose new branch to explore
+            if (conflict is None):
+                # Restart search from the top level. Learned clauses, activities and saved phases are kept
+                if (restart_policy.should_restart()):
+                    if (log):
+                        print(f"Restarting after {self.conflict_cnt} conflicts")
+                    restart_policy.on_restart()
+                    self.restart_cnt += 1
+                    prop.cancel_until(0)
+
+                    if (self.inprocess and self.conflict_cnt >= inprocessor.next_round):
+                        if (not inprocessor.run()):
+                            self.ok = False
+                            if (proof is not None):
+                                proof.add([])
+                            return None
+                        assumed = inprocessor.map_lits(assumptions)
+
+                # Clauses from other solvers are added at the top level, and propagated before branching
+                if (share is not None and prop.decision_level() == 0):
+                    trail_size = len(prop.trail)
+                    if (not self.import_shared()):
+                        self.ok = False
+                        if (proof is not None):
+                            proof.add([])
+                        return None
+                    if (len(prop.trail) > trail_size):
+                        continue
+
+                # Assumptions are decided first, one per decision level
+                next_lit = -1
+                while (prop.decision_level() < len(assumed)):
+                    lit = assumed[prop.decision_level()]
+                    if (prop.value[lit] == L_TRUE):
+                        prop.new_level()
+                    elif (prop.value[lit] == L_FALSE):
+                        # Inprocessing can substitute several assumptions by the same literal, and each of them is in the core then
+                        origin: Dict[int, List[int]] = {}
+                        for assumed_lit, assumption in zip(assumed, assumptions):
+                            origin.setdefault(assumed_lit, []).append(assumption)
+                        self.core = [assumption for core_lit in self.analyze_final(lit) for assumption in origin[core_lit]]
+                        if (log):
+                            print(f"Assumptions failed: {self.core}")
                         return None
+                    else:
+                        next_lit = lit
+                        break
+
+                if (next_lit == -1):
+                    choice = SAT_solver.decider_iter.choice(self.formula, prop.value, vsids, phase)
+
+                    # No unassigned literal in an unresolved clause, so formula is SAT
+                    if (choice[0] == 0):
+                        model = prop.model()
+                        inprocessor.extend_model(model)
+                        self.status = "SAT"
+                        return model
+                    next_lit = 2 * choice[0] + choice[1]
+
+                if (log):
+                    print(f"Branch {next_lit >> 1 if next_lit & 1 else -(next_lit >> 1)}")
+                self.decision_cnt += 1
+                prop.decide(next_lit)
+                continue
+
+            # Conflict without any decisions, so formula is UNSAT
+            if (prop.decision_level() == 0):
+                self.ok = False
+                if (proof is not None):
+                    proof.add([])
+                return None
 
-                
-            # If UNSAT, backtrack
+            # Learn clause from conflict, and backjump to the level where it becomes unit 
+            self.conflict_cnt += 1
+            if (profile):
+                start_time = perf_counter()
+                learnt, backjump_level = self.analyze(conflict)
+                self.analyze_time += perf_counter() - start_time
             else:
-                curr.isUnsat = True
-                curr = curr.parents[-1]
-                backtracked = True
-                if (self.log):
-                    print("Backtracking due to UNSAT")
+                learnt, backjump_level = self.analyze(conflict)
+            lbd = prop.lbd(learnt)
+            if (proof is not None):
+                proof.add(learnt)
+            self.learned_cnt += 1
+            self.learned_lits += len(learnt)
+            self.learned_lbd += lbd
+            if (log):
+                print(f"Backjumping from level {prop.decision_level()} to {backjump_level}, learned {len(learnt)} literals, lbd {lbd}")
+            restart_policy.on_conflict(lbd, len(prop.trail))
+            prop.cancel_until(backjump_level)
+
+            if (self.vsids is not None):
+                self.vsids.increase_bump_amount()
+            learnts.decay()
+
+            # Unit clauses hold at the top level, so they dont need to be in the learned clause database
+            if (len(learnt) == 1):
+                new_clause = self.formula.add_clause(learnt, learnt=True)
+                prop.units.append(new_clause)
+            else:
+                new_clause = learnts.add(learnt, lbd)
+                prop.attach(new_clause)
+            prop.assign(learnt[0], new_clause)
+            if (share is not None and len(learnt) <= 2):
+                share.send(learnt)
+
+            # Periodically delete learned clauses that are no longer useful
+            if (self.conflict_cnt >= learnts.next_reduce):
+                deleted = learnts.reduce(prop)
+                if (log):
+                    print(f"Reduced learned clauses, deleted {len(deleted)}, kept {len(learnts)}")
+
+            if (self.progress_hook is not None and self.conflict_cnt >= self.next_progress):
+                self.next_progress = self.conflict_cnt + self.progress_interval
+                self.progress_hook(self.stats())
+
+            if (budgeted):
+                reason = self.exhausted_budget()
+                if (reason is not None):
+                    return self.stop(reason)
+
+    # Creates the search state. Learned clauses that are in the formula are dropped
+    def init_search(self):
+        if (self.appearances_stale):
+            self.formula.count_appearances()
+            self.appearances_stale = False
+        self.formula.remove_learnts()
+        self.propagator = CNF_Propagator(self.formula)
+        self.learnts = CNF_LearntDB(self.formula)
+        self.seen = bytearray(self.formula.num_vars + 1)  # Marks variables during conflict analysis
+        self.inprocessor = Inprocessor(self)
+        if (self.seed_phases is not None):
+            self.set_phases(self.seed_phases)
+            self.seed_phases = None
+
+    # Ends a solve call without an answer. The trail is kept until the next call backtracks it
+    def stop(self, reason: str) -> List[bool]:
+        self.status = "UNKNOWN"
+        self.stop_reason = reason
+        if (self.log):
+            print(f"Stopped after {self.conflict_cnt} conflicts: {reason}")
+        return None
+
+    # Name of the budget of the current solve call that ran out, or None. Checked after every conflict
+    def exhausted_budget(self) -> str:
+        if (self.conflict_limit is not None and self.conflict_cnt >= self.conflict_limit):
+            return "conflicts"
+        if (self.propagation_limit is not None and self.propagation_cnt >= self.propagation_limit):
+            return "propagations"
+        if (self.deadline is not None and perf_counter() >= self.deadline):
+            return "time"
+        if (self.memory_budget is not None and self.memory_used() >= self.memory_budget):
+            return "memory"
+        return None
+
+    # MB of memory the process uses now. Where only the peak can be measured, it counts once it grew during this solve call,
+    # since a peak reached before the call says nothing about the memory in use now
+    def memory_used(self) -> float:
+        used = current_memory()
+        if (used is not None):
+            return used
+        peak = peak_memory()
+        return peak if peak > self.memory_peak else 0
+
+    # Limits every later solve call to a number of conflicts, propagated literals and seconds counted from the start of each call,
+    # and to MB of memory in use by the process. None is no limit. A call that runs out of budget returns None with status UNKNOWN
+    def set_budget(self, conflicts: int = None, propagations: int = None, seconds: float = None, memory: int = None):
+        self.conflict_budget = conflicts
+        self.propagation_budget = propagations
+        self.time_budget = seconds
+        self.memory_budget = memory
+
+    # Makes the running solve call return with status UNKNOWN at its next step, or the next call if none is running.
+    # Only sets a flag, so it can be called from another thread or a signal handler
+    def interrupt(self):
+        self.interrupted = True
+
+    # Counters and timers of all solve calls so far
+    def stats(self) -> Dict[str, Any]:
+        stats = {
+            "iterations": self.iter_count,
+            "decisions": self.decision_cnt,
+            "propagations": self.propagation_cnt,
+            "conflicts": self.conflict_cnt,
+            "restarts": self.restart_cnt,
+            "learned": self.learned_cnt,
+            "deleted": self.learnts.deleted_cnt if self.learnts is not None else 0,
+            "avg_learned_len": self.learned_lits / self.learned_cnt if self.learned_cnt else 0.0,
+            "avg_lbd": self.learned_lbd / self.learned_cnt if self.learned_cnt else 0.0,
+            "propagate_time": self.propagate_time,
+            "analyze_time": self.analyze_time,
+        }
+        if (self.inprocessor is not None):
+            stats.update(self.inprocessor.stats())
+        return stats
+
+    # Calls hook with a stats snapshot every interval conflicts while solving. None removes the hook
+    def set_progress_hook(self, hook: Callable[[Dict[str, Any]], None], interval: int = 1000):
+        self.progress_hook = hook
+        self.progress_interval = interval
+        self.next_progress = self.conflict_cnt + interval
+
+    # Sets the saved phase of variables from phases, an assignment list indexed by var number (None leaves a variable alone)
+    # Decisions then start from this assignment, e.g. the best one local search found (see sls.py). Has no effect without phase saving
+    def set_phases(self, phases: Sequence[bool]):
+        if (self.propagator is None):
+            self.seed_phases = phases
+            return
+        saved = self.propagator.phase
+        for var_idx in range(1, min(len(phases), len(saved))):
+            if (phases[var_idx] is not None):
+                saved[var_idx] = L_TRUE if phases[var_idx] else L_FALSE
+
+    # Bumps the VSIDS activity of variables once, so they are decided before the others until conflicts bump other variables,
+    # e.g. the primary inputs of a circuit (see circuit.py). Has no effect without VSIDS
+    def prefer_vars(self, var_idxs: Iterable[int]):
+        if (self.vsids is None):
+            self.seed_vars = list(var_idxs)
+            return
+        for var_idx in var_idxs:
+            if (var_idx < len(self.vsids.activity)):
+                self.vsids.bump(var_idx)
+
+    # Adds a clause between solve calls, given as literal codes. Variables larger than num_vars are added to the formula
+    # A clause can be retracted later if it is added with the negation of a new variable (see new_var), and that variable is assumed
+    # in the solve calls that need the clause
+    # Returns False if the formula is UNSAT
+    def add_clause(self, lits: Iterable[int]) -> bool:
+        lits = list(dict.fromkeys(lits))
+        self.grow(max((lit >> 1 for lit in lits), default=0))
+        prop = self.propagator
+        if (prop is None):
+            self.formula.add_clause(lits)
+            self.appearances_stale = True
+            return True
+        if (not self.ok):
+            return False
+
+        # Top level assignments are permanent, so satisfied clauses are skipped and false literals are dropped
+        # Substituted variables are replaced by their representative, since they are in no clause
+        prop.cancel_until(0)
+        lits = list(dict.fromkeys(self.inprocessor.map_lits(lits)))
+        if (any(prop.value[lit] == L_TRUE or lit ^ 1 in lits for lit in lits)):
+            return True
+        lits = [lit for lit in lits if prop.value[lit] == L_UNDEF]
+        if (not lits):
+            self.ok = False
+            if (self.proof is not None):
+                self.proof.add([])
+            return False
+
+        cref = self.formula.add_clause(lits)
+        prop.attach(cref)
+        if (len(lits) == 1):
+            prop.assign(lits[0], cref)
+        if (self.vsids is not None):
+            for lit in lits:
+                self.vsids.insert(lit >> 1)
+        return True
+
+    # Adds a variable to the formula. Returns its var number
+    def new_var(self) -> int:
+        var_idx = self.formula.num_vars + 1
+        self.grow(var_idx)
+        return var_idx
+
+    # Makes room for variables up to num_vars
+    def grow(self, num_vars: int):
+        if (num_vars > self.formula.num_vars):
+            self.formula.num_vars = num_vars
+            self.appearances_stale = True
+        if (self.propagator is not None and num_vars > self.propagator.num_vars):
+            self.propagator.grow(num_vars)
+            self.seen.extend(bytes(num_vars + 1 - len(self.seen)))
+            if (self.vsids is not None):
+                self.vsids.grow(num_vars)
+
+    # Adds the unit and binary clauses other solvers sent through self.share. Must be called at decision level 0
+    # Literals that are false at the top level are dropped, and clauses that are already satisfied are skipped
+    # Substituted variables are replaced by their representative, since the clauses may come from a solver that didnt substitute them
+    # Returns False if an imported clause is false, so the formula is UNSAT
+    def import_shared(self) -> bool:
+        prop = self.propagator
+        for lits in self.share.receive():
+            lits = list(dict.fromkeys(self.inprocessor.map_lits(lits)))
+            if (any(prop.value[lit] == L_TRUE or lit ^ 1 in lits for lit in lits)):
+                continue
+            lits = [lit for lit in lits if prop.value[lit] == L_UNDEF]
+            if (not lits):
+                return False
+
+            if (len(lits) == 1):
+                cref = self.formula.add_clause(lits, learnt=True)
+                prop.units.append(cref)
+                prop.assign(lits[0], cref)
+            else:
+                cref = self.learnts.add(lits, len(lits))
+                prop.attach(cref)
+        return True
+
+    # Finds the assumptions that made the assumption lit false, by following the reasons of its negation back to the decisions
+    # Every decision is an assumption, since assumptions are decided before anything else
+    # Returns lit and the earlier assumptions that imply its negation
+    def analyze_final(self, lit: int) -> List[int]:
+        prop = self.propagator
+        core = [lit]
+        if (prop.decision_level() == 0):
+            return core
+
+        seen = self.seen
+        trail = prop.trail
+        seen[lit >> 1] = True
+        for i in range(len(trail) - 1, prop.trail_lim[0] - 1, -1):
+            var_idx = trail[i] >> 1
+            if (not seen[var_idx]):
+                continue
+            if (prop.reason[var_idx] == -1):
+                core.append(trail[i])
+            else:
+                for other in self.formula.clause_lits(prop.reason[var_idx]):
+                    if (prop.level[other >> 1] > 0):
+                        seen[other >> 1] = True
+            seen[var_idx] = False
+        seen[lit >> 1] = False
+        return core
+
+    # Finds first unique implication point (1-UIP) of the conflict by resolving it with the reasons of the current level assignments 
+    # Returns the minimized learned clause and level to backjump to. 
+    # Learned clause has the asserting literal first, then the literal from the backjump level
+    def analyze(self, conflict: int) -> Tuple[List[int], int]:
+        prop = self.propagator
+        trail = prop.trail
+        level = prop.level
+        reason = prop.reason
+        seen = self.seen
+        formula = self.formula
+        vsids = self.vsids
+        curr_level = prop.decision_level()
+
+        learnt: List[int] = [0]     # Position 0 is filled with the asserting literal
+        path_cnt = 0                # Number of marked current level literals that havent been resolved
+        p = -1
+        index = len(trail) - 1
+        cref = conflict
+
+        while (True):
+            lits = formula.clause_lits(cref)
+            if (formula.clause_flags[cref] & CLAUSE_LEARNT and len(lits) > 2):
+                self.learnts.bump(cref, prop.lbd(lits))
+
+            for lit in lits:
+                var_idx = lit >> 1
+                if (var_idx == p >> 1 or seen[var_idx] or level[var_idx] == 0):
+                    continue
+
+                seen[var_idx] = True
+                if (vsids is not None):
+                    vsids.bump(var_idx)
+                if (level[var_idx] >= curr_level):
+                    path_cnt += 1
+                else:
+                    learnt.append(lit)
+
+            # Select next marked literal on the trail to resolve with its reason
+            while (not seen[trail[index] >> 1]):
+                index -= 1
+            p = trail[index]
+            index -= 1
+            cref = reason[p >> 1]
+            seen[p >> 1] = False
+            path_cnt -= 1
+
+            if (path_cnt == 0):
+                break
+
+        learnt[0] = p ^ 1
+
+        # Recursive minimization: remove literals implied by the other literals in the clause
+        to_clear = learnt.copy()
+        abstract_levels = 0
+        for lit in learnt[1:]:
+            abstract_levels |= 1 << (level[lit >> 1] & 31)
+
+        kept = [learnt[0]]
+        for lit in learnt[1:]:
+            if (reason[lit >> 1] == -1 or not self.lit_redundant(lit, abstract_levels, to_clear)):
+                kept.append(lit)
+        learnt = kept
+
+        for lit in to_clear:
+            seen[lit >> 1] = False
+
+        # Find backjump level, and move its literal to the second watch
+        backjump_level = 0
+        if (len(learnt) > 1):
+            max_i = 1
+            for i in range(2, len(learnt)):
+                if (level[learnt[i] >> 1] > level[learnt[max_i] >> 1]):
+                    max_i = i
+            learnt[1], learnt[max_i] = learnt[max_i], learnt[1]
+            backjump_level = level[learnt[1] >> 1]
+
+        return (learnt, backjump_level)
+
+    # Checks if literal is implied by the marked literals of the learned clause, by following reasons depth first.
+    # abstract_levels is a bit mask of the clause levels, used to fail early.
+    # Literals marked during a failed check are unmarked again
+    def lit_redundant(self, lit: int, abstract_levels: int, to_clear: List[int]) -> bool:
+        level = self.propagator.level
+        reason = self.propagator.reason
+        clause_lits = self.formula.clause_lits
+        seen = self.seen
+
+        stack = [lit]
+        top = len(to_clear)
+        while (stack):
+            var_idx = stack.pop() >> 1
+            for q in clause_lits(reason[var_idx]):
+                q_var = q >> 1
+                if (q_var == var_idx or seen[q_var] or level[q_var] == 0):
+                    continue
+
+                if (reason[q_var] != -1 and (1 << (level[q_var] & 31)) & abstract_levels):
+                    seen[q_var] = True
+                    stack.append(q)
+                    to_clear.append(q)
+                else:
+                    for cleared in to_clear[top:]:
+                        seen[cleared >> 1] = False
+                    del to_clear[top:]
+                    return False
+        return True
 
     # Simple variable decider
     class decider_iter:
 
         @staticmethod
-        def choice(formula: CNF_Formula, assigns: List[bool], vsids:VSIDS = None) -> Tuple[int, bool]:
+        def choice(formula: CNF_Formula, value: bytearray, vsids:VSIDS = None, phase: bytearray = None) -> Tuple[int, bool]:
 
             if vsids is not None:
-                for factor in vsids.get_activity_factors():
-                    var_idx = factor[0][0]
-                    var_sign = factor[0][1]
-                    if (assigns[var_idx] is None):
-                        for clause in formula.clauses:
-                            if clause.sat == CNF_IsSAT.SAT:
-                                continue
-                            for lit in clause.literals:
-                                if lit.var_idx == var_idx and var_sign == lit.sign:
-    #                                print(f"try:{var_idx} {var_sign}")
-                                    return (var_idx, var_sign)
-                                else:
-                                    pass
-    #                                print(f"not in clause:{clause}")
+                choice = vsids.pick(value)
+                # Use saved phase if the variable was assigned before
+                if (phase is not None and choice[0] != 0 and phase[choice[0]] != L_UNDEF):
+                    return (choice[0], phase[choice[0]] == L_TRUE)
+                return choice
             else:
-                # Find unresolved clause
-                for i, clause in enumerate(formula.clauses):
-                    if clause.sat == CNF_IsSAT.SAT:
-                        continue
-
-                    # Find unassigned literal in clause
-                    for j, lit in enumerate(clause.literals):
-                        if (assigns[lit.var_idx] is None):
-    #                        print(f"try:{lit.var_idx} {lit.sign}")
-                            return (lit.var_idx, lit.sign)
+                lits = formula.lits
+                # Find unresolved clause. Clause satisfiability isnt tracked during propagation, so evaluate it here
+                for cref in formula.crefs_by_size():
+                    start = formula.clause_start[cref]
+                    end = start + formula.clause_size[cref]
+                    unassigned = -1
+                    for k in range(start, end):
+                        if (value[lits[k]] == L_TRUE):
+                            break
+                        # Find unassigned literal in clause
+                        if (unassigned == -1 and value[lits[k]] == L_UNDEF):
+                            unassigned = lits[k]
+                    else:
+                        if (unassigned != -1):
+    #                        print(f"try:{unassigned >> 1} {unassigned & 1}")
+                            if (phase is not None and phase[unassigned >> 1] != L_UNDEF):
+                                return (unassigned >> 1, phase[unassigned >> 1] == L_TRUE)
+                            return (unassigned >> 1, (unassigned & 1) == 1)
             # Couldnt find unassigned literal
             return (0, None)
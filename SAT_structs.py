@@ -1,6 +1,8 @@
 from typing import *
 from enum import Enum
-import bisect
+from array import array
+import random
+from dimacs import read_dimacs, clause_set_hash
 # import typing
 
 class CNF_IsSAT(Enum):
@@ -8,18 +10,41 @@ class CNF_IsSAT(Enum):
     SAT = 1
     UNRESOLVED = 2
 
+# Literals are stored as integer codes: 2*var_idx + sign, so the negation of a literal is lit ^ 1
+# Values of assigned literals are stored per literal code in a bytearray
+L_FALSE = 0
+L_TRUE = 1
+L_UNDEF = 2
+
+# Clause header flags
+CLAUSE_LEARNT = 1
+CLAUSE_DELETED = 2
+
 class CNF_Literal:
+    __slots__ = ("var_idx", "sign")
+
     def __init__(self, var_idx: int, sign: bool):
         self.var_idx: int = var_idx  # Variable index
         self.sign: bool = sign       # If false, variable is inverted
 
+    # Integer code of the literal
+    def code(self) -> int:
+        return 2 * self.var_idx + self.sign
+
+    @staticmethod
+    def from_code(lit: int) -> 'CNF_Literal':
+        return CNF_Literal(lit >> 1, (lit & 1) == 1)
+
     def __str__(self):
         if (self.sign):
             return f"x{self.var_idx}"
         else:
             return f"x{self.var_idx}\'"
 
+# Clause object used by the API. CNF_Formula stores clauses as literal codes in a flat arena, and creates these when asked
 class CNF_Clause: 
+    __slots__ = ("literals", "sat", "isConflict")
+
     def __init__(self, literals: List[CNF_Literal], isConflict = False):
         self.literals: List[CNF_Literal] = literals    # List of literals
         self.literals.sort(key=lambda x: x.var_idx)
@@ -29,6 +54,14 @@ class CNF_Clause:
         self.sat: CNF_IsSAT = CNF_IsSAT.UNRESOLVED
         self.isConflict = isConflict
 
+    # Literal codes of the clause
+    def to_lits(self) -> List[int]:
+        return [lit.code() for lit in self.literals]
+
+    @staticmethod
+    def from_lits(lits: Iterable[int], isConflict = False) -> 'CNF_Clause':
+        return CNF_Clause([CNF_Literal.from_code(lit) for lit in lits], isConflict)
+
     # Given var assignment, determine if clause is SAT, UNSAT, or Unresolved
     # Sets and returns satisfiability 
     def eval(self, assigns: List[bool]) -> CNF_IsSAT: 
@@ -54,52 +87,179 @@ class CNF_Clause:
         return f"({' + '.join(map(str, self.literals))})"
 
 
+# Stores every clause as literal codes packed one after another in a single array('i') arena. 
+# A clause is referred to by its index in the header arrays (cref), which give the start and size of the clause in the arena.
+# Learned clauses are stored in the same arena with the CLAUSE_LEARNT flag.
 class CNF_Formula:
-    def __init__(self, clauses: List[CNF_Clause], num_vars: int = 0):
-        self.clauses: List[CNF_Clause] = clauses  # List of clauses
-        self.clauses.sort(key=lambda x: len(x.literals))
-
-        self.max_conflict_size = len(self.clauses[-1].literals) ** 2
-
-        # Set num vars
-        if (num_vars == 0):
-            for clause in clauses:
-                for literal in clause.literals:
-                    if literal.var_idx > num_vars:
-                        self.num_vars = literal.var_idx
+    def __init__(self, clauses: List[CNF_Clause] = None, num_vars: int = 0):
+        self.num_vars = num_vars
+
+        self.lits = array('i')              # Clause arena
+        self.clause_start = array('i')      # Arena index of the first literal, indexed by cref
+        self.clause_size = array('i')       # Number of literals, indexed by cref
+        self.clause_flags = bytearray()     # CLAUSE_LEARNT and CLAUSE_DELETED bits, indexed by cref
+
+        self.wasted = 0                     # Arena entries that belong to deleted clauses
+        self.free_crefs: List[int] = []     # Deleted crefs that can be reused
+        self.pending_free: List[int] = []   # Deleted crefs that may still be in watch lists, freed by collect_garbage
+        self.size_order: List[int] = None   # Cached formula crefs sorted by size, see crefs_by_size
+        self.fingerprint: str = None        # Hash of the clause set, set by from_dimacs_file on request
+
+        # Shorter clauses first
+        if (clauses is not None):
+            for clause in sorted(clauses, key=lambda x: len(x.literals)):
+                self.add_clause(clause.to_lits())
+
+        self.count_appearances()
+
+    # Adds clause given as literal codes. Returns its cref
+    def add_clause(self, lits: Iterable[int], learnt: bool = False) -> int:
+        start = len(self.lits)
+        self.lits.extend(lits)
+        size = len(self.lits) - start
+
+        for k in range(start, start + size):
+            if (self.lits[k] >> 1 > self.num_vars):
+                self.num_vars = self.lits[k] >> 1
+
+        if (self.free_crefs):
+            cref = self.free_crefs.pop()
+            self.clause_start[cref] = start
+            self.clause_size[cref] = size
+            self.clause_flags[cref] = CLAUSE_LEARNT if learnt else 0
         else:
-            self.num_vars = num_vars
-
-        # Initialize appearance lists
-        self.appears_pos = [False] * (self.num_vars + 1)
-        self.appears_neg = [False] * (self.num_vars + 1)
-        self.appearance_cnt = [0] * (self.num_vars + 1)
-
-        # Note if variable appears in positive or negative form
-        for clause in clauses:
-            for literal in clause.literals:
-                self.appearance_cnt[literal.var_idx] += 1
+            cref = len(self.clause_start)
+            self.clause_start.append(start)
+            self.clause_size.append(size)
+            self.clause_flags.append(CLAUSE_LEARNT if learnt else 0)
+
+        if (not learnt):
+            self.size_order = None
+        return cref
+
+    # Adds many clauses at once, given their literal codes packed one after another and the size of each clause
+    def add_clauses(self, lits: array, sizes: array):
+        start = len(self.lits)
+        for size in sizes:
+            self.clause_start.append(start)
+            start += size
+        self.clause_size.extend(sizes)
+        self.clause_flags.extend(bytes(len(sizes)))
+        self.lits.extend(lits)
+
+        if (len(lits) > 0 and max(lits) >> 1 > self.num_vars):
+            self.num_vars = max(lits) >> 1
+        self.size_order = None
+
+    # Marks clause as deleted. Its cref is reused after collect_garbage, once it was removed from the watch lists
+    def delete_clause(self, cref: int):
+        if (not self.clause_flags[cref] & CLAUSE_LEARNT):
+            self.size_order = None
+        self.clause_flags[cref] |= CLAUSE_DELETED
+        self.wasted += self.clause_size[cref]
+        self.pending_free.append(cref)
+
+    # Frees deleted crefs, and compacts the arena if more than half of it belongs to deleted clauses
+    def collect_garbage(self):
+        self.free_crefs.extend(self.pending_free)
+        self.pending_free = []
+
+        if (self.wasted * 2 <= len(self.lits)):
+            return
+
+        old = self.lits
+        self.lits = array('i')
+        live = [cref for cref in range(len(self.clause_start)) if not self.clause_flags[cref] & CLAUSE_DELETED]
+        live.sort(key=lambda cref: self.clause_start[cref])
+        for cref in live:
+            start = self.clause_start[cref]
+            self.clause_start[cref] = len(self.lits)
+            self.lits.extend(old[start:start + self.clause_size[cref]])
+        self.wasted = 0
+
+    # Deletes every learned clause
+    def remove_learnts(self):
+        for cref in range(len(self.clause_start)):
+            if (self.clause_flags[cref] == CLAUSE_LEARNT):
+                self.delete_clause(cref)
+        self.collect_garbage()
+
+    # Literal codes of a clause
+    def clause_lits(self, cref: int) -> array:
+        start = self.clause_start[cref]
+        return self.lits[start:start + self.clause_size[cref]]
+
+    # Clause object of a cref
+    def clause(self, cref: int) -> CNF_Clause:
+        return CNF_Clause.from_lits(self.clause_lits(cref), (self.clause_flags[cref] & CLAUSE_LEARNT) != 0)
+
+    # crefs of the formula clauses, which excludes learned and deleted clauses
+    def crefs(self) -> Iterator[int]:
+        flags = self.clause_flags
+        return (cref for cref in range(len(flags)) if flags[cref] == 0)
+
+    # crefs of the formula clauses, shorter clauses first
+    def crefs_by_size(self) -> List[int]:
+        if (self.size_order is None):
+            self.size_order = sorted(self.crefs(), key=lambda cref: self.clause_size[cref])
+        return self.size_order
+
+    # List of formula clauses, shorter clauses first
+    @property
+    def clauses(self) -> List[CNF_Clause]:
+        return [self.clause(cref) for cref in self.crefs_by_size()]
+
+    # New formula with the formula clauses of this one, without learned and deleted clauses
+    def copy(self) -> 'CNF_Formula':
+        lits = array('i')
+        sizes = array('i')
+        for cref in self.crefs():
+            lits.extend(self.clause_lits(cref))
+            sizes.append(self.clause_size[cref])
+        formula = CNF_Formula(num_vars=self.num_vars)
+        formula.add_clauses(lits, sizes)
+        formula.num_vars = self.num_vars
+        formula.count_appearances()
+        return formula
+
+    # Counts how often each variable appears, and if it appears in positive or negative form
+    def count_appearances(self):
+        # Count literal codes. If the arena only has formula clauses it is counted in one go, otherwise one clause at a time
+        lit_cnt = [0] * (2 * self.num_vars + 2)
+        if (self.wasted == 0 and not any(self.clause_flags)):
+            for lit in self.lits:
+                lit_cnt[lit] += 1
+        else:
+            for cref in self.crefs():
+                for lit in self.clause_lits(cref):
+                    lit_cnt[lit] += 1
 
-                if literal.sign:
-                    self.appears_pos[literal.var_idx] = True
-                else:
-                    self.appears_neg[literal.var_idx] = True
+        # Initialize appearance lists, noting if variable appears in positive or negative form
+        self.appears_pos = [cnt > 0 for cnt in lit_cnt[1::2]]
+        self.appears_neg = [cnt > 0 for cnt in lit_cnt[0::2]]
+        self.appearance_cnt = [pos + neg for pos, neg in zip(lit_cnt[1::2], lit_cnt[0::2])]
 
     # Given assignment list, determine if clause is SAT, UNSAT, or Unresolved
-    def eval(self, assigns: List[bool], deep: bool = False) -> Tuple[CNF_IsSAT, int]:
+    def eval(self, assigns: List[bool], deep: bool = False) -> Tuple[CNF_IsSAT, CNF_Clause]:
         foundUnresolved: bool = False
+        lits = self.lits
         
-        for c, clause in enumerate(self.clauses):
-            # if clause is sat and we arent doing a deep eval, skip clause
-            if (not deep and clause.sat == CNF_IsSAT.SAT):
-                continue
+        for cref in self.crefs_by_size():
+            start = self.clause_start[cref]
+            ceval = CNF_IsSAT.UNSAT
 
             # Evaluate clause
-            ceval = clause.eval(assigns)
+            for k in range(start, start + self.clause_size[cref]):
+                val = assigns[lits[k] >> 1]
+                if (val is None):
+                    ceval = CNF_IsSAT.UNRESOLVED
+                elif (val == (lits[k] & 1)):
+                    ceval = CNF_IsSAT.SAT
+                    break
 
             # If one clause is unsat, formula will never be sat or unresolved
             if (ceval == CNF_IsSAT.UNSAT):
-                return (CNF_IsSAT.UNSAT, clause)
+                return (CNF_IsSAT.UNSAT, self.clause(cref))
             # Formula cant be sat if clause is unresolved
             elif (ceval == CNF_IsSAT.UNRESOLVED):
                 foundUnresolved = True
@@ -109,97 +269,649 @@ class CNF_Formula:
         else: 
             return (CNF_IsSAT.SAT, None)
     
-    # Given two clauses that resulted in an UNSAT, generates a new conflict clause
-    def add_conflict_clause(self, c1: CNF_Clause, c2: CNF_Clause, pivot: int) -> CNF_Clause:
-        lit_list: List[CNF_Literal] = []
-        for lit in c1.literals:
-            if (lit.var_idx != pivot):
-                lit_list.append(lit)
-        for lit in c2.literals:
-            skip = False
-            # Ignore duplicates and pivot variable
-            for l in lit_list:
-                if (lit.var_idx == l.var_idx):
-                    skip = True
-                    break
-            if (lit.var_idx != pivot and not skip):
-                lit_list.append(lit)     
-        
-        c = CNF_Clause(lit_list)
-        
-        if (len(c.literals) <= self.max_conflict_size):
-            # print(f"Conflict clause added: {c.__str__()}")
-            bisect.insort(self.clauses, c, key=lambda x: len(x.literals))
-        
-        return c
+    # file_path can also be the DIMACS text as bytes
+    # If fingerprint is set, the hash of the normalized clause set is stored in formula.fingerprint (see clause_set_hash)
+    @staticmethod
+    def from_dimacs_file(file_path: Union[str, bytes], strict: bool = True, fingerprint: bool = False) -> 'CNF_Formula':
+        # Read the CNF file straight into the clause arena
+        num_vars, lits, sizes = read_dimacs(file_path, strict)
+
+        formula = CNF_Formula(num_vars=num_vars)
+        formula.add_clauses(lits, sizes)
+        formula.count_appearances()
+        if (fingerprint):
+            formula.fingerprint = clause_set_hash(num_vars, lits, sizes)
+        return formula
+    
+    def __str__(self):
+        return f"".join(map(str,self.clauses))
+
 
+# Unit propagation engine using two watched literals per clause. 
+# An assignment only visits the clauses that watch the literal it falsified.
+class CNF_Propagator:
+    def __init__(self, formula: CNF_Formula):
+        self.formula: CNF_Formula = formula
+        self.num_vars: int = formula.num_vars
+
+        self.value = bytearray([L_UNDEF]) * (2 * self.num_vars + 2)   # Value of each literal code
+        self.level = array('i', [0]) * (self.num_vars + 1)            # Decision level each variable was assigned at
+        self.reason = array('i', [-1]) * (self.num_vars + 1)          # cref of the clause that implied each variable, -1 for decisions
+
+        self.trail = array('i')         # Assigned literal codes, in assignment order
+        self.trail_lim: List[int] = []  # Trail index where each decision level starts
+        self.qhead: int = 0             # Trail index of the next literal to propagate
+
+        # Watch lists indexed by literal code. Visited when that literal becomes false. 
+        # Clauses with 3+ literals are stored as (cref, blocker) pairs. If the blocker literal is true, the clause is skipped without being touched
+        self.watches: List[List[Tuple[int, int]]] = [[] for _ in range(2 * self.num_vars + 2)]
+        # Binary clauses store (other literal, cref) pairs, so the other literal is the blocker and is the implied literal
+        self.bin_watches: List[List[Tuple[int, int]]] = [[] for _ in range(2 * self.num_vars + 2)]
+
+        self.units: List[int] = []          # crefs of clauses with less than two literals, assigned at the top level
+        self.order: 'VSIDS' = None          # If set, unassigned variables are put back in its heap when backtracking
+
+        # Last value of each variable before it was unassigned, L_UNDEF if never assigned
+        self.save_phases: bool = True
+        self.phase = bytearray([L_UNDEF]) * (self.num_vars + 1)
+
+        for cref in formula.crefs():
+            self.attach(cref)
+
+    # Adds clause to the watch lists. First two literals are watched, so they should not be false
+    def attach(self, cref: int):
+        size = self.formula.clause_size[cref]
+        start = self.formula.clause_start[cref]
+        lits = self.formula.lits
+        if (size < 2):
+            self.units.append(cref)
+        elif (size == 2):
+            self.bin_watches[lits[start]].append((lits[start + 1], cref))
+            self.bin_watches[lits[start + 1]].append((lits[start], cref))
+        else:
+            self.watches[lits[start]].append((cref, lits[start + 1]))
+            self.watches[lits[start + 1]].append((cref, lits[start]))
+
+    # Drops deleted clauses from the watch lists
+    def detach_deleted(self):
+        flags = self.formula.clause_flags
+        for ws in self.watches:
+            ws[:] = [w for w in ws if not flags[w[0]] & CLAUSE_DELETED]
+        for ws in self.bin_watches:
+            ws[:] = [w for w in ws if not flags[w[1]] & CLAUSE_DELETED]
+
+    # Literal block distance of a list of assigned literal codes
+    def lbd(self, lits: Iterable[int]) -> int:
+        level = self.level
+        return len({level[lit >> 1] for lit in lits})
+
+    # Current decision level
+    def decision_level(self) -> int:
+        return len(self.trail_lim)
+
+    # Starts a new decision level and assigns its decision literal
+    def decide(self, lit: int):
+        self.trail_lim.append(len(self.trail))
+        self.assign(lit)
+
+    # Starts a new decision level without a decision, used for assumptions that are already true
+    def new_level(self):
+        self.trail_lim.append(len(self.trail))
+
+    # Decision literal of a decision level
+    def decision(self, level: int) -> int:
+        return self.trail[self.trail_lim[level - 1]]
+
+    # Assigns literal code to true and queues it for propagation
+    def assign(self, lit: int, reason: int = -1):
+        self.value[lit] = L_TRUE
+        self.value[lit ^ 1] = L_FALSE
+        self.level[lit >> 1] = len(self.trail_lim)
+        self.reason[lit >> 1] = reason
+        self.trail.append(lit)
+
+    # Makes room for variables added to the formula after the propagator was created
+    def grow(self, num_vars: int):
+        extra = num_vars - self.num_vars
+        if (extra <= 0):
+            return
+        self.value.extend(bytearray([L_UNDEF]) * (2 * extra))
+        self.level.extend(array('i', [0]) * extra)
+        self.reason.extend(array('i', [-1]) * extra)
+        self.watches.extend([] for _ in range(2 * extra))
+        self.bin_watches.extend([] for _ in range(2 * extra))
+        self.phase.extend(bytearray([L_UNDEF]) * extra)
+        self.num_vars = num_vars
+
+    # Assigns all unit clauses. Returns cref of clause that conflicts, or None
+    def assign_units(self) -> int:
+        lits = self.formula.lits
+        for cref in self.units:
+            if (self.formula.clause_size[cref] == 0):
+                return cref
+
+            lit = lits[self.formula.clause_start[cref]]
+            val = self.value[lit]
+            if (val == L_UNDEF):
+                self.assign(lit, cref)
+            elif (val == L_FALSE):
+                return cref
+
+        return self.propagate()
+
+    # Assignment list indexed by var number, None for unassigned variables
+    def model(self) -> List[bool]:
+        value = self.value
+        return [None if value[2 * var_idx] == L_UNDEF else value[2 * var_idx + 1] == L_TRUE for var_idx in range(self.num_vars + 1)]
+
+    # Unassigns every literal above the given decision level. 
+    # Start of the level is looked up in trail_lim, so only the unassigned literals are visited
+    def cancel_until(self, level: int):
+        if (len(self.trail_lim) <= level):
+            return
+
+        trail_len = self.trail_lim[level]
+        value = self.value
+        reason = self.reason
+        undone = self.trail[trail_len:]
+        if (self.save_phases):
+            phase = self.phase
+            for lit in undone:
+                phase[lit >> 1] = L_TRUE if lit & 1 else L_FALSE
+        for lit in undone:
+            value[lit] = L_UNDEF
+            value[lit ^ 1] = L_UNDEF
+            reason[lit >> 1] = -1
+        if (self.order is not None):
+            for lit in undone:
+                self.order.insert(lit >> 1)
+        del self.trail[trail_len:]
+        del self.trail_lim[level:]
+        self.qhead = trail_len
+
+    # Propagates all queued assignments. Returns the cref of the clause that became UNSAT, or None
+    def propagate(self) -> int:
+        value = self.value
+        level = self.level
+        reason = self.reason
+        trail = self.trail
+        watches = self.watches
+        bin_watches = self.bin_watches
+        arena = self.formula.lits
+        clause_start = self.formula.clause_start
+        clause_size = self.formula.clause_size
+        curr_level = len(self.trail_lim)
+
+        while (self.qhead < len(trail)):
+            false_lit = trail[self.qhead] ^ 1
+            self.qhead += 1
+
+            # Binary clauses: the other literal is implied
+            for other, cref in bin_watches[false_lit]:
+                val = value[other]
+                if (val == L_UNDEF):
+                    value[other] = L_TRUE
+                    value[other ^ 1] = L_FALSE
+                    level[other >> 1] = curr_level
+                    reason[other >> 1] = cref
+                    trail.append(other)
+                elif (val == L_FALSE):
+                    self.qhead = len(trail)
+                    return cref
+
+            # Longer clauses: find a new literal to watch, or imply the other watched literal
+            ws = watches[false_lit]
+            i = 0
+            j = 0
+            n = len(ws)
+            while (i < n):
+                w = ws[i]
+                i += 1
+
+                # Skip clause if blocker is true 
+                cref, blocker = w
+                if (value[blocker] == L_TRUE):
+                    ws[j] = w
+                    j += 1
+                    continue
+
+                # Make sure the false literal is the second watch
+                start = clause_start[cref]
+                first = arena[start]
+                if (first == false_lit):
+                    first = arena[start + 1]
+                    arena[start] = first
+                    arena[start + 1] = false_lit
+
+                # If first watch is true, clause is SAT
+                val = value[first]
+                if (val == L_TRUE):
+                    ws[j] = (cref, first)
+                    j += 1
+                    continue
+
+                # Look for a literal that is not false
+                for k in range(start + 2, start + clause_size[cref]):
+                    lit = arena[k]
+                    if (value[lit] != L_FALSE):
+                        arena[start + 1] = lit
+                        arena[k] = false_lit
+                        watches[lit].append((cref, first))
+                        break
+                else:
+                    # No replacement, clause is unit or UNSAT
+                    ws[j] = w
+                    j += 1
+                    if (val == L_UNDEF):
+                        value[first] = L_TRUE
+                        value[first ^ 1] = L_FALSE
+                        level[first >> 1] = curr_level
+                        reason[first >> 1] = cref
+                        trail.append(first)
+                    else:
+                        # Keep the remaining watches before returning the conflict
+                        while (i < n):
+                            ws[j] = ws[i]
+                            j += 1
+                            i += 1
+                        del ws[j:]
+                        self.qhead = len(trail)
+                        return cref
+            del ws[j:]
+
+        return None
+
+
+# Stores metadata of clauses learned from conflict analysis. The clauses themselves are in the CNF_Formula arena.
+# Clauses are split in tiers by literal block distance (LBD): 
+#   CORE clauses are never deleted
+#   TIER2 clauses are kept while they keep taking part in conflict analysis, and are moved to LOCAL otherwise
+#   LOCAL clauses are sorted by activity, and the less active half is deleted on every reduction
+class CNF_LearntDB:
+    CORE = 0
+    TIER2 = 1
+    LOCAL = 2
+
+    def __init__(self, formula: CNF_Formula, core_lbd: int = 2, tier2_lbd: int = 6, first_reduce: int = 2000, reduce_inc: int = 300, clause_decay: float = 0.999):
+        self.formula: CNF_Formula = formula
+        self.crefs: List[int] = []
+
+        # Per clause metadata, indexed by cref
+        self.lbd = array('i')           # Literal block distance: number of decision levels in the clause
+        self.activity = array('d')      # Bumped when clause takes part in conflict analysis
+        self.tier = bytearray()         # Tier the clause is in
+        self.used = bytearray()         # Took part in conflict analysis since the last reduction
+
+        self.core_lbd = core_lbd
+        self.tier2_lbd = tier2_lbd
+
+        self.clause_decay = clause_decay
+        self.clause_bump = 1.0
+        self.rescale_limit = 1e20
+
+        # Reduction schedule, in number of conflicts
+        self.first_reduce = first_reduce
+        self.reduce_inc = reduce_inc
+        self.next_reduce = first_reduce
+        self.reduce_cnt = 0
+        self.deleted_cnt = 0
+        self.proof = None               # DRATWriter that deleted clauses are logged to, if set
+
+    def __len__(self):
+        return len(self.crefs)
+
+    def tier_of(self, lbd: int) -> int:
+        if (lbd <= self.core_lbd):
+            return CNF_LearntDB.CORE
+        elif (lbd <= self.tier2_lbd):
+            return CNF_LearntDB.TIER2
+        return CNF_LearntDB.LOCAL
+
+    # Adds a learned clause from literal codes. Literal order is kept, since the first two literals are watched
+    # Returns its cref
+    def add(self, lits: List[int], lbd: int) -> int:
+        cref = self.formula.add_clause(lits, learnt=True)
+
+        # Grow metadata arrays to cover the new cref
+        grow = cref + 1 - len(self.lbd)
+        if (grow > 0):
+            self.lbd.extend([0] * grow)
+            self.activity.extend([0.0] * grow)
+            self.tier.extend(bytes(grow))
+            self.used.extend(bytes(grow))
+
+        self.lbd[cref] = lbd
+        self.tier[cref] = self.tier_of(lbd)
+        self.activity[cref] = self.clause_bump
+        self.used[cref] = False
+        self.crefs.append(cref)
+        return cref
+
+    # Called when a learned clause is a reason during conflict analysis
+    # Bumps activity, and moves clause to a better tier if its LBD went down
+    def bump(self, cref: int, lbd: int):
+        self.used[cref] = True
+        self.activity[cref] += self.clause_bump
+        if (self.activity[cref] > self.rescale_limit):
+            for c in self.crefs:
+                self.activity[c] /= self.rescale_limit
+            self.clause_bump /= self.rescale_limit
+
+        if (lbd < self.lbd[cref]):
+            self.lbd[cref] = lbd
+            self.tier[cref] = min(self.tier[cref], self.tier_of(lbd))
+
+    def decay(self):
+        self.clause_bump /= self.clause_decay
+
+    # True if clause is the reason of an assignment. Long clauses keep the literal they implied first, binary clauses can imply either literal
+    def locked(self, prop: CNF_Propagator, cref: int) -> bool:
+        start = self.formula.clause_start[cref]
+        lits = self.formula.lits
+        if (prop.reason[lits[start] >> 1] == cref):
+            return True
+        return self.formula.clause_size[cref] == 2 and prop.reason[lits[start + 1] >> 1] == cref
+
+    # Deletes the less active half of the LOCAL clauses, except clauses that are the reason of an assignment
+    # Returns deleted crefs
+    def reduce(self, prop: CNF_Propagator) -> List[int]:
+        kept: List[int] = []
+        local: List[int] = []
+        deleted: List[int] = []
+
+        for cref in self.crefs:
+            if (self.tier[cref] == CNF_LearntDB.TIER2 and not self.used[cref]):
+                self.tier[cref] = CNF_LearntDB.LOCAL
+            self.used[cref] = False
+
+            if (self.tier[cref] == CNF_LearntDB.LOCAL):
+                local.append(cref)
+            else:
+                kept.append(cref)
+
+        local.sort(key=lambda c: self.activity[c])
+        limit = len(local) // 2
+        for cref in local:
+            if (len(deleted) < limit and not self.locked(prop, cref)):
+                if (self.proof is not None):
+                    self.proof.delete(self.formula.clause_lits(cref))
+                self.formula.delete_clause(cref)
+                deleted.append(cref)
+            else:
+                kept.append(cref)
+
+        self.crefs = kept
+        prop.detach_deleted()
+        self.formula.collect_garbage()
+
+        self.deleted_cnt += len(deleted)
+        self.reduce_cnt += 1
+        self.next_reduce += self.first_reduce + self.reduce_inc * self.reduce_cnt
+        return deleted
+
+
+# Luby sequence restarts: restart after unit * luby(i) conflicts, where luby is 1 1 2 1 1 2 4 1 1 2 ...
+class LubyRestarts:
+    def __init__(self, unit: int = 100):
+        self.unit = unit
+        self.restart_idx = 0
+        self.conflicts = 0
+        self.limit = unit * LubyRestarts.luby(0)
 
     @staticmethod
-    def from_dimacs_file(file_path: str) -> 'CNF_Formula':
-        # Read the CNF file
-        with open(file_path, 'r') as f:
-            lines = f.readlines()
-        
-        clauses = []
-        literals = []
-        num_vars = 0
-
-        # Parse the CNF file
-        for line in lines:
-            line = line.strip()
-
-            # Skip metadata
-            if line.startswith('c'):
-                continue
-            elif line.startswith('p'):
-               num_vars = int(line.split()[2])
-               continue
-
-            # Loop through literals 
-            for lit in line.split():
-                lit = int(lit)
-
-                # If end of clause
-                if lit == 0:
-                    clauses.append(CNF_Clause(literals))    # Create new cluase from literal list
-                    literals = []                           # Reset literal list  
-                    break
+    def luby(i: int) -> int:
+        # Find the finite subsequence that contains index i, and its size
+        size = 1
+        seq = 0
+        while (size < i + 1):
+            seq += 1
+            size = 2 * size + 1
+        while (size - 1 != i):
+            size = (size - 1) >> 1
+            seq -= 1
+            i = i % size
+        return 1 << seq
 
-                sign = lit > 0
-                literals.append(CNF_Literal(abs(lit), sign))
+    def on_conflict(self, lbd: int, trail_len: int):
+        self.conflicts += 1
 
-        #print(CNF_Literal.get_instance_counts())
-        #exit()
-        return CNF_Formula(clauses, num_vars)
-    
-    def __str__(self):
-        return f"".join(map(str,self.clauses))
+    def should_restart(self) -> bool:
+        return self.conflicts >= self.limit
 
+    def on_restart(self):
+        self.restart_idx += 1
+        self.conflicts = 0
+        self.limit = self.unit * LubyRestarts.luby(self.restart_idx)
 
+
+# Geometric restarts: restart interval grows by a constant factor after every restart
+class GeometricRestarts:
+    def __init__(self, first: int = 100, factor: float = 1.5):
+        self.factor = factor
+        self.conflicts = 0
+        self.limit = first
+
+    def on_conflict(self, lbd: int, trail_len: int):
+        self.conflicts += 1
+
+    def should_restart(self) -> bool:
+        return self.conflicts >= self.limit
+
+    def on_restart(self):
+        self.conflicts = 0
+        self.limit *= self.factor
+
+
+# Exponential moving average. Smoothing starts at 1 and goes down to alpha, so the first values arent biased towards 0
+class EMA:
+    def __init__(self, alpha: float):
+        self.alpha = alpha
+        self.value = 0.0
+        self.count = 0
+
+    def update(self, x: float):
+        self.count += 1
+        self.value += max(self.alpha, 1.0 / self.count) * (x - self.value)
+
+
+# Glucose style restarts: restart when the LBD of recent learned clauses is high compared to the long term average
+# Restarts are blocked when the trail is much larger than usual, since the solver may be close to a model
+class GlucoseRestarts:
+    def __init__(self, margin: float = 1.25, block_margin: float = 1.4, min_conflicts: int = 50, block_after: int = 10000):
+        self.margin = margin
+        self.block_margin = block_margin
+        self.min_conflicts = min_conflicts
+        self.block_after = block_after
+
+        self.fast_lbd = EMA(1 / 32)
+        self.slow_lbd = EMA(1 / 4096)
+        self.trail_avg = EMA(1 / 5000)
+
+        self.total_conflicts = 0
+        self.conflicts = 0
+
+    def on_conflict(self, lbd: int, trail_len: int):
+        self.total_conflicts += 1
+        self.conflicts += 1
+
+        # Block restart if trail is unusually large
+        if (self.total_conflicts > self.block_after and self.conflicts >= self.min_conflicts and trail_len > self.block_margin * self.trail_avg.value):
+            self.conflicts = 0
+
+        self.trail_avg.update(trail_len)
+        self.fast_lbd.update(lbd)
+        self.slow_lbd.update(lbd)
+
+    def should_restart(self) -> bool:
+        return self.conflicts >= self.min_conflicts and self.fast_lbd.value > self.margin * self.slow_lbd.value
+
+    def on_restart(self):
+        self.conflicts = 0
+
+
+# Never restarts
+class NoRestarts:
+    def on_conflict(self, lbd: int, trail_len: int):
+        pass
+
+    def should_restart(self) -> bool:
+        return False
+
+    def on_restart(self):
+        pass
+
+
+# Restart policies that can be selected by name
+RESTART_POLICIES = {
+    "luby": LubyRestarts,
+    "geometric": GeometricRestarts,
+    "glucose": GlucoseRestarts,
+    "none": NoRestarts,
+}
+
+
+# Variable order for decisions. Keeps an indexed binary max-heap of variables ordered by activity
+# Assigned variables are removed lazily when they reach the top, and put back when unassigned by a backtrack
 class VSIDS:
-    def __init__(self, formula: CNF_Formula):
-        self.activity_factors = {}
-        self.decay_factor = 0.95
+    # polarity is the sign variables are branched on before they have a saved phase
+    # If seed is given, activities start at small random values instead of 0, so solvers with different seeds branch differently
+    def __init__(self, formula: CNF_Formula, decay_factor: float = 0.95, polarity: bool = False, seed: int = None):
+        self.activity: List[float] = [0.0] * (formula.num_vars + 1)  # Activity indexed by var number
+        if (seed is not None):
+            rng = random.Random(seed)
+            self.activity = [rng.random() for _ in range(formula.num_vars + 1)]
+        self.decay_factor = decay_factor
         self.bump_amount  = 1.0
-        
-        for clause in formula.clauses:
-            for literal in clause.literals:
-                key = (literal.var_idx, literal.sign)
+        self.rescale_limit = 1e100
+
+        # Sign each variable is branched on 
+        self.default_polarity = polarity
+        self.polarity: List[bool] = [polarity] * (formula.num_vars + 1)
+
+        self.heap: List[int] = []   # Var numbers, heap[0] has the highest activity
+        self.heap_idx: List[int] = [-1] * (formula.num_vars + 1)   # Position of each var in the heap, -1 if not in the heap
 
-                if key not in self.activity_factors:
-                    self.activity_factors[key] = 0
+        # Only variables that appear in the formula are decided
+        for var_idx in range(1, formula.num_vars + 1):
+            if (formula.appearance_cnt[var_idx] > 0):
+                self.insert(var_idx)
 
     def get_activity_factors(self):
-        """Return a list of ((var_idx, sign), count) tuples sorted by count descending."""
-        return sorted(self.activity_factors.items(), key=lambda item: item[1], reverse=True)
-    
+        """Return a list of (var_idx, activity) tuples sorted by activity descending."""
+        return sorted([(var_idx, self.activity[var_idx]) for var_idx in self.heap], key=lambda item: item[1], reverse=True)
+
+    # Decays every activity by growing the bump amount instead
     def increase_bump_amount(self):
         self.bump_amount /= self.decay_factor
-            
-    def update_activity_factors(self, new_clause:CNF_Clause):
-        for literal in new_clause.literals:
-            key = (literal.var_idx, literal.sign)
-            self.activity_factors[key] += self.bump_amount
+        if (self.bump_amount > self.rescale_limit):
+            self.rescale()
+
+    # Scales activities and bump amount down so they stay in floating point range. Order is unchanged
+    def rescale(self):
+        scale = 1.0 / self.rescale_limit
+        self.activity = [act * scale for act in self.activity]
+        self.bump_amount *= scale
+
+    # Increases activity of a variable that took part in conflict analysis
+    def bump(self, var_idx: int):
+        self.activity[var_idx] += self.bump_amount
+        if (self.activity[var_idx] > self.rescale_limit):
+            self.rescale()
+        if (self.heap_idx[var_idx] >= 0):
+            self.sift_up(self.heap_idx[var_idx])
+
+    # Makes room for variables added to the formula, and adds them to the heap
+    def grow(self, num_vars: int):
+        old = len(self.activity) - 1
+        if (num_vars <= old):
+            return
+        self.activity.extend([0.0] * (num_vars - old))
+        self.polarity.extend([self.default_polarity] * (num_vars - old))
+        self.heap_idx.extend([-1] * (num_vars - old))
+        for var_idx in range(old + 1, num_vars + 1):
+            self.insert(var_idx)
+
+    # Adds variable to the heap if it isnt in it already
+    def insert(self, var_idx: int):
+        if (self.heap_idx[var_idx] >= 0):
+            return
+        self.heap_idx[var_idx] = len(self.heap)
+        self.heap.append(var_idx)
+        self.sift_up(len(self.heap) - 1)
+
+    # Takes variable out of the heap, e.g. once it was substituted by an equivalent literal (see inprocess.py)
+    # It is only put back if it is assigned and unassigned again
+    def remove(self, var_idx: int):
+        i = self.heap_idx[var_idx]
+        if (i < 0):
+            return
+        self.heap_idx[var_idx] = -1
+        last = self.heap.pop()
+        if (i < len(self.heap)):
+            self.heap[i] = last
+            self.heap_idx[last] = i
+            self.sift_up(i)
+            self.sift_down(self.heap_idx[last])
+
+    # Removes variables from the top of the heap until an unassigned one is found
+    # value is the propagator literal value array
+    # Returns (var_idx, sign) to branch on, or (0, None) if every variable is assigned
+    def pick(self, value: bytearray) -> Tuple[int, bool]:
+        heap = self.heap
+        while (heap):
+            var_idx = heap[0]
+            last = heap.pop()
+            self.heap_idx[var_idx] = -1
+            if (heap):
+                heap[0] = last
+                self.heap_idx[last] = 0
+                self.sift_down(0)
+
+            if (value[2 * var_idx] == L_UNDEF):
+                return (var_idx, self.polarity[var_idx])
+
+        return (0, None)
+
+    def sift_up(self, i: int):
+        heap = self.heap
+        heap_idx = self.heap_idx
+        activity = self.activity
+        var_idx = heap[i]
+        act = activity[var_idx]
+
+        while (i > 0):
+            parent = (i - 1) >> 1
+            if (activity[heap[parent]] >= act):
+                break
+            heap[i] = heap[parent]
+            heap_idx[heap[i]] = i
+            i = parent
+
+        heap[i] = var_idx
+        heap_idx[var_idx] = i
+
+    def sift_down(self, i: int):
+        heap = self.heap
+        heap_idx = self.heap_idx
+        activity = self.activity
+        var_idx = heap[i]
+        act = activity[var_idx]
+        n = len(heap)
+
+        while (True):
+            child = 2 * i + 1
+            if (child >= n):
+                break
+            if (child + 1 < n and activity[heap[child + 1]] > activity[heap[child]]):
+                child += 1
+            if (activity[heap[child]] <= act):
+                break
+            heap[i] = heap[child]
+            heap_idx[heap[i]] = i
+            i = child
+
+        heap[i] = var_idx
+        heap_idx[var_idx] = i
 
     def __str__(self):
         return f"VSIDS:bump_amount = {self.bump_amount}, activity_factors = {self.get_activity_factors()}"
@@ -0,0 +1,349 @@
+from typing import *
+import csv
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import sys
+import threading
+import time
+from dpll import parse_dimacs_file, dpll
+from SAT_structs import *
+from SAT_solver import SAT_solver
+from preprocess import Preprocessor
+from drat import DRATWriter
+from cache import ResultCache, DEFAULT_CACHE_SIZE
+from sls import LocalSearch, DEFAULT_MAX_FLIPS
+from circuit import load_formula, is_circuit_file
+from checkpoint import save_checkpoint, load_checkpoint, remove_checkpoint
+
+try:
+    import resource
+except ImportError:
+    resource = None     # Not available on Windows, memory limits are ignored there
+
+# Parallel batch mode for mySAT.py.
+# Every instance is solved in its own worker process, at most jobs of them at a time. The parent waits on the result pipes,
+# and kills a worker once it has used up its wall clock limit. Memory is limited with RLIMIT_AS inside the worker,
+# so a worker that runs out raises MemoryError (or is killed by the OS) and is reported as MEMOUT.
+# Results are written as soon as each instance finishes, as JSON Lines or CSV.
+
+RESULT_FIELDS = ["file", "status", "time", "iterations", "conflicts", "decisions", "restarts", "model", "error", "stats", "inputs"]
+
+# Default solver options, same as mySAT.py without flags
+DEFAULT_OPTIONS = {
+    "dpll": False,
+    "vsids": True,
+    "restarts": "glucose",
+    "phase_saving": True,
+    "debug": False,
+    "preprocess": True,
+    "decay": 0.95,
+    "default_phase": False,
+    "seed": None,
+    "profile": False,       # Measure time spent in propagation and conflict analysis
+    "progress": None,       # Print a stats snapshot to stderr every this many conflicts
+    "proof": None,          # File the DRAT proof is written to, CDCL only
+    "proof_binary": True,   # Binary DRAT proof, text if False
+    "cache": None,          # Directory of the result cache, CDCL only
+    "cache_size": DEFAULT_CACHE_SIZE,   # Size limit of the result cache in MB
+    "sls": None,            # Local search algorithm tried before CDCL (see sls.py), CDCL only
+    "sls_flips": DEFAULT_MAX_FLIPS,     # Flips local search gets before CDCL takes over
+    "inputs_first": True,   # Circuits: VSIDS decides the primary inputs first
+    "inprocess": True,      # Simplify the binary implication graph between restarts (see inprocess.py), CDCL only
+    "conflict_budget": None,        # CDCL stops with status UNKNOWN after this many conflicts
+    "propagation_budget": None,     # ... propagated literals
+    "time_budget": None,            # ... seconds of search
+    "mem_budget": None,             # ... MB of memory in use
+    "checkpoint": None,     # File the solver state is saved to when it stops with UNKNOWN, and continued from if it exists. Deleted on SAT or UNSAT. CDCL only
+}
+
+# Name of the algorithm used for options
+def mode_name(options: Dict[str, Any]) -> str:
+    if (options["dpll"]):
+        return "DPLL"
+    return "CDCL w/ VSIDS" if options["vsids"] else "CDCL"
+
+# Solves one file in the current process
+# share is passed on to SAT_solver.solve for clause sharing between portfolio workers
+# data is DIMACS text to solve instead of the file, cnf_file then only names the instance in the result row
+# AIGER and BLIF files are encoded by circuit.py, and their result rows also have inputs, the input values of the model by name
+# Returns a result row: status is SAT or UNSAT, time includes parsing, and model is a list of signed variable numbers (None if UNSAT)
+# status is UNKNOWN if a budget ran out, or SIGINT or SIGTERM stopped a run with a checkpoint, and stats then has stopped_by
+# stats has the solver counters (see SAT_solver.stats) and the parse and preprocess times
+def solve_instance(cnf_file: str, options: Dict[str, Any], share = None, data: bytes = None) -> Dict[str, Any]:
+    start_time = time.time()
+    source = cnf_file if data is None else data
+    result = {"file": cnf_file, "conflicts": None, "decisions": None, "restarts": None}
+    stats = {}
+    cache = None
+    circuit = None
+    solver = None
+    checkpoint = None
+
+    if (options["dpll"]):
+        if (options.get("proof")):
+            raise ValueError("DRAT proofs need the CDCL solver")
+        if (data is None and is_circuit_file(cnf_file)):
+            formula, circuit = load_formula(cnf_file)
+            clauses = [[lit >> 1 if lit & 1 else -(lit >> 1) for lit in formula.clause_lits(cref)] for cref in formula.crefs()]
+        else:
+            clauses = parse_dimacs_file(source)
+        stats["parse_time"] = time.time() - start_time
+        (assignment, iter_count) = dpll(clauses, log=options["debug"])
+        solution = None
+        if (assignment is not None):
+            solution = [None] + [assignment[var] for var in range(1, len(assignment) + 1)]
+    else:
+        if (options.get("cache")):
+            cache = ResultCache(options["cache"], options.get("cache_size", DEFAULT_CACHE_SIZE))
+        checkpoint = options.get("checkpoint")
+        if (checkpoint and options.get("proof")):
+            raise ValueError("DRAT proofs cant be continued from a checkpoint")
+        resume = bool(checkpoint) and os.path.exists(checkpoint)
+        formula, circuit = load_formula(source, fingerprint=cache is not None or bool(checkpoint))
+        fingerprint = formula.fingerprint
+        stats["parse_time"] = time.time() - start_time
+        if (circuit is not None):
+            stats.update(gates=circuit.gate_cnt, merged_gates=circuit.merged_cnt)
+
+        # Repeated formulas are answered from the cache, SAT models are checked against the formula first
+        if (cache is not None):
+            cached = cache.lookup(formula, options.get("proof"))
+            if (cached is not None):
+                stats["cached"] = True
+                result.update(cached, time=time.time() - start_time, iterations=0, stats=stats)
+                if (circuit is not None and result["model"] is not None):
+                    result["inputs"] = circuit.input_values(result["model"])
+                if (checkpoint):
+                    remove_checkpoint(checkpoint)
+                return result
+
+        proof = None
+        if (options.get("proof")):
+            proof = DRATWriter.open(options["proof"], options.get("proof_binary", True))
+        # Preprocessing is deterministic, so when the search continues from a checkpoint it is run again to restore eliminated variables
+        preprocessor = None
+        if (options.get("preprocess", True)):
+            preprocess_start = time.time()
+            preprocessor = Preprocessor(formula, proof=proof)
+            formula = preprocessor.simplify()
+            stats["preprocess_time"] = time.time() - preprocess_start
+            if (options["debug"]):
+                print(f"Preprocessing eliminated {preprocessor.eliminated_cnt} variables and {preprocessor.pure_cnt} pure literals, "
+                      f"subsumed {preprocessor.subsumed_cnt} and strengthened {preprocessor.strengthened_cnt} clauses, "
+                      f"{len(list(formula.crefs()))} clauses left")
+
+        # Local search first. If it finds no model, CDCL starts from the best assignment it found
+        solution = None
+        search = None
+        if (options.get("sls") and not resume):
+            sls_start = time.time()
+            search = LocalSearch(formula, options["sls"], seed=options.get("seed"))
+            solution = search.solve(options.get("sls_flips", DEFAULT_MAX_FLIPS))
+            stats["sls_time"] = time.time() - sls_start
+            stats["flips"] = search.flip_cnt
+            if (options["debug"]):
+                print(f"Local search {'found a model' if solution is not None else 'gave up'} after {search.flip_cnt} flips, "
+                      f"best assignment has {search.best_unsat} false clauses")
+            iter_count = search.flip_cnt
+
+        if (solution is None):
+            checkpoint_info = {"fingerprint": fingerprint, "preprocess": preprocessor is not None}
+            if (resume):
+                solver, info = load_checkpoint(checkpoint)
+                if (info != checkpoint_info):
+                    raise ValueError(f"checkpoint {checkpoint} was saved for another formula or preprocessing")
+                stats["resumed"] = True
+            else:
+                solver = SAT_solver(formula)
+                if (search is not None):
+                    solver.set_phases(search.best_phases())
+                if (circuit is not None and options.get("inputs_first", True)):
+                    solver.prefer_vars(circuit.input_vars)
+            solver.log = options["debug"]
+            solver.profile = options.get("profile", False)
+            solver.proof = proof
+            solver.inprocess = options.get("inprocess", True)
+            solver.set_budget(options.get("conflict_budget"), options.get("propagation_budget"), options.get("time_budget"),
+                              options.get("mem_budget"))
+            if (options.get("progress")):
+                solver.set_progress_hook(lambda snapshot: print(json.dumps(dict(snapshot, file=cnf_file)), file=sys.stderr, flush=True),
+                                         options["progress"])
+
+            # With a checkpoint, SIGINT and SIGTERM stop the search so its state can be saved. Handlers can only be set in the main thread
+            handlers = {}
+            if (checkpoint and threading.current_thread() is threading.main_thread()):
+                for signum in (signal.SIGINT, signal.SIGTERM):
+                    handlers[signum] = signal.signal(signum, lambda signum, frame: solver.interrupt())
+            try:
+                solution = solver.solve(useVSIDS=options["vsids"], restarts=options["restarts"], phaseSaving=options["phase_saving"],
+                                        decay=options.get("decay", 0.95), defaultPhase=options.get("default_phase", False),
+                                        seed=options.get("seed"), share=share)
+            finally:
+                for signum, handler in handlers.items():
+                    signal.signal(signum, handler)
+            if (solver.status == "UNKNOWN"):
+                stats["stopped_by"] = solver.stop_reason
+                if (checkpoint):
+                    save_checkpoint(solver, checkpoint, checkpoint_info)
+            iter_count = solver.iter_count
+            result["conflicts"] = solver.conflict_cnt
+            result["decisions"] = solver.decision_cnt
+            result["restarts"] = solver.restart_cnt
+            stats.update(solver.stats())
+        if (proof is not None):
+            proof.close()
+        if (solution is not None and preprocessor is not None):
+            solution = [None] + preprocessor.extend_model(solution)[1:]
+
+    result["time"] = time.time() - start_time
+    result["iterations"] = iter_count
+    result["stats"] = stats
+    if (solution is None):
+        result["status"] = "UNSAT" if (solver is None or solver.status != "UNKNOWN") else "UNKNOWN"
+        result["model"] = None
+    else:
+        result["status"] = "SAT"
+        result["model"] = [var if solution[var] else -var for var in range(1, len(solution))]
+        if (circuit is not None):
+            result["inputs"] = circuit.input_values(result["model"])
+    if (cache is not None and result["status"] != "UNKNOWN"):
+        cache.store(fingerprint, result, options.get("proof"))
+    # The search is over, so a checkpoint left by an earlier run would only be continued for nothing
+    if (checkpoint and result["status"] != "UNKNOWN"):
+        remove_checkpoint(checkpoint)
+    return result
+
+# Limits the address space of the current process to mem_limit MB
+def limit_memory(mem_limit: int):
+    if (mem_limit is not None and resource is not None):
+        limit = mem_limit * 1024 * 1024
+        hard = resource.getrlimit(resource.RLIMIT_AS)[1]
+        if (hard != resource.RLIM_INFINITY):
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+# solve_instance for worker processes: errors are reported in the result row, as MEMOUT or ERROR
+def try_solve_instance(cnf_file: str, options: Dict[str, Any], share = None, data: bytes = None) -> Dict[str, Any]:
+    try:
+        return solve_instance(cnf_file, options, share, data)
+    except MemoryError:
+        return {"file": cnf_file, "status": "MEMOUT"}
+    except RecursionError:
+        return {"file": cnf_file, "status": "ERROR", "error": "maximum recursion depth exceeded"}
+    except Exception as e:
+        return {"file": cnf_file, "status": "ERROR", "error": str(e)}
+
+# Entry point of a worker process, sends the result row back through conn
+def solve_worker(cnf_file: str, options: Dict[str, Any], mem_limit: int, conn: multiprocessing.connection.Connection, share = None):
+    limit_memory(mem_limit)
+    result = try_solve_instance(cnf_file, options, share)
+
+    try:
+        conn.send(result)
+    except MemoryError:
+        conn.send({"file": cnf_file, "status": "MEMOUT"})
+    conn.close()
+
+# Starts solve_worker in a new process. Returns the receiving end of its result pipe and the process
+def start_worker(cnf_file: str, options: Dict[str, Any], mem_limit: int = None, share = None) -> Tuple[multiprocessing.connection.Connection, multiprocessing.Process]:
+    recv_conn, send_conn = multiprocessing.Pipe(duplex=False)
+    proc = multiprocessing.Process(target=solve_worker, args=(cnf_file, options, mem_limit, send_conn, share), daemon=True)
+    proc.start()
+    send_conn.close()   # Only the worker holds the sending end, so recv fails if it dies
+    return (recv_conn, proc)
+
+# Reads the result row of a worker that finished, and waits for its process to exit
+def receive_result(conn: multiprocessing.connection.Connection, proc: multiprocessing.Process, cnf_file: str, mem_limit: int = None) -> Dict[str, Any]:
+    try:
+        result = conn.recv()
+    except EOFError:
+        # Worker died without a result. SIGKILL is what the OOM killer sends
+        proc.join()
+        status = "MEMOUT" if (mem_limit is not None and proc.exitcode == -9) else "ERROR"
+        result = {"file": cnf_file, "status": status, "error": f"worker exited with code {proc.exitcode}"}
+    conn.close()
+    proc.join()
+    return result
+
+# Streams result rows to a JSON Lines or CSV file, flushing after every row
+class ResultWriter:
+
+    def __init__(self, out: TextIO, fmt: str = "jsonl"):
+        if (fmt not in ("jsonl", "csv")):
+            raise ValueError(f"unknown result format {fmt}")
+        self.out = out
+        self.fmt = fmt
+        self.csv_writer = None
+        if (fmt == "csv"):
+            self.csv_writer = csv.DictWriter(out, fieldnames=RESULT_FIELDS, extrasaction="ignore")
+            self.csv_writer.writeheader()
+
+    # Picks the format from the file extension
+    @staticmethod
+    def format_of(file_path: str) -> str:
+        return "csv" if file_path.lower().endswith(".csv") else "jsonl"
+
+    def write(self, result: Dict[str, Any]):
+        row = {field: result.get(field) for field in RESULT_FIELDS}
+        if (self.fmt == "jsonl"):
+            self.out.write(json.dumps(row) + "\n")
+        else:
+            # Model is one DIMACS style string and stats a JSON object, so the row stays flat
+            if (row["model"] is not None):
+                row["model"] = " ".join(map(str, row["model"]))
+            if (row["stats"] is not None):
+                row["stats"] = json.dumps(row["stats"])
+            if (row["inputs"] is not None):
+                row["inputs"] = json.dumps(row["inputs"])
+            self.csv_writer.writerow(row)
+        self.out.flush()
+
+# Solves cnf_files with up to jobs worker processes
+# timeout is the wall clock limit per instance in seconds, and mem_limit the address space limit in MB (None for no limit)
+# Each result row is passed to writer (if given) as soon as its instance finishes. Returns all rows in the order they finished
+def run_batch(cnf_files: List[str], options: Dict[str, Any], jobs: int = 1, timeout: float = None, mem_limit: int = None,
+              writer: ResultWriter = None) -> List[Dict[str, Any]]:
+    results = []
+    pending = list(reversed(cnf_files))
+    running: Dict[multiprocessing.connection.Connection, Tuple[str, multiprocessing.Process, float]] = {}
+
+    def finish(result: Dict[str, Any]):
+        results.append(result)
+        if (writer is not None):
+            writer.write(result)
+
+    while (pending or running):
+        # Keep every job slot busy
+        while (pending and len(running) < jobs):
+            cnf_file = pending.pop()
+            recv_conn, proc = start_worker(cnf_file, options, mem_limit)
+            running[recv_conn] = (cnf_file, proc, time.time())
+
+        # Wait until a worker finishes or the earliest deadline passes
+        wait_time = None
+        if (timeout is not None):
+            now = time.time()
+            wait_time = max(0, min(start + timeout for (_, _, start) in running.values()) - now)
+        ready = multiprocessing.connection.wait(list(running), wait_time)
+
+        for conn in ready:
+            cnf_file, proc, start = running.pop(conn)
+            result = receive_result(conn, proc, cnf_file, mem_limit)
+            if (result.get("time") is None):
+                result["time"] = time.time() - start
+            finish(result)
+
+        # Kill workers that ran out of time
+        if (timeout is not None):
+            now = time.time()
+            for conn in [conn for conn, (_, _, start) in running.items() if now - start >= timeout]:
+                cnf_file, proc, start = running.pop(conn)
+                proc.kill()
+                proc.join()
+                conn.close()
+                finish({"file": cnf_file, "status": "TIMEOUT", "time": now - start})
+
+    return results
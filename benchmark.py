@@ -0,0 +1,273 @@
+from typing import *
+import csv
+import glob
+import json
+import os
+import re
+import signal
+import subprocess
+import sys
+import threading
+import time
+from dimacs import read_dimacs
+
+# Benchmark and regression suite for mySAT.py.
+# Every instance is solved by mySAT.py in a subprocess, once per solver mode, with a wall clock limit. SAT answers are checked by
+# evaluating the printed assignment on the original clauses, and UNSAT answers against the expected status of the instance.
+# Time, conflicts and peak memory of each run go to a CSV results file. Results can be compared with the results file of an earlier run
+# (the baseline) to find regressions, and PAR-2 scores and cactus plot data are computed per mode.
+# Exits with status 1 if any answer is wrong or any regression was found.
+
+USAGE = ("Usage: python benchmark.py [-modes mode,mode,... | -timeout SECS | -results FILE.csv | -baseline FILE.csv | -threshold FRACTION"
+         " | -cactus FILE.csv] [files or globs]")
+
+DEFAULT_SETS = ["aim/**/*.cnf", "cnf_bench/*.cnf"]
+
+# mySAT.py arguments of each solver mode
+MODES = {
+    "vsids": [],
+    "cdcl": ["-no_vsids"],
+    "dpll": ["-dpll"],
+    "luby": ["-restart", "luby"],
+    "geometric": ["-restart", "geometric"],
+    "no_restarts": ["-restart", "none"],
+    "no_phase_saving": ["-no_phase_saving"],
+    "no_preprocess": ["-no_preprocess"],
+    "no_inprocess": ["-no_inprocess"],
+    "portfolio": ["-portfolio", "4"],
+    "sls": ["-sls"],
+    "cube": ["-cube", "4"],
+}
+DEFAULT_MODES = ["vsids", "cdcl", "dpll"]
+
+# Expected status of instances whose file name doesnt contain -yes or -no-.
+# The staircase3 and staircase4 headers say SAT, but their implication chains end in a contradiction
+KNOWN_STATUS = {
+    "dubois20.cnf": "UNSAT",
+    "hole6.cnf": "UNSAT",
+    "ii8a1.cnf": "SAT",
+    "staircase1.cnf": "SAT",
+    "staircase2.cnf": "SAT",
+    "staircase3.cnf": "UNSAT",
+    "staircase4.cnf": "UNSAT",
+}
+
+RESULT_FIELDS = ["mode", "file", "expected", "status", "verdict", "time", "conflicts", "decisions", "memory_mb"]
+
+# Runs shorter than this are never reported as regressions, their times are mostly process start up
+MIN_REGRESSION_TIME = 0.25
+
+# Expected status of an instance from its file name, None if unknown
+def expected_status(cnf_file: str) -> str:
+    name = os.path.basename(cnf_file)
+    if (re.search(r"-yes\d*-", name)):
+        return "SAT"
+    if ("-no-" in name):
+        return "UNSAT"
+    return KNOWN_STATUS.get(name)
+
+# True if the assignment printed by mySAT.py satisfies every clause of the file
+def check_model(cnf_file: str, assignment: Dict[int, bool]) -> bool:
+    num_vars, lits, sizes = read_dimacs(cnf_file, strict=False)
+    pos = 0
+    for size in sizes:
+        if (not any(assignment.get(lit >> 1, False) == (lit & 1 == 1) for lit in lits[pos:pos + size])):
+            return False
+        pos += size
+    return True
+
+# Runs mySAT.py on one file. Returns (output, wall clock time, peak memory in MB), output is None on timeout
+def run_solver(args: List[str], cnf_file: str, timeout: float) -> Tuple[str, float, float]:
+    solver = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mySAT.py")
+    start_time = time.time()
+    # Own process group, so portfolio workers are killed with it
+    proc = subprocess.Popen([sys.executable, solver, "-json"] + args + [cnf_file], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                            text=True, start_new_session=True)
+    timed_out = []
+    def kill():
+        timed_out.append(True)
+        os.killpg(proc.pid, signal.SIGKILL)
+    timer = threading.Timer(timeout, kill)
+    timer.start()
+    output = proc.stdout.read()
+    proc.stdout.close()
+    timer.cancel()
+
+    # The process is reaped with wait4 to get its own resource usage. ru_maxrss is in KB on Linux
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = status
+    elapsed = time.time() - start_time
+    if (timed_out and "RESULT:" not in output):
+        output = None
+    return (output, elapsed, usage.ru_maxrss / 1024)
+
+# Solves cnf_file in mode and checks the answer. Returns a results row
+def run_instance(mode: str, cnf_file: str, timeout: float) -> Dict[str, Any]:
+    expected = expected_status(cnf_file)
+    output, elapsed, memory = run_solver(MODES[mode], cnf_file, timeout)
+    row = {"mode": mode, "file": cnf_file, "expected": expected or "", "time": round(elapsed, 4), "conflicts": "", "decisions": "",
+           "memory_mb": round(memory, 1)}
+
+    if (output is None):
+        row["status"] = "TIMEOUT"
+        row["verdict"] = "timeout"
+        return row
+
+    status = None
+    assignment = {}
+    for line in output.splitlines():
+        if (line.startswith("RESULT:")):
+            status = line[len("RESULT:"):].strip()
+        elif (line.startswith("ASSIGNMENT:")):
+            for pair in line[len("ASSIGNMENT:"):].split():
+                var, val = pair.split("=")
+                assignment[int(var)] = val == "1"
+        elif (line.startswith("{")):
+            metrics = json.loads(line)
+            row["time"] = round(metrics.get("time", elapsed), 4)
+            row["conflicts"] = metrics.get("conflicts", "")
+            row["decisions"] = metrics.get("decisions", "")
+
+    row["status"] = status or "ERROR"
+    if (status == "SAT"):
+        row["verdict"] = "ok" if check_model(cnf_file, assignment) else "bad_model"
+        if (row["verdict"] == "ok" and expected == "UNSAT"):
+            row["verdict"] = "wrong"    # Model checked, so the label is wrong
+    elif (status == "UNSAT"):
+        row["verdict"] = "ok" if expected != "SAT" else "wrong"
+    elif (status == "TIMEOUT"):
+        row["verdict"] = "timeout"
+    else:
+        row["verdict"] = "error"
+    return row
+
+# Rows from an earlier results file, keyed by (mode, file)
+def read_results(file_path: str) -> Dict[Tuple[str, str], Dict[str, str]]:
+    with open(file_path, newline="") as f:
+        return {(row["mode"], row["file"]): row for row in csv.DictReader(f)}
+
+# Finds runs that got slower than the baseline by more than threshold (a fraction), or that the baseline solved but this run didnt
+def find_regressions(rows: List[Dict[str, Any]], baseline: Dict[Tuple[str, str], Dict[str, str]], threshold: float) -> List[str]:
+    regressions = []
+    for row in rows:
+        base = baseline.get((row["mode"], row["file"]))
+        if (base is None):
+            continue
+        if (base["verdict"] == "ok" and row["verdict"] != "ok"):
+            regressions.append(f"{row['mode']} {row['file']}: {row['verdict']}, baseline solved it in {float(base['time']):.2f}s")
+            continue
+        if (row["verdict"] != "ok" or base["verdict"] != "ok"):
+            continue
+        base_time = float(base["time"])
+        if (row["time"] > MIN_REGRESSION_TIME and row["time"] > base_time * (1 + threshold)):
+            regressions.append(f"{row['mode']} {row['file']}: {row['time']:.2f}s, baseline {base_time:.2f}s")
+    return regressions
+
+# PAR-2 score of each mode: average time, with unsolved instances counted as twice the timeout
+def par2_scores(rows: List[Dict[str, Any]], timeout: float) -> Dict[str, float]:
+    totals: Dict[str, List[float]] = {}
+    for row in rows:
+        totals.setdefault(row["mode"], []).append(row["time"] if row["verdict"] == "ok" else 2 * timeout)
+    return {mode: sum(times) / len(times) for mode, times in totals.items()}
+
+# Cactus plot points of each mode: (number of instances solved, time of the slowest of them), with solve times sorted
+def cactus_data(rows: List[Dict[str, Any]]) -> Dict[str, List[Tuple[int, float]]]:
+    times: Dict[str, List[float]] = {}
+    for row in rows:
+        if (row["verdict"] == "ok"):
+            times.setdefault(row["mode"], []).append(row["time"])
+    return {mode: list(enumerate(sorted(mode_times), 1)) for mode, mode_times in times.items()}
+
+if __name__ == "__main__":
+    modes = DEFAULT_MODES
+    timeout = 60.0
+    resultsPath = "bench_results.csv"
+    baselinePath = None
+    threshold = 0.2
+    cactusPath = None
+    patterns = []
+
+    args = sys.argv[1:]
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        i += 1
+        if arg in ("-modes", "-timeout", "-results", "-baseline", "-threshold", "-cactus"):
+            if i >= len(args):
+                print(USAGE)
+                sys.exit(2)
+            value = args[i]
+            i += 1
+            try:
+                if arg == "-modes":
+                    modes = value.split(",")
+                    if any(mode not in MODES for mode in modes):
+                        raise ValueError(value)
+                elif arg == "-timeout":
+                    timeout = float(value)
+                elif arg == "-results":
+                    resultsPath = value
+                elif arg == "-baseline":
+                    baselinePath = value
+                elif arg == "-threshold":
+                    threshold = float(value)
+                else:
+                    cactusPath = value
+            except ValueError:
+                print(USAGE)
+                print(f"Modes: {', '.join(MODES)}")
+                sys.exit(2)
+        else:
+            patterns.append(arg)
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    if not patterns:
+        patterns = [os.path.join(root, pattern) for pattern in DEFAULT_SETS]
+    cnf_files = sorted(set(f for pattern in patterns for f in glob.glob(pattern, recursive=True) if os.path.isfile(f)))
+    if not cnf_files:
+        print("No CNF files found.")
+        sys.exit(2)
+
+    rows = []
+    with open(resultsPath, "w", newline="") as out:
+        writer = csv.DictWriter(out, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        for mode in modes:
+            for cnf_file in cnf_files:
+                row = run_instance(mode, os.path.relpath(cnf_file, root) if cnf_file.startswith(root) else cnf_file, timeout)
+                rows.append(row)
+                writer.writerow(row)
+                out.flush()
+                flag = "" if row["verdict"] in ("ok", "timeout") else "  <<< " + row["verdict"].upper()
+                print(f"{mode:16} {row['status']:8} {row['time']:8.3f}s {row['memory_mb']:8.1f}MB  {row['file']}{flag}")
+
+    wrong = [row for row in rows if row["verdict"] not in ("ok", "timeout")]
+
+    print("\n==============================")
+    print(f"{'Mode':16} {'Solved':>8} {'PAR-2':>10}")
+    scores = par2_scores(rows, timeout)
+    for mode in modes:
+        solved = sum(1 for row in rows if row["mode"] == mode and row["verdict"] == "ok")
+        print(f"{mode:16} {solved:>4}/{len(cnf_files):<3} {scores[mode]:10.3f}")
+
+    if cactusPath is not None:
+        with open(cactusPath, "w", newline="") as out:
+            writer = csv.writer(out)
+            writer.writerow(["mode", "solved", "time"])
+            for mode, points in cactus_data(rows).items():
+                for solved, solve_time in points:
+                    writer.writerow([mode, solved, solve_time])
+
+    regressions = []
+    if baselinePath is not None:
+        regressions = find_regressions(rows, read_results(baselinePath), threshold)
+        print(f"\n{len(regressions)} regressions against {baselinePath} (threshold {threshold:.0%})")
+        for regression in regressions:
+            print(f"  {regression}")
+
+    if wrong:
+        print(f"\n{len(wrong)} wrong answers:")
+        for row in wrong:
+            print(f"  {row['mode']} {row['file']}: {row['status']} ({row['verdict']}), expected {row['expected'] or 'unknown'}")
+
+    sys.exit(1 if (wrong or regressions) else 0)
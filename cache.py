@@ -0,0 +1,141 @@
+from typing import *
+import json
+import os
+import shutil
+import tempfile
+from SAT_structs import *
+
+# On-disk result cache for mySAT.py.
+# Results are keyed by the hash of the normalized clause set (CNF_Formula.fingerprint), so a file that is submitted again,
+# even with its clauses or literals in another order, is answered without solving it. Each entry is a small JSON file with the status
+# and model, and the DRAT proof of an UNSAT answer is kept next to it if one was written.
+# Entries are evicted least recently used first once the directory is larger than its size limit. A hit updates the modification time
+# of the entry, which is the LRU order. Files are written to a temporary name and renamed, so batch workers can share one cache.
+# A cached model is checked against the formula before it is returned, and dropped if it doesnt satisfy every clause.
+
+DEFAULT_CACHE_SIZE = 64     # MB
+
+# True if model (signed variable numbers, one per variable) satisfies every clause of formula
+def model_satisfies(formula: CNF_Formula, model: List[int]) -> bool:
+    if (len(model) != formula.num_vars):
+        return False
+    true_lits = bytearray(2 * formula.num_vars + 2)
+    for var in model:
+        true_lits[2 * var + 1 if var > 0 else -2 * var] = 1
+
+    # Truth value of every arena literal, so each clause is one search for a 1
+    truth = bytes(map(true_lits.__getitem__, formula.lits))
+    clause_start = formula.clause_start
+    clause_size = formula.clause_size
+    for cref in formula.crefs():
+        start = clause_start[cref]
+        if (truth.find(1, start, start + clause_size[cref]) == -1):
+            return False
+    return True
+
+class ResultCache:
+
+    def __init__(self, directory: str, max_size: int = DEFAULT_CACHE_SIZE):
+        self.directory = directory
+        self.max_bytes = max_size * 1024 * 1024
+        os.makedirs(directory, exist_ok=True)
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".json")
+
+    def proof_path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".drat")
+
+    # Returns the cached result row of formula, or None. formula must have a fingerprint
+    # If proof_file is given, the cached proof is copied there, and an UNSAT entry without a proof is a miss
+    def lookup(self, formula: CNF_Formula, proof_file: str = None) -> Dict[str, Any]:
+        key = formula.fingerprint
+        path = self.entry_path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if (entry.get("status") == "SAT"):
+            if (not model_satisfies(formula, entry["model"])):
+                self.remove(key)
+                return None
+            if (proof_file is not None):
+                open(proof_file, "wb").close()  # SAT answers have no proof
+        elif (entry.get("status") == "UNSAT"):
+            if (proof_file is not None):
+                if (not entry.get("proof")):
+                    return None
+                try:
+                    shutil.copyfile(self.proof_path(key), proof_file)
+                    os.utime(self.proof_path(key))
+                except OSError:
+                    return None
+        else:
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return {"status": entry["status"], "model": entry.get("model")}
+
+    # Stores the status and model of a result row under key (the fingerprint of its formula), and a copy of its proof if proof_file is given
+    def store(self, key: str, result: Dict[str, Any], proof_file: str = None):
+        if (result.get("status") not in ("SAT", "UNSAT")):
+            return
+        entry = {"status": result["status"], "model": result.get("model"), "proof": False}
+        if (proof_file is not None and result["status"] == "UNSAT"):
+            self.write(self.proof_path(key), source_file=proof_file)
+            entry["proof"] = True
+        self.write(self.entry_path(key), json.dumps(entry).encode())
+        self.evict()
+
+    # Writes data, or a copy of source_file, to path through a temporary file in the cache directory
+    def write(self, path: str, data: bytes = None, source_file: str = None):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                if (source_file is not None):
+                    with open(source_file, "rb") as f:
+                        shutil.copyfileobj(f, out)
+                else:
+                    out.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def remove(self, key: str):
+        for path in (self.entry_path(key), self.proof_path(key)):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    # Deletes the least recently used files until the cache fits in its size limit
+    def evict(self):
+        files = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if (entry.name.endswith(".tmp")):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue    # Evicted by another process
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+        if (total <= self.max_bytes):
+            return
+
+        files.sort()
+        for (_, size, path) in files:
+            if (total <= self.max_bytes):
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            total -= size
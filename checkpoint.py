@@ -0,0 +1,175 @@
+from typing import *
+import json
+import os
+import sys
+import tempfile
+import zlib
+from array import array
+from SAT_structs import *
+from SAT_solver import SAT_solver
+
+# Checkpoints of the CDCL solver state, so a search stopped by a budget or an interrupt can be continued in another process.
+# A checkpoint has no trail: it holds the formula clauses as the solver has them now (inprocessing may have changed them), the learned
+# units, the learned clauses with their LBD, activity and tier, the VSIDS activities, the saved phases, the substitutions of inprocessing
+# and the counters. Top level assignments are propagated again from the clauses when solving continues.
+#
+# File layout: MAGIC, the length of the header as 4 bytes little endian, the header as JSON, then the zlib compressed arrays one after
+# another. The header has the scalars and the type code and length of every array, and info, a dict the caller can use to tell which
+# instance the checkpoint belongs to. Arrays are stored in the byte order of the machine that wrote them, which the header names.
+
+MAGIC = b"mySATckp"
+VERSION = 1
+
+# Counters of the solver, its learned clause database and its inprocessor that are kept
+SOLVER_COUNTERS = ["iter_count", "conflict_cnt", "decision_cnt", "restart_cnt", "propagation_cnt", "learned_cnt", "learned_lits", "learned_lbd",
+                   "propagate_time", "analyze_time"]
+LEARNTS_COUNTERS = ["next_reduce", "reduce_cnt", "deleted_cnt", "clause_bump"]
+INPROCESSOR_COUNTERS = ["next_round", "round_cnt", "failed_cnt", "hyper_cnt", "reduced_cnt", "time", "probe_pos"]
+
+# Writes the state of solver to file_path. The file is written to a temporary name and renamed, so a checkpoint that is being written
+# when the process is killed doesnt replace the last complete one
+def save_checkpoint(solver: SAT_solver, file_path: str, info: Dict[str, Any] = None):
+    if (solver.propagator is None):
+        solver.init_search()
+    formula = solver.formula
+    prop = solver.propagator
+    learnts = solver.learnts
+    vsids = solver.vsids
+    inprocessor = solver.inprocessor
+    prop.cancel_until(0)
+
+    arrays: Dict[str, array] = {name: array(typecode) for name, typecode in [
+        ("lits", 'i'), ("sizes", 'i'), ("units", 'i'), ("learnt_lits", 'i'), ("learnt_sizes", 'i'), ("learnt_lbd", 'i'), ("learnt_activity", 'd'),
+        ("learnt_tier", 'B'), ("phase", 'B'), ("vsids_activity", 'd'), ("vsids_polarity", 'B'), ("repr", 'i'), ("substituted", 'i')]}
+    for cref in formula.crefs():
+        arrays["lits"].extend(formula.clause_lits(cref))
+        arrays["sizes"].append(formula.clause_size[cref])
+    flags = formula.clause_flags
+    for cref in range(len(flags)):
+        if (flags[cref] == CLAUSE_LEARNT and formula.clause_size[cref] == 1):
+            arrays["units"].append(formula.lits[formula.clause_start[cref]])
+    for cref in learnts.crefs:
+        arrays["learnt_lits"].extend(formula.clause_lits(cref))
+        arrays["learnt_sizes"].append(formula.clause_size[cref])
+        arrays["learnt_lbd"].append(learnts.lbd[cref])
+        arrays["learnt_activity"].append(learnts.activity[cref])
+        arrays["learnt_tier"].append(learnts.tier[cref])
+    arrays["phase"].frombytes(prop.phase)
+    if (vsids is not None):
+        arrays["vsids_activity"].extend(vsids.activity)
+        arrays["vsids_polarity"].extend(vsids.polarity)
+    arrays["repr"].extend(inprocessor.repr)
+    arrays["substituted"].extend(inprocessor.substituted)
+
+    header = {
+        "version": VERSION,
+        "byteorder": sys.byteorder,
+        "num_vars": prop.num_vars,
+        "ok": solver.ok,
+        "solver": {name: getattr(solver, name) for name in SOLVER_COUNTERS},
+        "learnts": {name: getattr(learnts, name) for name in LEARNTS_COUNTERS},
+        "inprocessor": {name: getattr(inprocessor, name) for name in INPROCESSOR_COUNTERS},
+        "vsids": None if vsids is None else {"decay_factor": vsids.decay_factor, "bump_amount": vsids.bump_amount,
+                                             "default_polarity": vsids.default_polarity},
+        "arrays": [[name, data.typecode, len(data)] for name, data in arrays.items()],
+        "info": info or {},
+    }
+    header_data = json.dumps(header).encode()
+    body = zlib.compress(b"".join(data.tobytes() for data in arrays.values()), 1)
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(file_path)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            out.write(MAGIC)
+            out.write(len(header_data).to_bytes(4, "little"))
+            out.write(header_data)
+            out.write(body)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+# Deletes the checkpoint at file_path if there is one, once its search has an answer
+def remove_checkpoint(file_path: str):
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
+
+# Reads a checkpoint written by save_checkpoint. Returns a solver that continues the search, and the info dict it was saved with
+# Raises ValueError if the file isnt a checkpoint
+def load_checkpoint(file_path: str) -> Tuple[SAT_solver, Dict[str, Any]]:
+    with open(file_path, "rb") as f:
+        data = f.read()
+    if (data[:len(MAGIC)] != MAGIC):
+        raise ValueError(f"{file_path} is not a solver checkpoint")
+    pos = len(MAGIC) + 4
+    header_len = int.from_bytes(data[len(MAGIC):pos], "little")
+    try:
+        header = json.loads(data[pos:pos + header_len])
+        body = zlib.decompress(data[pos + header_len:])
+    except (ValueError, zlib.error) as e:
+        raise ValueError(f"{file_path} is a damaged checkpoint: {e}")
+    if (header.get("version") != VERSION):
+        raise ValueError(f"{file_path} is a checkpoint of version {header.get('version')}, expected {VERSION}")
+
+    arrays: Dict[str, array] = {}
+    pos = 0
+    for name, typecode, length in header["arrays"]:
+        values = array(typecode)
+        size = length * values.itemsize
+        values.frombytes(body[pos:pos + size])
+        if (header["byteorder"] != sys.byteorder):
+            values.byteswap()
+        arrays[name] = values
+        pos += size
+
+    # Formula clauses, which are attached when the search state is created
+    num_vars = header["num_vars"]
+    formula = CNF_Formula(num_vars=num_vars)
+    formula.add_clauses(arrays["lits"], arrays["sizes"])
+    formula.num_vars = num_vars
+    formula.count_appearances()
+    solver = SAT_solver(formula)
+    solver.init_search()
+    prop = solver.propagator
+    learnts = solver.learnts
+    inprocessor = solver.inprocessor
+    solver.ok = header["ok"]
+    for name, value in header["solver"].items():
+        setattr(solver, name, value)
+
+    for lit in arrays["units"]:
+        prop.units.append(formula.add_clause([lit], learnt=True))
+    start = 0
+    learnt_lits = arrays["learnt_lits"]
+    for k, size in enumerate(arrays["learnt_sizes"]):
+        cref = learnts.add(learnt_lits[start:start + size], arrays["learnt_lbd"][k])
+        learnts.activity[cref] = arrays["learnt_activity"][k]
+        learnts.tier[cref] = arrays["learnt_tier"][k]
+        prop.attach(cref)
+        start += size
+    for name, value in header["learnts"].items():
+        setattr(learnts, name, value)
+
+    prop.phase[:] = arrays["phase"].tobytes()
+    inprocessor.repr = arrays["repr"]
+    inprocessor.substituted = arrays["substituted"].tolist()
+    for name, value in header["inprocessor"].items():
+        setattr(inprocessor, name, value)
+
+    # The heap is built again from the saved activities. Substituted variables are in no clause, so they are left out
+    settings = header["vsids"]
+    if (settings is not None):
+        vsids = VSIDS(formula, settings["decay_factor"], settings["default_polarity"])
+        vsids.activity = arrays["vsids_activity"].tolist()
+        vsids.polarity = [bool(polarity) for polarity in arrays["vsids_polarity"]]
+        vsids.bump_amount = settings["bump_amount"]
+        vsids.heap = []
+        vsids.heap_idx = [-1] * (num_vars + 1)
+        for var_idx in range(1, num_vars + 1):
+            if (formula.appearance_cnt[var_idx] > 0):
+                vsids.insert(var_idx)
+        solver.vsids = vsids
+        prop.order = vsids
+    return (solver, header["info"])
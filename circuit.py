@@ -0,0 +1,382 @@
+from typing import *
+from array import array
+from SAT_structs import *
+from dimacs import clause_set_hash
+
+# Circuit front end: reads combinational circuits in AIGER (ASCII .aag and binary .aig) and a BLIF subset (.blif) into an
+# and-inverter graph (AIG), and encodes the graph as CNF for the solver.
+# The AIG is built with structural hashing and constant propagation: an AND of two literals that already has a node reuses it, and
+# ANDs with a constant, the same literal twice or a literal and its negation are folded. Equal subcircuits, e.g. the shared parts of the
+# two sides of a miter, are merged this way before they reach the CNF.
+# The encoding is Tseitin, or by default Plaisted-Greenbaum, which only writes the clauses of the direction each gate is used in
+# (true or false), as seen from the outputs. Chains of ANDs whose inner gates have no other fanout are encoded as one wide AND,
+# which saves a variable and clauses for every inner gate. Only the gates that some output depends on are encoded.
+# The formula asserts that some output is 1, so a miter is SAT exactly if its two circuits differ. Latches are cut: their outputs
+# become free inputs, which checks the combinational part for any current state. AIGER invariant constraints are asserted as well.
+# Primary inputs get the first CNF variables, in input order, and input_values maps a model back to the input names.
+#
+# AIG literals are 2 * node + negated. Node 0 is the constant, so literal 0 is false and 1 is true.
+
+CIRCUIT_EXTENSIONS = (".aag", ".aig", ".blif")
+
+AIG_FALSE = 0
+AIG_TRUE = 1
+
+class AIG:
+
+    def __init__(self):
+        self.fanins: List[Tuple[int, int]] = [(AIG_FALSE, AIG_FALSE)]    # Fanin literals of each AND node, (-1, -1) for inputs
+        self.inputs: List[int] = []         # Input nodes, in order
+        self.input_names: List[str] = []
+        self.outputs: List[int] = []        # Output literals
+        self.output_names: List[str] = []
+        self.constraints: List[int] = []    # Literals that are assumed to be 1
+        self.strash: Dict[Tuple[int, int], int] = {}    # Fanin literals of every AND node, smaller first -> its literal
+        self.merged_cnt = 0                 # ANDs that were folded or found in strash instead of getting a new node
+
+        # Set by encode
+        self.input_vars: List[int] = []     # CNF variable of each input
+        self.gate_cnt = 0                   # Encoded AND gates, after flattening
+
+    def add_input(self, name: str) -> int:
+        node = len(self.fanins)
+        self.fanins.append((-1, -1))
+        self.inputs.append(node)
+        self.input_names.append(name)
+        return 2 * node
+
+    def add_and(self, a: int, b: int) -> int:
+        if (a > b):
+            a, b = b, a
+        # Constants are the smallest literals, so only a can be one
+        if (a == AIG_FALSE or a ^ 1 == b):
+            self.merged_cnt += 1
+            return AIG_FALSE
+        if (a == AIG_TRUE or a == b):
+            self.merged_cnt += 1
+            return b
+        key = (a, b)
+        lit = self.strash.get(key)
+        if (lit is not None):
+            self.merged_cnt += 1
+            return lit
+        lit = 2 * len(self.fanins)
+        self.fanins.append(key)
+        self.strash[key] = lit
+        return lit
+
+    def add_or(self, a: int, b: int) -> int:
+        return self.add_and(a ^ 1, b ^ 1) ^ 1
+
+    def add_output(self, lit: int, name: str):
+        self.outputs.append(lit)
+        self.output_names.append(name)
+
+    def is_and(self, node: int) -> bool:
+        return node > 0 and self.fanins[node][0] >= 0
+
+    # Encodes the circuit as CNF. With plaisted_greenbaum, gates only get the clauses of the polarity they are used in,
+    # otherwise the full Tseitin encoding, which keeps every gate a function of the inputs (needed to count or enumerate models)
+    # If fingerprint is set, the hash of the clause set is stored in formula.fingerprint, like CNF_Formula.from_dimacs_file does
+    def encode(self, plaisted_greenbaum: bool = True, fingerprint: bool = False) -> CNF_Formula:
+        fanins = self.fanins
+        node_cnt = len(fanins)
+        roots = self.outputs + self.constraints
+
+        # Gates in the cone of the outputs, and how many gates use each node. Nodes are numbered after their fanins
+        used = bytearray(node_cnt)
+        refs = array('i', [0]) * node_cnt
+        for lit in roots:
+            used[lit >> 1] = 1
+        for node in range(node_cnt - 1, 0, -1):
+            if (used[node] and self.is_and(node)):
+                for lit in fanins[node]:
+                    used[lit >> 1] = 1
+                    refs[lit >> 1] += 1
+
+        # Literals of the wide AND rooted at node: positive fanins that are gates used nowhere else are expanded
+        def leaves(node: int) -> List[int]:
+            result = []
+            stack = list(fanins[node])
+            while (stack):
+                lit = stack.pop()
+                if (lit & 1 == 0 and self.is_and(lit >> 1) and refs[lit >> 1] == 1):
+                    stack.extend(fanins[lit >> 1])
+                else:
+                    result.append(lit)
+            return list(dict.fromkeys(result))
+
+        # Polarity each gate is needed in: 1 if it must be able to imply its fanins (used true), 2 for the other direction
+        POS, NEG = 1, 2
+        polarity = bytearray(node_cnt)
+        for lit in self.outputs + self.constraints:
+            polarity[lit >> 1] |= NEG if lit & 1 else POS
+        gate_leaves: Dict[int, List[int]] = {}
+        for node in range(node_cnt - 1, 0, -1):
+            if (not polarity[node] or not self.is_and(node)):
+                continue
+            if (not plaisted_greenbaum):
+                polarity[node] = POS | NEG
+            gate_leaves[node] = node_leaves = leaves(node)
+            flipped = ((polarity[node] & POS) << 1) | ((polarity[node] & NEG) >> 1)
+            for lit in node_leaves:
+                polarity[lit >> 1] |= flipped if lit & 1 else polarity[node]
+
+        # Inputs first, then the encoded gates
+        var_of = array('i', [0]) * node_cnt
+        for var_idx, node in enumerate(self.inputs, 1):
+            var_of[node] = var_idx
+        num_vars = len(self.inputs)
+        for node in sorted(gate_leaves):
+            num_vars += 1
+            var_of[node] = num_vars
+
+        # CNF literal code of an AIG literal of an input or encoded gate
+        def code(lit: int) -> int:
+            return 2 * var_of[lit >> 1] + (1 - (lit & 1))
+
+        lits = array('i')
+        sizes = array('i')
+        for node, node_leaves in gate_leaves.items():
+            gate = code(2 * node)
+            if (any(lit ^ 1 in node_leaves for lit in node_leaves)):
+                # A leaf and its negation, so the gate is always false
+                lits.append(gate ^ 1)
+                sizes.append(1)
+                continue
+            leaf_codes = [code(lit) for lit in node_leaves]
+            if (polarity[node] & POS):
+                for leaf in leaf_codes:
+                    lits.extend((gate ^ 1, leaf))
+                    sizes.append(2)
+            if (polarity[node] & NEG):
+                lits.append(gate)
+                lits.extend(leaf ^ 1 for leaf in leaf_codes)
+                sizes.append(len(leaf_codes) + 1)
+
+        # Some output is 1, and every constraint is. A constant false output drops out, a true one satisfies the clause
+        if (self.outputs and AIG_TRUE not in self.outputs):
+            clause = [code(lit) for lit in self.outputs if lit != AIG_FALSE]
+            lits.extend(clause)
+            sizes.append(len(clause))
+        for lit in self.constraints:
+            if (lit != AIG_TRUE):
+                if (lit != AIG_FALSE):
+                    lits.append(code(lit))
+                sizes.append(0 if lit == AIG_FALSE else 1)
+
+        self.input_vars = [var_of[node] for node in self.inputs]
+        self.gate_cnt = len(gate_leaves)
+        formula = CNF_Formula(num_vars=num_vars)
+        formula.add_clauses(lits, sizes)
+        formula.count_appearances()
+        if (fingerprint):
+            formula.fingerprint = clause_set_hash(num_vars, lits, sizes)
+        return formula
+
+    # Values of the inputs in a model of the encoded formula (signed variable numbers, one per variable), by input name
+    # Inputs past the end of the model are in no clause, they are reported as 0
+    def input_values(self, model: List[int]) -> Dict[str, bool]:
+        return {name: var_idx <= len(model) and model[var_idx - 1] > 0 for name, var_idx in zip(self.input_names, self.input_vars)}
+
+# Builds the AND nodes of the signals in targets, whose definitions may refer to each other in any order
+# defs maps a signal to a function that builds it from the AIG literals of its fanin signals, and its fanin signals.
+# lits has the AIG literals of the signals that are already built, and gets the new ones
+def build_signals(aig: AIG, targets: Iterable[Hashable], defs: Dict[Hashable, Tuple[Callable[[List[int]], int], List[Hashable]]],
+                  lits: Dict[Hashable, int]):
+    visiting = set()
+    for target in targets:
+        stack = [target]
+        while (stack):
+            signal = stack[-1]
+            if (signal in lits):
+                stack.pop()
+                continue
+            if (signal not in defs):
+                raise ValueError(f"signal {signal} is used but never defined")
+            build, signal_fanins = defs[signal]
+            missing = [fanin for fanin in signal_fanins if fanin not in lits]
+            if (missing):
+                if (signal in visiting):
+                    raise ValueError(f"signal {signal} is on a combinational cycle")
+                visiting.add(signal)
+                stack.extend(missing)
+                continue
+            lits[signal] = build([lits[fanin] for fanin in signal_fanins])
+            visiting.discard(signal)
+            stack.pop()
+
+# Reads an ASCII (aag) or binary (aig) AIGER file
+def read_aiger(file_path: str) -> AIG:
+    with open(file_path, "rb") as f:
+        data = f.read()
+
+    pos = data.find(b"\n") + 1
+    header = data[:pos].split()
+    if (len(header) < 6 or header[0] not in (b"aag", b"aig")):
+        raise ValueError("not an AIGER file")
+    binary = header[0] == b"aig"
+    try:
+        max_var, num_inputs, num_latches, num_outputs, num_ands = map(int, header[1:6])
+        num_bad, num_constraints, num_justice, num_fairness = (list(map(int, header[6:10])) + [0] * 4)[:4]
+    except ValueError:
+        raise ValueError("invalid AIGER header")
+    if (num_justice or num_fairness):
+        raise ValueError("AIGER justice and fairness properties are not supported")
+
+    def line() -> List[int]:
+        nonlocal pos
+        end = data.find(b"\n", pos)
+        end = len(data) if end == -1 else end
+        values = list(map(int, data[pos:end].split()))
+        pos = end + 1
+        return values
+
+    aig = AIG()
+    lits: Dict[int, int] = {0: AIG_FALSE}   # AIGER variable -> AIG literal
+    for k in range(num_inputs):
+        var_idx = k + 1 if binary else line()[0] >> 1
+        lits[var_idx] = aig.add_input(f"i{k}")
+    for k in range(num_latches):
+        values = line()
+        var_idx = num_inputs + k + 1 if binary else values[0] >> 1
+        lits[var_idx] = aig.add_input(f"l{k}")
+    outputs = [line()[0] for _ in range(num_outputs + num_bad)]
+    constraints = [line()[0] for _ in range(num_constraints)]
+
+    defs = {}
+    for k in range(num_ands):
+        if (binary):
+            # Gates are numbered in order, each fanin is a difference to the previous literal, 7 bits per byte from the lowest
+            lhs = 2 * (num_inputs + num_latches + k + 1)
+            deltas = []
+            for _ in range(2):
+                delta = 0
+                shift = 0
+                while (True):
+                    byte = data[pos]
+                    pos += 1
+                    delta |= (byte & 127) << shift
+                    shift += 7
+                    if (not byte & 128):
+                        break
+                deltas.append(delta)
+            rhs0 = lhs - deltas[0]
+            rhs1 = rhs0 - deltas[1]
+        else:
+            lhs, rhs0, rhs1 = line()
+        defs[lhs >> 1] = ((lambda fanin, rhs0=rhs0, rhs1=rhs1: aig.add_and(fanin[0] ^ (rhs0 & 1), fanin[1] ^ (rhs1 & 1))),
+                          [rhs0 >> 1, rhs1 >> 1])
+    if (max(list(lits) + list(defs), default=0) > max_var):
+        raise ValueError(f"variable larger than the {max_var} in the AIGER header")
+
+    # Symbol table, up to the comment section
+    names = {}
+    while (pos < len(data)):
+        end = data.find(b"\n", pos)
+        end = len(data) if end == -1 else end
+        text = data[pos:end].decode(errors="replace")
+        pos = end + 1
+        if (text.rstrip() == "c"):
+            break
+        parts = text.split(" ", 1)
+        if (len(parts) == 2 and parts[0][:1] in "ilob" and parts[0][1:].isdigit()):
+            names[parts[0]] = parts[1]
+    for k in range(num_inputs + num_latches):
+        key = f"i{k}" if k < num_inputs else f"l{k - num_inputs}"
+        aig.input_names[k] = names.get(key, key)
+
+    build_signals(aig, [lit >> 1 for lit in outputs + constraints], defs, lits)
+    for k, lit in enumerate(outputs):
+        key = f"o{k}" if k < num_outputs else f"b{k - num_outputs}"
+        aig.add_output(lits[lit >> 1] ^ (lit & 1), names.get(key, key))
+    aig.constraints = [lits[lit >> 1] ^ (lit & 1) for lit in constraints]
+    return aig
+
+# AIG literal of a BLIF cover: rows of (input pattern, output value) over the fanin literals
+def blif_cover(aig: AIG, rows: List[Tuple[str, str]], fanin: List[int]) -> int:
+    if (not rows):
+        return AIG_FALSE
+    result = AIG_FALSE
+    for pattern, _ in rows:
+        cube = AIG_TRUE
+        for char, lit in zip(pattern, fanin):
+            if (char != "-"):
+                cube = aig.add_and(cube, lit if char == "1" else lit ^ 1)
+        result = aig.add_or(result, cube)
+    # Rows of the off-set describe where the output is 0
+    return result if rows[0][1] == "1" else result ^ 1
+
+# Reads the first model of a BLIF file: .inputs, .outputs, .names with single output covers, and .latch (cut like AIGER latches)
+def read_blif(file_path: str) -> AIG:
+    with open(file_path) as f:
+        text = f.read()
+
+    # Lines without comments, with continuations joined
+    lines = []
+    for raw in text.replace("\\\n", " ").splitlines():
+        raw = raw.split("#", 1)[0].strip()
+        if (raw):
+            lines.append(raw)
+
+    aig = AIG()
+    lits: Dict[str, int] = {}
+    outputs: List[str] = []
+    defs = {}
+    k = 0
+    while (k < len(lines)):
+        tokens = lines[k].split()
+        k += 1
+        keyword = tokens[0]
+        if (keyword == ".model"):
+            continue
+        elif (keyword == ".end"):
+            break
+        elif (keyword == ".inputs"):
+            for name in tokens[1:]:
+                lits[name] = aig.add_input(name)
+        elif (keyword == ".outputs"):
+            outputs.extend(tokens[1:])
+        elif (keyword == ".latch"):
+            if (len(tokens) < 3):
+                raise ValueError(".latch needs an input and an output")
+            lits[tokens[2]] = aig.add_input(tokens[2])
+        elif (keyword == ".names"):
+            if (len(tokens) < 2):
+                raise ValueError(".names needs an output")
+            fanins = tokens[1:-1]
+            rows = []
+            while (k < len(lines) and not lines[k].startswith(".")):
+                row = lines[k].split()
+                k += 1
+                pattern, value = (row[0], row[1]) if len(row) == 2 else ("", row[0])
+                if (len(pattern) != len(fanins) or any(char not in "01-" for char in pattern) or value not in ("0", "1")):
+                    raise ValueError(f"invalid cover row {' '.join(row)} of {tokens[-1]}")
+                if (rows and value != rows[0][1]):
+                    raise ValueError(f"cover of {tokens[-1]} mixes on-set and off-set rows")
+                rows.append((pattern, value))
+            defs[tokens[-1]] = ((lambda fanin, rows=rows: blif_cover(aig, rows, fanin)), fanins)
+        else:
+            raise ValueError(f"BLIF construct {keyword} is not supported")
+
+    build_signals(aig, outputs, defs, lits)
+    for name in outputs:
+        aig.add_output(lits[name], name)
+    return aig
+
+def is_circuit_file(file_path: Any) -> bool:
+    return isinstance(file_path, str) and file_path.lower().endswith(CIRCUIT_EXTENSIONS)
+
+# Reads an AIGER or BLIF file, by its extension
+def read_circuit(file_path: str) -> AIG:
+    if (file_path.lower().endswith(".blif")):
+        return read_blif(file_path)
+    return read_aiger(file_path)
+
+# Reads a DIMACS file, or a circuit file (by its extension) and encodes it. Returns the formula and the circuit, None for DIMACS
+def load_formula(file_path: Union[str, bytes], strict: bool = True, fingerprint: bool = False,
+                 plaisted_greenbaum: bool = True) -> Tuple[CNF_Formula, AIG]:
+    if (not is_circuit_file(file_path)):
+        return (CNF_Formula.from_dimacs_file(file_path, strict, fingerprint), None)
+    circuit = read_circuit(file_path)
+    return (circuit.encode(plaisted_greenbaum, fingerprint), circuit)
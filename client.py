@@ -0,0 +1,160 @@
+from typing import *
+import json
+import os
+import socket
+import sys
+
+# Client of the solver service (server.py).
+# Requests and replies are JSON objects, one per line, so a connection can have many requests in flight. Replies come in the order the
+# requests finish, and carry the id of their request. This module imports nothing from the solver, so the client starts quickly.
+# Running this file sends the files given to the service and prints one JSON result per file as it arrives.
+#
+# Requests:
+#   {"id": ID, "file": PATH}                solves a file the server can read
+#   {"id": ID, "dimacs": TEXT}              solves DIMACS text, "name" names it in the result
+#       both take "timeout" (seconds) and "options" (solver options to change, see server.CLIENT_OPTIONS)
+#   {"op": "cancel", "id": ID}              stops a queued or running request of this connection, which is answered as CANCELLED
+#   {"op": "status"}                        reports the number of workers, busy workers, queued requests and answered requests
+# A reply to a solve request is a result row like batch mode writes, with the id added and status one of SAT, UNSAT, TIMEOUT,
+# MEMOUT, CANCELLED or ERROR.
+
+USAGE = "Usage: python client.py [-socket PATH | -port N] [-timeout SECS] [-send] [-status] [*.cnf]"
+
+DEFAULT_PORT = 8734     # TCP port on localhost, if no Unix socket is used
+
+class SolverClient:
+
+    # Connects to the service on a Unix socket if socket_path is given, otherwise on localhost port
+    def __init__(self, socket_path: str = None, port: int = DEFAULT_PORT):
+        if (socket_path is not None):
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(socket_path)
+        else:
+            self.sock = socket.create_connection(("127.0.0.1", port))
+        self.reader = self.sock.makefile("rb")
+        self.next_id = 0
+        self.pending: Dict[Any, Dict[str, Any]] = {}     # Replies received while waiting for another one, by id
+
+    def send(self, message: Dict[str, Any]):
+        self.sock.sendall(json.dumps(message).encode() + b"\n")
+
+    # Next reply of the server, None if it closed the connection
+    def receive(self) -> Dict[str, Any]:
+        line = self.reader.readline()
+        if (not line):
+            return None
+        return json.loads(line)
+
+    # Sends a solve request for a file path (made absolute, since the server resolves it) or DIMACS text. Returns its id
+    def submit(self, cnf_file: str = None, dimacs: str = None, name: str = None, timeout: float = None,
+               options: Dict[str, Any] = None) -> int:
+        self.next_id += 1
+        message = {"id": self.next_id}
+        if (dimacs is not None):
+            message["dimacs"] = dimacs
+            message["name"] = name or cnf_file
+        else:
+            message["file"] = os.path.abspath(cnf_file)
+        if (timeout is not None):
+            message["timeout"] = timeout
+        if (options):
+            message["options"] = options
+        self.send(message)
+        return self.next_id
+
+    # Waits for the reply to request_id
+    def result(self, request_id: Any) -> Dict[str, Any]:
+        while (request_id not in self.pending):
+            reply = self.receive()
+            if (reply is None):
+                raise ConnectionError("the solver service closed the connection")
+            self.pending[reply.get("id")] = reply
+        return self.pending.pop(request_id)
+
+    # Solves one file or DIMACS text and waits for the result row
+    def solve(self, cnf_file: str = None, dimacs: str = None, timeout: float = None, options: Dict[str, Any] = None) -> Dict[str, Any]:
+        return self.result(self.submit(cnf_file, dimacs, timeout=timeout, options=options))
+
+    def cancel(self, request_id: Any):
+        self.send({"op": "cancel", "id": request_id})
+
+    def status(self) -> Dict[str, Any]:
+        self.send({"op": "status", "id": "status"})
+        return self.result("status")
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+if __name__ == "__main__":
+    socketPath = None
+    port = DEFAULT_PORT
+    timeout = None
+    sendText = False
+    showStatus = False
+    cnf_files = []
+
+    args = sys.argv[1:]
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        i += 1
+        if arg == "-send":
+            sendText = True
+        elif arg == "-status":
+            showStatus = True
+        elif arg in ("-socket", "-port", "-timeout"):
+            if i >= len(args):
+                print(USAGE)
+                sys.exit(1)
+            value = args[i]
+            i += 1
+            try:
+                if arg == "-socket":
+                    socketPath = value
+                elif arg == "-port":
+                    port = int(value)
+                else:
+                    timeout = float(value)
+            except ValueError:
+                print(USAGE)
+                sys.exit(1)
+        else:
+            cnf_files.append(arg)
+
+    if not (cnf_files or showStatus):
+        print(USAGE)
+        sys.exit(1)
+
+    try:
+        client = SolverClient(socketPath, port)
+    except OSError as e:
+        print(f"Cant connect to the solver service: {e}")
+        sys.exit(1)
+
+    if showStatus:
+        print(json.dumps(client.status()))
+
+    # Every file is sent first, so the server can solve them in parallel, and results are printed as they arrive
+    failed = False
+    ids = []
+    for cnf_file in cnf_files:
+        if sendText:
+            try:
+                with open(cnf_file) as f:
+                    ids.append(client.submit(cnf_file, dimacs=f.read(), timeout=timeout))
+            except (OSError, UnicodeDecodeError) as e:
+                print(json.dumps({"file": cnf_file, "status": "ERROR", "error": str(e)}))
+                failed = True
+        else:
+            ids.append(client.submit(cnf_file, timeout=timeout))
+
+    for _ in ids:
+        reply = client.receive()
+        if (reply is None):
+            print("The solver service closed the connection")
+            sys.exit(1)
+        print(json.dumps(reply), flush=True)
+        failed = failed or reply.get("status") not in ("SAT", "UNSAT")
+    client.close()
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,301 @@
+from typing import *
+import collections
+import math
+import multiprocessing
+import multiprocessing.connection
+import time
+from array import array
+from SAT_structs import *
+from SAT_solver import SAT_solver
+from preprocess import Preprocessor
+from batch import limit_memory
+from circuit import load_formula
+
+# Cube-and-conquer mode for mySAT.py.
+# A lookahead splits the formula into cubes: partial assignments whose search spaces together cover the formula. Each split picks the
+# variable whose two values propagate the most (the product of the number of assignments each value implies), and failed literals found on
+# the way are added to the cube. The cubes are then solved by worker processes, each keeping one incremental SAT_solver that solves
+# one cube at a time with the cube as its assumptions, so clauses learned on one cube help with the next.
+# Workers take the next cube from a shared queue as soon as they are idle. The queue is kept by the parent and cubes are sent over pipes,
+# instead of workers stealing cubes from each other: processes dont share memory, and the conflict budget already splits a cube that
+# keeps one worker busy for too long. A cube that uses up its conflict budget is split again by
+# the worker, and its two halves go to the front of the queue with twice the budget. The failed assumptions of a refuted cube also refute
+# every queued cube that contains them, so those are dropped.
+# The first SAT cube ends the run. The formula is UNSAT once every cube is refuted.
+
+DEFAULT_CUBES_PER_WORKER = 4
+DEFAULT_CUBE_BUDGET = 2000      # Conflicts a cube gets before it is split again
+
+# Lookahead over a formula. The cube being split is decided on a CNF_Propagator, one literal per level, and each candidate value
+# is propagated on a level of its own on top of it
+class Lookahead:
+
+    # max_candidates: only this many unassigned variables, those in the most clauses, are looked ahead on
+    def __init__(self, formula: CNF_Formula, max_candidates: int = 40):
+        # Propagation reorders the literals of clauses to keep its watches, so the lookahead works on its own copy of the formula
+        formula = formula.copy()
+
+        self.formula = formula
+        self.prop = CNF_Propagator(formula)
+        self.prop.save_phases = False
+        self.ok = self.prop.assign_units() is None
+        self.max_candidates = max_candidates
+        counts = formula.appearance_cnt
+        self.order = sorted((var_idx for var_idx in range(1, formula.num_vars + 1) if counts[var_idx] > 0), key=lambda var_idx: -counts[var_idx])
+        self.probe_cnt = 0
+
+    # Decides the literals of cube. Returns False if that gives a conflict
+    def apply(self, cube: Sequence[int]) -> bool:
+        prop = self.prop
+        prop.cancel_until(0)
+        if (not self.ok):
+            return False
+        for lit in cube:
+            if (prop.value[lit] == L_FALSE):
+                return False
+            if (prop.value[lit] == L_UNDEF):
+                prop.decide(lit)
+                if (prop.propagate() is not None):
+                    return False
+        return True
+
+    # Number of assignments lit implies on top of the current assignment, or -1 if it gives a conflict
+    def probe(self, lit: int) -> int:
+        prop = self.prop
+        level = prop.decision_level()
+        trail_size = len(prop.trail)
+        prop.decide(lit)
+        conflict = prop.propagate()
+        implied = len(prop.trail) - trail_size
+        prop.cancel_until(level)
+        self.probe_cnt += 1
+        return -1 if conflict is not None else implied
+
+    # Picks the variable to split the cube that was applied last on
+    # Returns (variable, implied literals), where failed literals were found to imply the literals, which are assigned now.
+    # The variable is 0 if every variable is assigned, and -1 if the cube conflicts
+    def split(self) -> Tuple[int, List[int]]:
+        prop = self.prop
+        value = prop.value
+        implied = []
+        best = 0
+        best_score = -1
+        checked = 0
+        for var_idx in self.order:
+            if (checked >= self.max_candidates):
+                break
+            if (value[2 * var_idx] != L_UNDEF):
+                continue
+            checked += 1
+            pos = self.probe(2 * var_idx + 1)
+            neg = self.probe(2 * var_idx)
+            if (pos == -1 and neg == -1):
+                return (-1, implied)
+            if (pos == -1 or neg == -1):
+                # Failed literal: the other value holds under the cube
+                lit = 2 * var_idx if pos == -1 else 2 * var_idx + 1
+                implied.append(lit)
+                prop.decide(lit)
+                if (prop.propagate() is not None):
+                    return (-1, implied)
+                continue
+            score = (pos + 1) * (neg + 1)
+            if (score > best_score):
+                best = var_idx
+                best_score = score
+        return (best, implied)
+
+    # Splits cube in two. Returns the two cubes, one if the cube fully assigns the formula, and none if it is refuted
+    def split_cube(self, cube: List[int]) -> List[List[int]]:
+        if (not self.apply(cube)):
+            return []
+        var_idx, implied = self.split()
+        if (var_idx == -1):
+            return []
+        if (var_idx == 0):
+            return [cube + implied]
+        return [cube + implied + [2 * var_idx + 1], cube + implied + [2 * var_idx]]
+
+    # Splits the formula into up to 2^depth cubes. Returns the cubes and the number of refuted ones
+    def make_cubes(self, depth: int) -> Tuple[List[List[int]], int]:
+        cubes = []
+        refuted = 0
+        stack = [[]]
+        depths = [0]
+        while (stack):
+            cube = stack.pop()
+            cube_depth = depths.pop()
+            halves = self.split_cube(cube) if cube_depth < depth else [cube]
+            if (not halves):
+                refuted += 1
+            elif (len(halves) == 1):
+                cubes.append(halves[0])
+            else:
+                stack.extend(halves)
+                depths.extend([cube_depth + 1] * 2)
+        return (cubes, refuted)
+
+# Entry point of a worker process. Receives (cube, budget) pairs and answers each with
+#   ("SAT", model, conflicts), ("UNSAT", failed assumptions or None if the formula is UNSAT, conflicts), or ("SPLIT", cubes, conflicts)
+# A None message stops the worker. A worker that runs out of memory answers ("MEMOUT", None, 0) and stops
+def cube_worker(formula: CNF_Formula, options: Dict[str, Any], mem_limit: int, conn: multiprocessing.connection.Connection):
+    limit_memory(mem_limit)
+    # The solver changes its formula in place (learned clauses, inprocessing), so the lookahead gets the clauses as they were given
+    original = formula.copy()
+    solver = SAT_solver(formula)
+    solver.inprocess = options.get("inprocess", True)
+    lookahead = None
+
+    while (True):
+        task = conn.recv()
+        if (task is None):
+            break
+        cube, budget = task
+        conflicts = solver.conflict_cnt
+        solver.set_budget(conflicts=budget)
+        try:
+            model = solver.solve(useVSIDS=options["vsids"], restarts=options["restarts"], phaseSaving=options["phase_saving"],
+                                 decay=options.get("decay", 0.95), defaultPhase=options.get("default_phase", False),
+                                 seed=options.get("seed"), assumptions=cube)
+            if (solver.status == "UNKNOWN"):
+                # Lookahead is only set up once a cube is too hard
+                if (lookahead is None):
+                    lookahead = Lookahead(original)
+                conn.send(("SPLIT", lookahead.split_cube(cube), solver.conflict_cnt - conflicts))
+                continue
+        except MemoryError:
+            conn.send(("MEMOUT", None, 0))
+            break
+
+        if (model is not None):
+            conn.send(("SAT", model, solver.conflict_cnt - conflicts))
+        else:
+            conn.send(("UNSAT", solver.core if solver.ok else None, solver.conflict_cnt - conflicts))
+    conn.close()
+
+# Solves cnf_file by cube-and-conquer with jobs worker processes
+# cubes is the number of cubes the lookahead aims for (cubes_per_worker per worker by default), budget the conflicts each cube gets
+# before it is split again. timeout is the wall clock limit of the whole run in seconds, mem_limit the memory limit of each worker in MB
+# Returns a result row like solve_instance, status is SAT, UNSAT or TIMEOUT. If a worker dies without a result its cube is lost, so the
+# run can only still find a model: it ends with MEMOUT or ERROR (with an error message) unless another worker finds one
+def run_cube_and_conquer(cnf_file: str, options: Dict[str, Any], jobs: int, timeout: float = None, mem_limit: int = None, cubes: int = None,
+                         budget: int = DEFAULT_CUBE_BUDGET) -> Dict[str, Any]:
+    start_time = time.time()
+    formula, circuit = load_formula(cnf_file)
+    stats = {"parse_time": time.time() - start_time}
+    result = {"file": cnf_file, "conflicts": 0, "decisions": None, "restarts": None, "iterations": 0, "model": None, "stats": stats}
+
+    preprocessor = None
+    if (options.get("preprocess", True)):
+        preprocess_start = time.time()
+        preprocessor = Preprocessor(formula)
+        formula = preprocessor.simplify()
+        stats["preprocess_time"] = time.time() - preprocess_start
+
+    lookahead_start = time.time()
+    lookahead = Lookahead(formula)
+    depth = math.ceil(math.log2(max(2, cubes or DEFAULT_CUBES_PER_WORKER * jobs)))
+    queue, refuted = lookahead.make_cubes(depth)
+    queue = collections.deque((cube, budget) for cube in queue)
+    stats.update(lookahead_time=time.time() - lookahead_start, cubes=len(queue), refuted=refuted, splits=0, pruned=0)
+    if (options["debug"]):
+        print(f"Lookahead made {len(queue)} cubes of depth {depth}, {refuted} refuted")
+
+    status = "UNSAT"
+    model = None
+    failure = None      # Status and error of the last worker that died
+    lost = False        # A cube was lost with its worker
+    # Drops a worker that died or ran out of memory. SIGKILL is what the OOM killer sends
+    def worker_failed(conn: multiprocessing.connection.Connection, memout: bool = False) -> Dict[str, Any]:
+        proc = next(proc for worker_conn, proc in workers if worker_conn is conn)
+        proc.join()
+        if (memout):
+            return {"status": "MEMOUT", "error": "cube worker ran out of memory"}
+        status = "MEMOUT" if (mem_limit is not None and proc.exitcode == -9) else "ERROR"
+        return {"status": status, "error": f"cube worker exited with code {proc.exitcode}"}
+    workers: List[Tuple[multiprocessing.connection.Connection, multiprocessing.Process]] = []
+    busy: Dict[multiprocessing.connection.Connection, Tuple[List[int], int]] = {}
+    try:
+        if (queue):
+            for _ in range(min(jobs, len(queue))):
+                conn, worker_conn = multiprocessing.Pipe()
+                proc = multiprocessing.Process(target=cube_worker, args=(formula, options, mem_limit, worker_conn), daemon=True)
+                proc.start()
+                worker_conn.close()
+                workers.append((conn, proc))
+        idle = [conn for conn, _ in workers]
+
+        while (queue or busy):
+            # Idle workers take the next cube
+            while (idle and queue):
+                conn = idle.pop()
+                try:
+                    conn.send(queue[0])
+                except OSError:
+                    failure = worker_failed(conn)
+                    continue
+                busy[conn] = queue.popleft()
+            if (not busy):
+                break   # Every worker died
+
+            wait_time = None if timeout is None else max(0, start_time + timeout - time.time())
+            ready = multiprocessing.connection.wait(list(busy), wait_time)
+            if (not ready):
+                status = "TIMEOUT"
+                break
+
+            for conn in ready:
+                cube, cube_budget = busy.pop(conn)
+                try:
+                    answer, data, conflicts = conn.recv()
+                except (EOFError, OSError):
+                    answer = None
+                if (answer is None or answer == "MEMOUT"):
+                    # Its cube is lost. The other workers go on in case they find a model
+                    failure = worker_failed(conn, answer == "MEMOUT")
+                    lost = True
+                    continue
+                result["conflicts"] += conflicts
+                idle.append(conn)
+
+                if (answer == "SAT"):
+                    status = "SAT"
+                    model = data
+                    break
+                elif (answer == "SPLIT"):
+                    stats["splits"] += 1
+                    queue.extendleft((half, 2 * cube_budget) for half in data)
+                    if (not data):
+                        stats["refuted"] += 1
+                elif (data is None):
+                    # UNSAT without assumptions, so every cube is refuted, also the cubes of workers that died
+                    queue.clear()
+                    busy.clear()
+                    lost = False
+                    break
+                else:
+                    stats["refuted"] += 1
+                    core = set(data)
+                    kept = collections.deque(task for task in queue if not core.issubset(task[0]))
+                    stats["pruned"] += len(queue) - len(kept)
+                    queue = kept
+            if (status == "SAT"):
+                break
+    finally:
+        for conn, proc in workers:
+            proc.kill()
+            proc.join()
+            conn.close()
+
+    if (status == "UNSAT" and (lost or queue)):
+        status = failure["status"]
+        result["error"] = failure["error"]
+    result["status"] = status
+    if (status == "SAT"):
+        if (preprocessor is not None):
+            model = [None] + preprocessor.extend_model(model)[1:]
+        result["model"] = [var if model[var] else -var for var in range(1, len(model))]
+        if (circuit is not None):
+            result["inputs"] = circuit.input_values(result["model"])
+    result["time"] = time.time() - start_time
+    return result
@@ -0,0 +1,144 @@
+from typing import *
+from array import array
+from itertools import accumulate, compress
+import bz2
+import gzip
+import hashlib
+import io
+import lzma
+import mmap
+import operator
+import re
+
+# Loader for DIMACS CNF files.
+# The file is read in large chunks (memory mapped when uncompressed), and each chunk is tokenized in bulk with bytes.split,
+# and converted to literal codes with one list comprehension per chunk. Clauses may span several lines.
+# .gz, .xz and .bz2 files are decompressed transparently, detected by their magic bytes.
+
+CHUNK_SIZE = 1 << 22
+
+# Comment lines and the problem line. A line starting with % ends the formula, some SATLIB files have one before a trailing 0
+COMMENT_RE = re.compile(rb"^[ \t]*(?:c[^\n]*|p[^\n]*)$", re.M)
+HEADER_RE = re.compile(rb"^[ \t]*p[ \t]+cnf[ \t]+(\d+)[ \t]+(\d+)", re.M)
+END_RE = re.compile(rb"^[ \t]*%", re.M)
+
+# Opens file as a binary stream, decompressing it if needed
+def open_dimacs(file_path: str) -> BinaryIO:
+    with open(file_path, "rb") as f:
+        magic = f.read(6)
+
+    if (magic.startswith(b"\x1f\x8b")):
+        return gzip.open(file_path, "rb")
+    elif (magic.startswith(b"\xfd7zXZ\x00")):
+        return lzma.open(file_path, "rb")
+    elif (magic.startswith(b"BZh")):
+        return bz2.open(file_path, "rb")
+    return open(file_path, "rb")
+
+# Slices data (bytes or a memory map) into chunks that end on a line boundary
+def split_chunks(data: Union[bytes, mmap.mmap]) -> Iterator[bytes]:
+    pos = 0
+    size = len(data)
+    while (pos < size):
+        end = data.find(b"\n", min(pos + CHUNK_SIZE, size))
+        end = size if end == -1 else end + 1
+        yield data[pos:end]
+        pos = end
+
+# Splits the file into chunks that end on a line boundary. file_path can also be the DIMACS text itself, as bytes
+def read_chunks(file_path: Union[str, bytes]) -> Iterator[bytes]:
+    if (isinstance(file_path, bytes)):
+        yield from split_chunks(file_path)
+        return
+
+    f = open_dimacs(file_path)
+    with f:
+        # Uncompressed files are memory mapped, so chunks are sliced without extra reads
+        if (isinstance(f, io.BufferedReader)):
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                return  # Empty file
+            with mm:
+                yield from split_chunks(mm)
+            return
+
+        rest = b""
+        while (True):
+            data = f.read(CHUNK_SIZE)
+            if (not data):
+                break
+            data = rest + data
+            cut = data.rfind(b"\n") + 1
+            if (cut == 0):
+                rest = data
+                continue
+            rest = data[cut:]
+            yield data[:cut]
+        if (rest):
+            yield rest
+
+# Reads a DIMACS CNF file, or DIMACS text given as bytes
+# Returns (num_vars, lits, sizes): literal codes (2*var_idx + sign) of every clause packed one after another, and the size of each clause
+# If strict, the clause count and largest variable are checked against the p cnf header, and a ValueError is raised if they dont match
+def read_dimacs(file_path: Union[str, bytes], strict: bool = True) -> Tuple[int, array, array]:
+    lits = array("i")
+    sizes = array("i")
+    header: Tuple[int, int] = None
+    pending: List[int] = []     # Literals of a clause that continues in the next chunk
+
+    for chunk in read_chunks(file_path):
+        if (header is None):
+            match = HEADER_RE.search(chunk)
+            if (match is not None):
+                header = (int(match.group(1)), int(match.group(2)))
+
+        # Everything after a % line is ignored
+        end = END_RE.search(chunk)
+        if (end is not None):
+            chunk = chunk[:end.start()]
+
+        try:
+            ints = pending + list(map(int, COMMENT_RE.sub(b"", chunk).split()))
+        except ValueError as e:
+            raise ValueError(f"invalid literal in clause ({e})")
+
+        # Clause boundaries are the zeros. Positions and sizes are found with C level iterators instead of a Python loop
+        zeros = list(compress(range(len(ints)), map(operator.not_, ints)))
+        sizes.extend(map(operator.sub, zeros, map((1).__add__, [-1] + zeros)))
+        pos = zeros[-1] + 1 if zeros else 0
+        pending = ints[pos:]
+
+        lits.extend([2 * v + 1 if v > 0 else -2 * v for v in ints[:pos] if v != 0])
+
+        if (end is not None):
+            break
+
+    # Last clause may be missing its terminating 0
+    if (pending):
+        sizes.append(len(pending))
+        lits.extend([2 * v + 1 if v > 0 else -2 * v for v in pending])
+
+    max_var = (max(lits) >> 1) if lits else 0
+    if (header is None):
+        return (max_var, lits, sizes)
+
+    num_vars, num_clauses = header
+    if (strict):
+        if (max_var > num_vars):
+            raise ValueError(f"variable {max_var} is larger than the {num_vars} variables in the p cnf header")
+        if (len(sizes) != num_clauses):
+            raise ValueError(f"found {len(sizes)} clauses, but the p cnf header has {num_clauses}")
+
+    return (max(num_vars, max_var), lits, sizes)
+
+# SHA-256 of the normalized clause set: literals of each clause sorted without duplicates, clauses sorted without duplicates.
+# Formulas that differ only in clause or literal order get the same hash. The number of variables is part of it, since models cover all of them
+def clause_set_hash(num_vars: int, lits: array, sizes: array) -> str:
+    ends = list(accumulate(sizes))
+    clauses = map(lits.__getitem__, map(slice, [0] + ends[:-1], ends))
+    # Clauses are compared as the bytes of their literal codes. Codes are never 0, so a zero separates the clauses
+    keys = {array("i", sorted(set(clause))).tobytes() for clause in clauses}
+    digest = hashlib.sha256(f"{num_vars} {len(keys)}\n".encode())
+    digest.update(b"\0\0\0\0".join(sorted(keys)))
+    return digest.hexdigest()
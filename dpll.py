@@ -1,120 +1,190 @@
-import sys
-
-def parse_dimacs_file(filepath):
-    clauses = []
-    with open(filepath, 'r') as file:
-        for line in file:
-            line = line.strip()
-            if line == '' or line.startswith('c') or line.startswith('p'):
-                continue
-            literals = list(map(int, line.split()))
-            if literals[-1] == 0:
-                literals = literals[:-1]
-            clauses.append(literals)
-    return clauses
-
-def getUnsatisfiedClauses(clauses, assignment):
-    unsatisfied = []
-
-    for clause in clauses:
-        clause_satisfied = False
-        for lit in clause:
-            var = abs(lit)
-            val = assignment.get(var)
-            if val is not None:
-                if (lit > 0 and val) or (lit < 0 and not val):
-                    clause_satisfied = True
-                    break
-        if not clause_satisfied:
-            unsatisfied.append(clause)
-    return unsatisfied
-
-def dpll(clauses, assignment, depth, log=False):
-    if depth == 0:
-        dpll.total_iterations = 0
-        
-    dpll.total_iterations += 1
-
-    indent = "\t" * depth
-    if log == True:
-        print(f"{indent}dpll")
-        print(f"{indent}\tclauses: {clauses}")
-        print(f"{indent}\tassignment: {assignment}")
-
-    clauses = getUnsatisfiedClauses(clauses, assignment)
-    if log == True:
-        print(f"{indent}\tUnsatisfied clauses: {clauses}")
-
-    if len(clauses) == 0:
-        return (assignment, dpll.total_iterations)
-
-    simplifiedClauses = []
-    for clause in clauses:
-        simplifiedClause = [lit for lit in clause if assignment.get(abs(lit)) != (-lit > 0)]
-        if not simplifiedClause:
-            if log == True:
-                print(f"{indent}\tConflict for {assignment}")
-            return (False, dpll.total_iterations)
-        simplifiedClauses.append(simplifiedClause)
-
-    if log == True:
-        print(f"{indent}\tsimplified_clause: {simplifiedClauses}")
-
-    variable = abs(simplifiedClauses[0][0])
-
-    if log == True:
-        print(f"{indent}\tSet Assignment Var {variable} to True")
-    assignmentCopy = dict(assignment)
-    assignmentCopy[variable] = True
-    (result, iterations) = dpll(simplifiedClauses, assignmentCopy, depth + 1, log)
-    
-    if result == False:
-        if log == True:
-            print(f"{indent}\tSet Assignment Var {variable} to False")
-        assignmentCopy = dict(assignment)
-        assignmentCopy[variable] = False
-        (result, iterations) = dpll(simplifiedClauses, assignmentCopy, depth + 1, log)
-        if result:
-            return (result, dpll.total_iterations)
-        else:
-            return (False, dpll.total_iterations)
-    else:
-        return (result, dpll.total_iterations)
-
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python basic_sat.py *.cnf")
-        sys.exit(1)
-
-    cnf_files = sys.argv[1:]
-
-    if not cnf_files:
-        print("No CNF files provided.")
-        sys.exit(1)
-
-    for cnf_file in cnf_files:
-        print(f"--- Solving {cnf_file} ---")
-        try:
-            clauses = parse_dimacs_file(cnf_file)
-        except Exception as e:
-            print(f"Failed to parse {cnf_file}: {e}")
-            continue  # Skip broken files
-
-        start_time = time.time()
-
-        solution = dpll(clauses, {}, 0)
-
-        end_time = time.time()
-        difference = end_time - start_time
-
-        if solution:
-            print("SAT")
-            print("Assignment:", solution)
-        else:
-            print("UNSAT")
-
-        successful_files += 1
-        total_time += difference
-
-    print(f"Time difference: {total_time:.4f} seconds\n")
-    print(f"Average iter_count over {total_iterations} successful files: {successful_files:.2f}")
+import sys
+import time
+from dimacs import read_dimacs
+
+# Returns the clauses of a DIMACS file as lists of signed variable numbers
+def parse_dimacs_file(filepath):
+    num_vars, lits, sizes = read_dimacs(filepath)
+    clauses = []
+    start = 0
+    for size in sizes:
+        clauses.append([(lit >> 1) if lit & 1 else -(lit >> 1) for lit in lits[start:start + size]])
+        start += size
+    return clauses
+
+# Plain DPLL, used as a baseline for the CDCL solver. There is no clause learning, backtracking is chronological.
+# The search is iterative: assignments are made in place and recorded on a trail, which doubles as the undo log,
+# and a stack of decisions remembers where each branch starts and if its second value was tried yet.
+# Every clause keeps a count of its true and false literals, so assigning or unassigning a literal only visits the clauses it occurs in.
+# Unit clauses and pure literals are assigned without branching.
+def dpll(clauses, log=False):
+    num_vars = max((abs(lit) for clause in clauses for lit in clause), default=0)
+    iterations = 1
+
+    # Literal lit is stored at index lit + num_vars
+    clauses = [list(dict.fromkeys(clause)) for clause in clauses]
+    occurs = [[] for _ in range(2 * num_vars + 1)]
+    for i, clause in enumerate(clauses):
+        for lit in clause:
+            occurs[lit + num_vars].append(i)
+
+    value = [None] * (num_vars + 1)
+    true_cnt = [0] * len(clauses)
+    false_cnt = [0] * len(clauses)
+    active = [len(occ) for occ in occurs]   # Number of unsatisfied clauses each literal is in
+
+    trail = []          # Assigned literals, in order
+    decisions = []      # (trail index, decision literal, True if it is the second value) per open branch
+    units = []          # Last unassigned literals of unit clauses
+    pures = []          # Literals whose negation may have left every unsatisfied clause
+
+    # Assigns literal. Returns False if that falsifies a clause
+    def assign(lit):
+        value[abs(lit)] = lit > 0
+        trail.append(lit)
+        ok = True
+        for i in occurs[lit + num_vars]:
+            true_cnt[i] += 1
+            if (true_cnt[i] == 1):
+                for other in clauses[i]:
+                    active[other + num_vars] -= 1
+                    if (active[other + num_vars] == 0 and value[abs(other)] is None):
+                        pures.append(-other)
+        for i in occurs[-lit + num_vars]:
+            false_cnt[i] += 1
+            if (true_cnt[i] == 0):
+                if (false_cnt[i] == len(clauses[i])):
+                    ok = False
+                elif (false_cnt[i] == len(clauses[i]) - 1):
+                    for other in clauses[i]:
+                        if (value[abs(other)] is None):
+                            units.append(other)
+                            break
+        return ok
+
+    # Unassigns the trail down to size
+    def undo(size):
+        while (len(trail) > size):
+            lit = trail.pop()
+            value[abs(lit)] = None
+            for i in occurs[lit + num_vars]:
+                true_cnt[i] -= 1
+                if (true_cnt[i] == 0):
+                    for other in clauses[i]:
+                        active[other + num_vars] += 1
+            for i in occurs[-lit + num_vars]:
+                false_cnt[i] -= 1
+
+    # Assigns unit and pure literals until there are none left. Returns False on conflict
+    # A unit literal that is already assigned is skipped: if it was false, the assignment that made it false found the conflict
+    def propagate():
+        while (units or pures):
+            if (units):
+                lit = units.pop()
+                if (value[abs(lit)] is None and not assign(lit)):
+                    units.clear()
+                    pures.clear()
+                    return False
+                continue
+
+            # Pure literals cant falsify a clause, since every clause with their negation is satisfied
+            lit = pures.pop()
+            if (value[abs(lit)] is None and active[-lit + num_vars] == 0 and active[lit + num_vars] > 0):
+                assign(lit)
+        return True
+
+    # Empty clauses and unit clauses of the formula
+    for i, clause in enumerate(clauses):
+        if (not clause):
+            return (None, iterations)
+        if (len(clause) == 1):
+            units.append(clause[0])
+    # Literals whose negation never appears are pure
+    for var_idx in range(1, num_vars + 1):
+        if (active[var_idx + num_vars] > 0 and active[-var_idx + num_vars] == 0):
+            pures.append(var_idx)
+        elif (active[-var_idx + num_vars] > 0 and active[var_idx + num_vars] == 0):
+            pures.append(-var_idx)
+
+    ok = propagate()
+    while (True):
+        if (not ok):
+            # Backtrack to the latest branch that still has its second value left
+            while (decisions and decisions[-1][2]):
+                decisions.pop()
+            if (not decisions):
+                return (None, iterations)
+            trail_size, lit, _ = decisions.pop()
+            undo(trail_size)
+            if (log == True):
+                print(f"{chr(9) * len(decisions)}Conflict, set {abs(lit)} to {lit < 0}")
+            decisions.append((trail_size, -lit, True))
+            iterations += 1
+            ok = assign(-lit) and propagate()
+            if (not ok):
+                units.clear()
+                pures.clear()
+            continue
+
+        # Branch on the unassigned variable in the most unsatisfied clauses, with its more common sign
+        best = 0
+        best_cnt = 0
+        for var_idx in range(1, num_vars + 1):
+            if (value[var_idx] is None):
+                cnt = active[var_idx + num_vars] + active[-var_idx + num_vars]
+                if (cnt > best_cnt):
+                    best = var_idx
+                    best_cnt = cnt
+        # Every clause is satisfied
+        if (best == 0):
+            assignment = {var_idx: bool(value[var_idx]) for var_idx in range(1, num_vars + 1)}
+            return (assignment, iterations)
+
+        lit = best if active[best + num_vars] >= active[-best + num_vars] else -best
+        if (log == True):
+            print(f"{chr(9) * len(decisions)}Set {best} to {lit > 0}")
+        decisions.append((len(trail), lit, False))
+        iterations += 1
+        ok = assign(lit) and propagate()
+        if (not ok):
+            units.clear()
+            pures.clear()
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python dpll.py *.cnf")
+        sys.exit(1)
+
+    cnf_files = sys.argv[1:]
+    successful_files = 0
+    total_time = 0
+    total_iterations = 0
+
+    for cnf_file in cnf_files:
+        print(f"--- Solving {cnf_file} ---")
+        try:
+            clauses = parse_dimacs_file(cnf_file)
+        except Exception as e:
+            print(f"Failed to parse {cnf_file}: {e}")
+            continue  # Skip broken files
+
+        start_time = time.time()
+
+        (solution, iterations) = dpll(clauses)
+
+        end_time = time.time()
+        difference = end_time - start_time
+
+        if solution is not None:
+            print("SAT")
+            print("Assignment:", solution)
+        else:
+            print("UNSAT")
+
+        successful_files += 1
+        total_time += difference
+        total_iterations += iterations
+
+    if successful_files > 0:
+        print(f"Time difference: {total_time:.4f} seconds\n")
+        print(f"Average iter_count over {successful_files} successful files: {total_iterations / successful_files:.2f}")
@@ -0,0 +1,298 @@
+from typing import *
+import glob
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from SAT_structs import *
+from dimacs import read_dimacs
+
+# DRAT proofs for UNSAT answers.
+# DRATWriter logs every clause the solver (and the preprocessor) adds or deletes, so a checker can certify an UNSAT answer
+# against the original formula. Steps are encoded into a byte buffer, which is written out once it is full, so the conflict loop
+# doesnt make a system call per learned clause. Proofs are binary DRAT by default, text DRAT (as drat-trim reads it) on request.
+# DRATChecker is a small forward checker for these proofs: each added clause must be RUP (unit propagating its negation gives a conflict)
+# or RAT on its first literal. It is meant for tests on small instances, drat-trim is much faster.
+# Running this file solves UNSAT instances with proof logging and checks the proofs, with drat-trim if it is installed.
+
+USAGE = "Usage: python drat.py [-text] [*.cnf] | python drat.py -check FILE.cnf PROOF"
+
+DEFAULT_SETS = ["aim/*-no-*.cnf"]
+
+class DRATWriter:
+
+    # out is a binary stream. Steps are kept in memory until buffer_size bytes are pending
+    def __init__(self, out: BinaryIO, binary: bool = True, buffer_size: int = 1 << 16):
+        self.out = out
+        self.binary = binary
+        self.buffer = bytearray()
+        self.buffer_size = buffer_size
+        self.codes: List[bytes] = []    # Encoded form of each literal code, extended as larger literals show up
+
+        # Binary steps start with 'a' or 'd' and end with a zero byte, text steps end with 0 and a new line
+        if (binary):
+            self.add_prefix, self.delete_prefix, self.end = b"a", b"d", b"\0"
+        else:
+            self.add_prefix, self.delete_prefix, self.end = b"", b"d ", b"0\n"
+
+        self.added_cnt = 0
+        self.deleted_cnt = 0
+
+    @staticmethod
+    def open(file_path: str, binary: bool = True) -> "DRATWriter":
+        return DRATWriter(open(file_path, "wb"), binary)
+
+    # Encodes the literal codes up to lit. In binary DRAT literal l is the number 2|l| + (l < 0), which is the literal code with the
+    # sign bit flipped, written 7 bits at a time from the lowest, with the high bit set on all but the last byte
+    def grow(self, lit: int):
+        codes = self.codes
+        for code in range(len(codes), lit + 1):
+            if (self.binary):
+                u = code ^ 1
+                data = bytearray()
+                while (u > 127):
+                    data.append((u & 127) | 128)
+                    u >>= 7
+                data.append(u)
+                codes.append(bytes(data))
+            else:
+                codes.append(f"{code >> 1 if code & 1 else -(code >> 1)} ".encode())
+
+    def write(self, prefix: bytes, lits: Iterable[int]):
+        codes = self.codes
+        buffer = self.buffer
+        buffer += prefix
+        try:
+            buffer += b"".join([codes[lit] for lit in lits])
+        except IndexError:
+            self.grow(max(lits))
+            buffer += b"".join([codes[lit] for lit in lits])
+        buffer += self.end
+        if (len(buffer) >= self.buffer_size):
+            self.flush()
+
+    # Logs a clause that follows from the clauses so far
+    def add(self, lits: Iterable[int]):
+        self.added_cnt += 1
+        self.write(self.add_prefix, lits)
+
+    # Logs that a clause is no longer used
+    def delete(self, lits: Iterable[int]):
+        self.deleted_cnt += 1
+        self.write(self.delete_prefix, lits)
+
+    def flush(self):
+        self.out.write(self.buffer)
+        self.buffer.clear()
+
+    def close(self):
+        self.flush()
+        self.out.close()
+
+# Reads a DRAT proof. Returns (deleted, lits) per step, with literal codes. Binary proofs are told apart by their zero bytes
+def read_drat(file_path: str) -> List[Tuple[bool, List[int]]]:
+    with open(file_path, "rb") as f:
+        data = f.read()
+
+    steps = []
+    if (b"\0" in data):
+        pos = 0
+        while (pos < len(data)):
+            deleted = data[pos] == ord("d")
+            pos += 1
+            lits = []
+            u = 0
+            shift = 0
+            while (True):
+                byte = data[pos]
+                pos += 1
+                u |= (byte & 127) << shift
+                shift += 7
+                if (byte & 128):
+                    continue
+                if (u == 0):
+                    break
+                lits.append(u ^ 1)
+                u = 0
+                shift = 0
+            steps.append((deleted, lits))
+        return steps
+
+    deleted = False
+    lits = []
+    for line in data.splitlines():
+        if (line.lstrip().startswith(b"c")):
+            continue
+        for token in line.split():
+            if (token == b"d"):
+                deleted = True
+                continue
+            num = int(token)
+            if (num == 0):
+                steps.append((deleted, lits))
+                deleted = False
+                lits = []
+            else:
+                lits.append(2 * num + 1 if num > 0 else -2 * num)
+    return steps
+
+# Forward DRAT checker. Keeps the current clauses in a CNF_Formula with a propagator at decision level 0, whose top level assignments
+# are kept fully propagated. Clauses that are the reason of a top level assignment are never deleted, like drat-trim does for unit clauses
+class DRATChecker:
+
+    def __init__(self, num_vars: int, lits: Sequence[int], sizes: Sequence[int]):
+        self.formula = CNF_Formula(num_vars=num_vars)
+        self.prop = CNF_Propagator(self.formula)
+        self.index: Dict[Tuple[int, ...], List[int]] = {}   # crefs of the live clauses, keyed by their sorted literals
+        self.inconsistent = False       # The top level assignments falsify a clause, so every clause follows
+        self.pending_delete = False     # Deleted clauses are still in the watch lists
+
+        pos = 0
+        for size in sizes:
+            self.add(lits[pos:pos + size])
+            pos += size
+
+    def grow(self, lits: Sequence[int]):
+        num_vars = max((lit >> 1 for lit in lits), default=0)
+        if (num_vars > self.formula.num_vars):
+            self.formula.num_vars = num_vars
+            self.prop.grow(num_vars)
+
+    # Adds clause and propagates it if it is unit under the top level assignments
+    def add(self, lits: Sequence[int]):
+        lits = list(dict.fromkeys(lits))
+        if (self.inconsistent or any(lit ^ 1 in lits for lit in lits)):
+            return
+        self.sync()
+        self.grow(lits)
+        prop = self.prop
+        value = prop.value
+
+        # Literals that arent false go first, so they are the watched ones
+        lits.sort(key=lambda lit: value[lit] == L_FALSE)
+        cref = self.formula.add_clause(lits)
+        self.index.setdefault(tuple(sorted(lits)), []).append(cref)
+        if (len(lits) >= 2):
+            prop.attach(cref)
+
+        if (not lits or value[lits[0]] == L_FALSE):
+            self.inconsistent = True
+        elif ((len(lits) == 1 or value[lits[1]] == L_FALSE) and value[lits[0]] == L_UNDEF):
+            prop.assign(lits[0], cref)
+            if (prop.propagate() is not None):
+                self.inconsistent = True
+
+    # Deletes a live clause with the same literals. Unknown clauses are ignored
+    def delete(self, lits: Sequence[int]):
+        crefs = self.index.get(tuple(sorted(set(lits))))
+        if (not crefs):
+            return
+        cref = crefs[-1]
+        reason = self.prop.reason
+        if (any(reason[lit >> 1] == cref for lit in lits)):
+            return
+        crefs.pop()
+        self.formula.delete_clause(cref)
+        self.pending_delete = True
+
+    # Drops deleted clauses from the watch lists. Done in batches, since it visits every watch list
+    def sync(self):
+        if (self.pending_delete):
+            self.prop.detach_deleted()
+            self.formula.collect_garbage()
+            self.pending_delete = False
+
+    # True if propagating the negation of lits gives a conflict
+    def rup(self, lits: Iterable[int]) -> bool:
+        prop = self.prop
+        value = prop.value
+        prop.new_level()
+        conflict = True
+        for lit in lits:
+            if (value[lit] == L_TRUE):
+                break
+            if (value[lit] == L_UNDEF):
+                prop.assign(lit ^ 1)
+        else:
+            conflict = prop.propagate() is not None
+        prop.cancel_until(0)
+        return conflict
+
+    # True if every resolvent of lits with a clause containing the negation of its first literal is RUP
+    def rat(self, lits: List[int]) -> bool:
+        if (not lits):
+            return False
+        pivot = lits[0]
+        for key, crefs in self.index.items():
+            if (crefs and pivot ^ 1 in key and not self.rup(lits + [lit for lit in key if lit != pivot ^ 1])):
+                return False
+        return True
+
+    # Checks the steps of a proof. Returns (True, None) if they are valid and derive the empty clause,
+    # otherwise False and the reason
+    def check(self, steps: Iterable[Tuple[bool, List[int]]]) -> Tuple[bool, str]:
+        for k, (deleted, lits) in enumerate(steps, 1):
+            if (self.inconsistent):
+                break
+            if (deleted):
+                self.delete(lits)
+                continue
+            self.sync()
+            self.grow(lits)
+            if (not self.rup(lits) and not self.rat(lits)):
+                clause = " ".join(str(lit >> 1 if lit & 1 else -(lit >> 1)) for lit in lits)
+                return (False, f"step {k}: clause [{clause}] is neither RUP nor RAT")
+            self.add(lits)
+
+        if (not self.inconsistent):
+            return (False, "the proof doesnt derive the empty clause")
+        return (True, None)
+
+# Checks proof_file against cnf_file with the built-in checker. Returns (True, None) if it is valid, otherwise False and the reason
+def check_drat(cnf_file: str, proof_file: str) -> Tuple[bool, str]:
+    num_vars, lits, sizes = read_dimacs(cnf_file, strict=False)
+    return DRATChecker(num_vars, lits, sizes).check(read_drat(proof_file))
+
+# Checks proof_file with drat-trim if it is on the PATH, otherwise with check_drat
+def verify_proof(cnf_file: str, proof_file: str) -> Tuple[bool, str]:
+    drat_trim = shutil.which("drat-trim")
+    if (drat_trim is None):
+        return check_drat(cnf_file, proof_file)
+    proc = subprocess.run([drat_trim, cnf_file, proof_file], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    if ("s VERIFIED" in proc.stdout):
+        return (True, None)
+    return (False, proc.stdout.strip().splitlines()[-1] if proc.stdout.strip() else f"drat-trim exited with code {proc.returncode}")
+
+if __name__ == "__main__":
+    from batch import DEFAULT_OPTIONS, solve_instance
+
+    args = sys.argv[1:]
+    if (args and args[0] == "-check"):
+        if (len(args) != 3):
+            print(USAGE)
+            sys.exit(2)
+        ok, reason = verify_proof(args[1], args[2])
+        print("VERIFIED" if ok else f"NOT VERIFIED: {reason}")
+        sys.exit(0 if ok else 1)
+
+    binary = "-text" not in args
+    cnf_files = [arg for arg in args if arg != "-text"]
+    if (not cnf_files):
+        root = os.path.dirname(os.path.abspath(__file__))
+        cnf_files = sorted(f for pattern in DEFAULT_SETS for f in glob.glob(os.path.join(root, pattern)))
+
+    # Solves each file with proof logging, and checks the proofs of the UNSAT answers
+    failed = 0
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        proof_file = os.path.join(tmp_dir, "proof.drat")
+        for cnf_file in cnf_files:
+            result = solve_instance(cnf_file, dict(DEFAULT_OPTIONS, proof=proof_file, proof_binary=binary))
+            if (result["status"] != "UNSAT"):
+                print(f"{result['status']:14} {cnf_file}")
+                continue
+            ok, reason = verify_proof(cnf_file, proof_file)
+            print(f"{'VERIFIED' if ok else 'NOT VERIFIED':14} {cnf_file}{'' if ok else ': ' + reason}")
+            failed += not ok
+
+    sys.exit(1 if failed else 0)
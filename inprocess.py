@@ -0,0 +1,390 @@
+from typing import *
+from time import perf_counter
+from array import array
+from SAT_structs import *
+
+# Inprocessing on the binary implication graph, run by SAT_solver at decision level 0 between restarts.
+# A binary clause (a b) is the two implications -a -> b and -b -> a. The propagator keeps them in bin_watches already:
+# the literals implied by a are the other literals of bin_watches[a ^ 1]. A round does three passes on the top level unassigned literals:
+#
+# - Equivalent literals: the literals of a strongly connected component imply each other, so they are equivalent. Each one is replaced by
+#   the literal of the smallest variable of the component in every clause, learned clauses included. The substituted variables leave the
+#   search, and get the value of their representative in the model. A component with a literal and its negation makes the formula UNSAT.
+# - Failed literal probing: roots of the graph, literals no binary clause implies, are decided and propagated. A conflict means the negation
+#   of the root holds, and it is learned as a unit. Hyper binary resolution is done on the way: a literal implied by a longer clause is also
+#   implied by the dominator of that clause's false literals in the tree of binary implications from the root. The binary clause
+#   (-dominator literal) is learned, so later propagations reach the literal with binary steps and the next round sees it in the graph.
+# - Transitive reduction: a binary clause whose implication also follows from a path of other binary clauses is deleted. The path of a
+#   formula clause may only use formula clauses.
+#
+# A round gets a share of the search time since the last round as its time budget. Clauses that are added or deleted are logged to the
+# solver's proof, each added one is RUP (see drat.py).
+
+DEFAULT_INPROCESS_INTERVAL = 2000   # Conflicts between rounds, grows by this much after every round
+DEFAULT_INPROCESS_EFFORT = 0.1      # Time a round may use, as a fraction of the search time since the last round
+MIN_ROUND_TIME = 0.01               # Seconds
+DEFAULT_HYPER_LIMIT = 1000          # Hyper binary clauses a round may learn
+REDUCE_STEPS = 50                   # Literals the search for another path of a binary clause may visit
+
+class Inprocessor:
+
+    def __init__(self, solver: 'SAT_solver', interval: int = DEFAULT_INPROCESS_INTERVAL, effort: float = DEFAULT_INPROCESS_EFFORT,
+                 hyper_limit: int = DEFAULT_HYPER_LIMIT):
+        self.solver = solver
+        self.interval = interval
+        self.effort = effort
+        self.hyper_limit = hyper_limit
+
+        self.next_round = 0             # Conflict count of the first restart that runs a round
+        self.last_end = perf_counter()
+        self.deadline = 0.0
+
+        # Representative literal of the positive literal of each substituted variable, 0 if it isnt substituted.
+        # Representatives are never substituted themselves, so a literal is mapped in one step
+        self.repr = array('i')
+        self.substituted: List[int] = []    # Substituted var numbers, in the order they were substituted
+        self.probe_pos = 0                  # Probing resumes at this root in the next round
+
+        self.round_cnt = 0
+        self.failed_cnt = 0
+        self.hyper_cnt = 0
+        self.reduced_cnt = 0
+        self.time = 0.0
+
+    # Literal that replaces lit in clauses, lit itself if its variable isnt substituted
+    def map_lit(self, lit: int) -> int:
+        var_idx = lit >> 1
+        if (var_idx >= len(self.repr) or self.repr[var_idx] == 0):
+            return lit
+        return self.repr[var_idx] ^ (~lit & 1)
+
+    def map_lits(self, lits: Iterable[int]) -> List[int]:
+        if (not self.substituted):
+            return list(lits)
+        return [self.map_lit(lit) for lit in lits]
+
+    # Runs a round. Must be called at decision level 0 after propagation. Returns False if the formula is UNSAT
+    def run(self) -> bool:
+        start = perf_counter()
+        self.deadline = start + max(MIN_ROUND_TIME, self.effort * (start - self.last_end))
+        self.round_cnt += 1
+
+        prop = self.solver.propagator
+        save_phases = prop.save_phases
+        # Probing would overwrite the saved phases with the values of the probes
+        prop.save_phases = False
+        ok = self.substitute() and self.probe() and self.reduce()
+        prop.save_phases = save_phases
+
+        self.last_end = perf_counter()
+        self.time += self.last_end - start
+        self.next_round = self.solver.conflict_cnt + self.interval * self.round_cnt
+        return ok
+
+    # Strongly connected components of the binary implication graph with more than one literal, by Tarjan's algorithm
+    def components(self) -> List[List[int]]:
+        prop = self.solver.propagator
+        value = prop.value
+        bin_watches = prop.bin_watches
+        flags = self.solver.formula.clause_flags
+        num_lits = 2 * prop.num_vars + 2
+
+        index = array('i', [-1]) * num_lits     # DFS order of each literal, -1 if not visited
+        low = array('i', [0]) * num_lits        # Smallest index reachable from the DFS subtree of each literal
+        on_stack = bytearray(num_lits)
+        stack: List[int] = []
+        components: List[List[int]] = []
+        counter = 0
+
+        for root in range(2, num_lits):
+            if (index[root] != -1 or value[root] != L_UNDEF or not bin_watches[root ^ 1]):
+                continue
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = True
+            work = [(root, 0)]      # DFS path, with the position of the next edge of each literal
+
+            while (work):
+                lit, pos = work[-1]
+                edges = bin_watches[lit ^ 1]
+                descended = False
+                while (pos < len(edges)):
+                    other, cref = edges[pos]
+                    pos += 1
+                    if (value[other] != L_UNDEF or flags[cref] & CLAUSE_DELETED):
+                        continue
+                    if (index[other] == -1):
+                        work[-1] = (lit, pos)
+                        index[other] = low[other] = counter
+                        counter += 1
+                        stack.append(other)
+                        on_stack[other] = True
+                        work.append((other, 0))
+                        descended = True
+                        break
+                    if (on_stack[other] and index[other] < low[lit]):
+                        low[lit] = index[other]
+                if (descended):
+                    continue
+
+                work.pop()
+                if (work and low[lit] < low[work[-1][0]]):
+                    low[work[-1][0]] = low[lit]
+                if (low[lit] == index[lit]):
+                    component = []
+                    while (True):
+                        other = stack.pop()
+                        on_stack[other] = False
+                        component.append(other)
+                        if (other == lit):
+                            break
+                    if (len(component) > 1):
+                        components.append(component)
+        return components
+
+    # Replaces equivalent literals by their representative. Returns False if a literal is equivalent to its negation
+    def substitute(self) -> bool:
+        solver = self.solver
+        prop = solver.propagator
+        formula = solver.formula
+        learnts = solver.learnts
+        proof = solver.proof
+        value = prop.value
+
+        components = self.components()
+        if (not components):
+            return True
+
+        repr = self.repr
+        if (len(repr) < prop.num_vars + 1):
+            repr.extend([0] * (prop.num_vars + 1 - len(repr)))
+        old_cnt = len(self.substituted)
+        for component in components:
+            var_idxs = {lit >> 1 for lit in component}
+            if (len(var_idxs) < len(component)):
+                # lit implies its negation and the other way round. The negation of lit is RUP, and makes the empty clause RUP too
+                if (proof is not None):
+                    proof.add([component[0] ^ 1])
+                return False
+            # The component of the negated literals is the mirror image, and gets the same substitutions
+            rep = min(component, key=lambda lit: lit >> 1)
+            for lit in component:
+                if (lit != rep and repr[lit >> 1] == 0):
+                    repr[lit >> 1] = rep ^ (~lit & 1)
+                    self.substituted.append(lit >> 1)
+
+        # Earlier substitutions whose representative was substituted now
+        for var_idx in self.substituted[:old_cnt]:
+            repr[var_idx] = self.map_lit(repr[var_idx])
+        if (solver.vsids is not None):
+            for var_idx in self.substituted[old_cnt:]:
+                solver.vsids.remove(var_idx)
+
+        # Rewrites the clauses with a substituted variable. Each new clause is logged before any old one is deleted, since the
+        # binary clauses of the components are what makes the new clauses RUP
+        flags = formula.clause_flags
+        replaced: List[array] = []
+        for cref in list(formula.crefs()) + learnts.crefs:
+            lits = formula.clause_lits(cref)
+            if (all(repr[lit >> 1] == 0 for lit in lits)):
+                continue
+            mapped = list(dict.fromkeys(self.map_lit(lit) for lit in lits))
+            replaced.append(lits)
+            learnt = flags[cref] & CLAUSE_LEARNT
+            formula.delete_clause(cref)
+            if (any(value[lit] == L_TRUE or lit ^ 1 in mapped for lit in mapped)):
+                continue
+
+            mapped = [lit for lit in mapped if value[lit] == L_UNDEF]
+            if (proof is not None):
+                proof.add(mapped)
+            if (not mapped):
+                return False
+            if (len(mapped) == 1):
+                new_cref = formula.add_clause(mapped, learnt=True)
+                prop.units.append(new_cref)
+                prop.assign(mapped[0], new_cref)
+            elif (learnt):
+                prop.attach(learnts.add(mapped, min(learnts.lbd[cref], len(mapped))))
+            else:
+                prop.attach(formula.add_clause(mapped))
+
+        if (proof is not None):
+            for lits in replaced:
+                proof.delete(lits)
+        learnts.crefs = [cref for cref in learnts.crefs if not flags[cref] & CLAUSE_DELETED]
+        prop.detach_deleted()
+        formula.collect_garbage()
+        return prop.propagate() is None
+
+    # Learns the unit lit at the top level and propagates it. Returns False on a conflict
+    def learn_unit(self, lit: int) -> bool:
+        solver = self.solver
+        prop = solver.propagator
+        cref = solver.formula.add_clause([lit], learnt=True)
+        prop.units.append(cref)
+        prop.assign(lit, cref)
+        if (solver.proof is not None):
+            solver.proof.add([lit])
+        if (solver.share is not None):
+            solver.share.send([lit])
+        return prop.propagate() is None
+
+    # Probes the roots of the binary implication graph. Returns False if the formula is UNSAT
+    def probe(self) -> bool:
+        solver = self.solver
+        prop = solver.propagator
+        learnts = solver.learnts
+        proof = solver.proof
+        value = prop.value
+        bin_watches = prop.bin_watches
+
+        roots = [lit for lit in range(2, 2 * prop.num_vars + 2) if value[lit] == L_UNDEF and bin_watches[lit ^ 1] and not bin_watches[lit]]
+        if (not roots):
+            return True
+        start = self.probe_pos % len(roots)
+        hyper_budget = self.hyper_limit
+        for k in range(len(roots)):
+            if (perf_counter() > self.deadline):
+                self.probe_pos = start + k
+                return True
+            lit = roots[(start + k) % len(roots)]
+            if (value[lit] != L_UNDEF):
+                continue
+
+            prop.decide(lit)
+            if (prop.propagate() is not None):
+                prop.cancel_until(0)
+                self.failed_cnt += 1
+                if (not self.learn_unit(lit ^ 1)):
+                    return False
+                continue
+
+            binaries = self.hyper_binaries(lit, hyper_budget)
+            prop.cancel_until(0)
+            hyper_budget -= len(binaries)
+            for binary in binaries:
+                if (proof is not None):
+                    proof.add(binary)
+                # Hyper binary clauses start in the middle tier, so they are deleted if they dont take part in conflicts
+                prop.attach(learnts.add(binary, learnts.core_lbd + 1))
+            self.hyper_cnt += len(binaries)
+        self.probe_pos = 0
+        return True
+
+    # Hyper binary clauses of the literals the probe root implied through longer clauses, at most limit of them
+    def hyper_binaries(self, root: int, limit: int) -> List[List[int]]:
+        prop = self.solver.propagator
+        formula = self.solver.formula
+        trail = prop.trail
+        reason = prop.reason
+        level = prop.level
+
+        # Tree of binary implications from the root: parent and depth of each true literal
+        parent = {root: root}
+        depth = {root: 0}
+        binaries = []
+        for i in range(prop.trail_lim[0] + 1, len(trail)):
+            lit = trail[i]
+            lits = formula.clause_lits(reason[lit >> 1])
+            if (len(lits) == 2):
+                dominator = (lits[1] if lits[0] == lit else lits[0]) ^ 1
+            else:
+                # Closest common ancestor of the true negations of the false literals
+                dominator = -1
+                for other in lits:
+                    if (other == lit or level[other >> 1] == 0):
+                        continue
+                    other ^= 1
+                    if (dominator == -1):
+                        dominator = other
+                        continue
+                    while (depth[other] > depth[dominator]):
+                        other = parent[other]
+                    while (depth[dominator] > depth[other]):
+                        dominator = parent[dominator]
+                    while (dominator != other):
+                        dominator = parent[dominator]
+                        other = parent[other]
+                if (len(binaries) < limit):
+                    binaries.append([lit, dominator ^ 1])
+            parent[lit] = dominator
+            depth[lit] = depth[dominator] + 1
+        return binaries
+
+    # Deletes binary clauses that follow from other binary clauses. Returns False if the formula is UNSAT
+    def reduce(self) -> bool:
+        solver = self.solver
+        prop = solver.propagator
+        formula = solver.formula
+        learnts = solver.learnts
+        proof = solver.proof
+        value = prop.value
+        bin_watches = prop.bin_watches
+        flags = formula.clause_flags
+
+        deleted = 0
+        for lit in range(2, 2 * prop.num_vars + 2):
+            if (perf_counter() > self.deadline):
+                break
+            if (value[lit] != L_UNDEF):
+                continue
+            for other, cref in bin_watches[lit]:
+                # Each clause is checked once, from its smaller literal
+                if (other < lit or value[other] != L_UNDEF or flags[cref] & CLAUSE_DELETED):
+                    continue
+                if (self.has_path(lit ^ 1, other, cref, flags[cref] & CLAUSE_LEARNT == 0)):
+                    if (proof is not None):
+                        proof.delete(formula.clause_lits(cref))
+                    formula.delete_clause(cref)
+                    deleted += 1
+
+        if (deleted):
+            self.reduced_cnt += deleted
+            learnts.crefs = [cref for cref in learnts.crefs if not flags[cref] & CLAUSE_DELETED]
+            prop.detach_deleted()
+            formula.collect_garbage()
+        return True
+
+    # True if target is reachable from source in the binary implication graph without the clause skip, within REDUCE_STEPS literals
+    # Learned clauses can be deleted later, so a formula clause is only deleted if formula clauses alone imply it (irredundant)
+    def has_path(self, source: int, target: int, skip: int, irredundant: bool) -> bool:
+        prop = self.solver.propagator
+        value = prop.value
+        bin_watches = prop.bin_watches
+        flags = self.solver.formula.clause_flags
+
+        seen = {source}
+        queue = [source]
+        for lit in queue:
+            if (len(seen) > REDUCE_STEPS):
+                return False
+            for other, cref in bin_watches[lit ^ 1]:
+                if (cref == skip or other in seen or value[other] != L_UNDEF or flags[cref] & CLAUSE_DELETED
+                    or (irredundant and flags[cref] & CLAUSE_LEARNT)):
+                    continue
+                if (other == target):
+                    return True
+                seen.add(other)
+                queue.append(other)
+        return False
+
+    # Gives the substituted variables of model, an assignment list indexed by var number, the value of their representative
+    # A representative the search left unassigned is free, and is set to false so the substituted variable gets a value too
+    def extend_model(self, model: List[bool]):
+        for var_idx in self.substituted:
+            rep = self.repr[var_idx]
+            if (model[rep >> 1] is None):
+                model[rep >> 1] = False
+            model[var_idx] = model[rep >> 1] == bool(rep & 1)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "inprocess_rounds": self.round_cnt,
+            "substituted": len(self.substituted),
+            "failed_literals": self.failed_cnt,
+            "hyper_binaries": self.hyper_cnt,
+            "reduced_binaries": self.reduced_cnt,
+            "inprocess_time": self.time,
+        }
@@ -0,0 +1,199 @@
+from typing import *
+import collections
+import hashlib
+import itertools
+import sys
+from array import array
+from SAT_structs import *
+from SAT_solver import SAT_solver
+
+# Model enumeration and exact model counting, the -enumerate and -count modes of mySAT.py.
+# Both work on the formula as it is read. The preprocessor eliminates variables and pure literals, which keeps satisfiability
+# but not the set of models.
+#
+# enumerate_models keeps one incremental SAT_solver. After each model it adds a blocking clause, the negation of the decisions that
+# led to the model: the other assignments on the trail were propagated from the decisions, so the clause excludes exactly this model.
+# Variables the solver left unassigned are free, and every assignment of them is a model.
+#
+# ModelCounter counts models without listing them (#SAT), by DPLL search with component decomposition and caching.
+# Once a variable is assigned and propagated, the remaining clauses often fall apart into components that share no variables.
+# The count is the product of the component counts, times 2 for every variable that is left in no clause. A component is
+# identified by a hash of its sorted clauses, since its count only depends on them, so components that come back in other
+# branches of the search are answered from the cache. The cache is an LRU dict with a memory limit.
+
+DEFAULT_COUNT_CACHE = 64    # MB
+
+# Approximate memory of a cache entry besides its key and count: the dict slot and the node of the LRU order
+CACHE_ENTRY_OVERHEAD = 100
+
+# Yields the models of formula as lists of signed variable numbers, at most limit of them if it is set
+def enumerate_models(formula: CNF_Formula, limit: int = None, use_vsids: bool = True) -> Iterator[List[int]]:
+    solver = SAT_solver(formula)
+    # Blocking clauses are made of decisions, and substituted variables would be left out of them
+    solver.inprocess = False
+    num_vars = formula.num_vars
+    found = 0
+    while (limit is None or found < limit):
+        solution = solver.solve(useVSIDS=use_vsids)
+        if (solution is None):
+            return
+        prop = solver.propagator
+        blocking = [prop.decision(level) ^ 1 for level in range(1, prop.decision_level() + 1)]
+
+        model = [var_idx if solution[var_idx] else -var_idx for var_idx in range(1, num_vars + 1)]
+        free = [var_idx for var_idx in range(1, num_vars + 1) if solution[var_idx] is None]
+        for values in itertools.product((False, True), repeat=len(free)):
+            for var_idx, val in zip(free, values):
+                model[var_idx - 1] = var_idx if val else -var_idx
+            yield list(model)
+            found += 1
+            if (limit is not None and found >= limit):
+                return
+
+        # An empty blocking clause makes the formula UNSAT, every model was found
+        if (not solver.add_clause(blocking)):
+            return
+
+class ModelCounter:
+
+    # cache_size is the memory limit of the component cache in MB
+    def __init__(self, formula: CNF_Formula, cache_size: int = DEFAULT_COUNT_CACHE):
+        self.num_vars = formula.num_vars
+
+        # Clauses as sorted tuples of literal codes without duplicates. Tautologies hold in every model, so they are left out
+        self.clauses: List[Tuple[int, ...]] = []
+        self.has_empty = False
+        for cref in formula.crefs():
+            lits = sorted(set(formula.clause_lits(cref)))
+            if (not lits):
+                self.has_empty = True
+            elif (not any(lits[k] ^ 1 == lits[k + 1] for k in range(len(lits) - 1))):
+                self.clauses.append(tuple(lits))
+
+        self.cache: collections.OrderedDict = collections.OrderedDict()    # Component hash -> count, least recently used first
+        self.cache_bytes = 0
+        self.max_bytes = cache_size * 1024 * 1024
+        self.decision_cnt = 0
+        self.component_cnt = 0      # Components counted by search
+        self.hit_cnt = 0            # Components answered from the cache
+        self.evicted_cnt = 0
+
+    # Assigns the literals of units and propagates them through clauses
+    # Returns the clauses that arent satisfied yet, without their false literals, and the number of variables that were assigned,
+    # or None if a clause became false
+    def propagate(self, clauses: List[Tuple[int, ...]], units: Set[int]) -> Tuple[List[Tuple[int, ...]], int]:
+        assigned = 0
+        while (units):
+            if (any(lit ^ 1 in units for lit in units)):
+                return None
+            assigned += len(units)
+            false = {lit ^ 1 for lit in units}
+            new_units = set()
+            residual = []
+            # Earlier units were removed from the clauses already, so only the new ones are checked
+            for clause in clauses:
+                if (not units.isdisjoint(clause)):
+                    continue
+                if (not false.isdisjoint(clause)):
+                    clause = tuple([lit for lit in clause if lit not in false])
+                    if (not clause):
+                        return None
+                    if (len(clause) == 1):
+                        new_units.add(clause[0])
+                        continue
+                residual.append(clause)
+            clauses = residual
+            units = new_units
+        return (clauses, assigned)
+
+    # Splits clauses into groups that share no variables. Returns (clauses, number of variables) per group
+    def components(self, clauses: List[Tuple[int, ...]]) -> List[Tuple[List[Tuple[int, ...]], int]]:
+        parent: Dict[int, int] = {}
+
+        def find(var_idx: int) -> int:
+            root = var_idx
+            while (parent[root] != root):
+                root = parent[root]
+            while (parent[var_idx] != root):
+                parent[var_idx], var_idx = root, parent[var_idx]
+            return root
+
+        for clause in clauses:
+            first = find(parent.setdefault(clause[0] >> 1, clause[0] >> 1))
+            for lit in clause[1:]:
+                root = find(parent.setdefault(lit >> 1, lit >> 1))
+                if (root != first):
+                    parent[root] = first
+
+        groups: Dict[int, List[Tuple[int, ...]]] = {}
+        for clause in clauses:
+            groups.setdefault(find(clause[0] >> 1), []).append(clause)
+        var_cnts = collections.Counter(find(var_idx) for var_idx in parent)
+        return [(group, var_cnts[root]) for root, group in groups.items()]
+
+    # Number of models of clauses over num_vars variables, the ones in no clause included
+    def count_residual(self, clauses: List[Tuple[int, ...]], num_vars: int) -> int:
+        if (not clauses):
+            return 1 << num_vars
+        # Small components first, so a component without models is found early
+        components = sorted(self.components(clauses), key=lambda component: len(component[0]))
+        total = 1 << (num_vars - sum(var_cnt for _, var_cnt in components))
+        for component, var_cnt in components:
+            total *= self.count_component(component, var_cnt)
+            if (total == 0):
+                break
+        return total
+
+    # Number of models of a connected component over its num_vars variables
+    def count_component(self, clauses: List[Tuple[int, ...]], num_vars: int) -> int:
+        # Clauses keep their literals sorted, so sorting the clauses makes the key independent of the order they were found in
+        clauses.sort()
+        key = hashlib.blake2b(array("i", [lit for clause in clauses for lit in clause + (0,)]).tobytes(), digest_size=16).digest()
+        cached = self.cache.get(key)
+        if (cached is not None):
+            self.cache.move_to_end(key)
+            self.hit_cnt += 1
+            return cached
+
+        # Branch on the variable in the most clauses
+        self.component_cnt += 1
+        var_idx = collections.Counter(lit >> 1 for clause in clauses for lit in clause).most_common(1)[0][0]
+        total = 0
+        for lit in (2 * var_idx + 1, 2 * var_idx):
+            self.decision_cnt += 1
+            propagated = self.propagate(clauses, {lit})
+            if (propagated is not None):
+                residual, assigned = propagated
+                total += self.count_residual(residual, num_vars - assigned)
+
+        self.store(key, total)
+        return total
+
+    def store(self, key: bytes, count: int):
+        self.cache[key] = count
+        self.cache_bytes += sys.getsizeof(key) + sys.getsizeof(count) + CACHE_ENTRY_OVERHEAD
+        while (self.cache_bytes > self.max_bytes and self.cache):
+            old_key, old_count = self.cache.popitem(last=False)
+            self.cache_bytes -= sys.getsizeof(old_key) + sys.getsizeof(old_count) + CACHE_ENTRY_OVERHEAD
+            self.evicted_cnt += 1
+
+    # Number of models of the formula
+    def count(self) -> int:
+        if (self.has_empty):
+            return 0
+        # Each decision level is a count_component and a count_residual call
+        sys.setrecursionlimit(max(sys.getrecursionlimit(), 2 * self.num_vars + 1000))
+        propagated = self.propagate(self.clauses, {clause[0] for clause in self.clauses if len(clause) == 1})
+        if (propagated is None):
+            return 0
+        residual, assigned = propagated
+        return self.count_residual(residual, self.num_vars - assigned)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "decisions": self.decision_cnt,
+            "components": self.component_cnt,
+            "cache_hits": self.hit_cnt,
+            "cache_entries": len(self.cache),
+            "evicted": self.evicted_cnt,
+        }
@@ -1,95 +1,334 @@
-import sys
-import time
-import glob
-from dpll import *
-from SAT_structs import *
-from SAT_solver import SAT_solver
-
-if __name__ == "__main__":
-    total_iterations = 0
-    successful_files = 0
-    total_processing_time = 0
-    file_count = 0
-    useDPLL = False
-    useCDCL = False
-    useVSIDS = False
-    debug = False
-    showMetrics = False
-    
-    if len(sys.argv) < 2:
-        print("Usage: python new_SAT_solver.py [-dpll | -no_vsids | -debug | -metrics] *.cnf")
-        sys.exit(1)
-    
-    args = sys.argv[1:]
-    cnf_files = []
-    for arg in args:
-        if arg == "-dpll":
-            useDPLL = True
-        elif arg == "-no_vsids":
-            useCDCL = True
-        elif arg == "-debug":
-            debug = True
-        elif arg == "-metrics":
-            showMetrics = True
-        else:
-            cnf_files.append(arg)
-
-    if len(cnf_files) == 1:
-        cnf_files = glob.glob(cnf_files[0])
-
-    if not cnf_files:
-        print("No CNF files provided.")
-        sys.exit(1)
-
-    for cnf_file in cnf_files:
-        if (debug or showMetrics):
-            print("\n")
-        try:
-            start_time = time.time()
-        
-            if useDPLL == True:
-                if (debug or showMetrics):
-                    print(f"--- Solving {cnf_file} using DPLL ---")
-                clauses = parse_dimacs_file(cnf_file)
-                (solution, iter_count) = dpll(clauses, {}, 0, log=debug)
-            else:
-                formula = CNF_Formula.from_dimacs_file(cnf_file)
-                solver = SAT_solver(formula, log=debug)
-                if useCDCL == True:
-                    if (debug or showMetrics):
-                        print(f"--- Solving {cnf_file} using CDCL ---")
-                    solution = solver.solve()  # Default useVSIDS=False
-                else:
-                    if (debug or showMetrics):
-                        print(f"--- Solving {cnf_file} using CDCL w/ VSIDS ---")
-                    solution = solver.solve(useVSIDS=True)
-                iter_count = solver.iter_count
-                    
-
-            end_time = time.time()
-            single_file_processing_time = end_time - start_time
-            
-            if (solution is None):
-                print("RESULT:UNSAT")
-            else: 
-                print("RESULT:SAT")
-                assignStr = "ASSIGNMENT:" + " ".join([f"{i}={'1' if solution[i] else '0'}" for i in range(1,len(solution))])
-                print(assignStr)
-
-            if (debug or showMetrics):
-                print(f"Number of iterations: {iter_count:.2f}")
-                print(f"Processing time: {single_file_processing_time:.4f} seconds")
-                
-            total_iterations += iter_count
-            file_count += 1
-            total_processing_time += single_file_processing_time
-        except Exception as e:
-            print(f"Failed to parse {cnf_file}: {e}")
-            continue  # Skip broken files
-
-
-    if (debug or showMetrics):
-        avg_iter_count = total_iterations / file_count
-        print("\n==============================")
-        print(f"Total Processing time: {total_processing_time:.4f} seconds")
-        print(f"Average number of iterations over {file_count} successful files: {avg_iter_count:.2f}")
+import sys
+import time
+import glob
+import json
+from dpll import *
+from SAT_structs import *
+from SAT_solver import SAT_solver
+from batch import *
+from portfolio import *
+from cube import run_cube_and_conquer, DEFAULT_CUBE_BUDGET
+from models import enumerate_models, ModelCounter, DEFAULT_COUNT_CACHE
+from circuit import load_formula
+from cache import DEFAULT_CACHE_SIZE
+from sls import SLS_ALGORITHMS, DEFAULT_MAX_FLIPS
+
+if __name__ == "__main__":
+    total_iterations = 0
+    successful_files = 0
+    total_processing_time = 0
+    file_count = 0
+    useDPLL = False
+    useCDCL = False
+    useVSIDS = False
+    debug = False
+    showMetrics = False
+    jsonMetrics = False
+    progress = None
+    restarts = "glucose"
+    phaseSaving = True
+    preprocess = True
+    inprocess = True
+    jobs = None
+    timeout = None
+    memLimit = None
+    resultsPath = None
+    portfolio = None
+    cubeJobs = None
+    cubeBudget = DEFAULT_CUBE_BUDGET
+    shareClauses = True
+    proofPath = None
+    binaryProof = True
+    cacheDir = None
+    cacheSize = DEFAULT_CACHE_SIZE
+    sls = None
+    slsFlips = DEFAULT_MAX_FLIPS
+    enumerateModels = False
+    modelLimit = None
+    countModels = False
+    countCache = DEFAULT_COUNT_CACHE
+    conflictBudget = None
+    propagationBudget = None
+    timeBudget = None
+    memBudget = None
+    checkpointPath = None
+    usage = (f"Usage: python mySAT.py [-dpll | -no_vsids | -debug | -metrics | -json | -progress N | -restart {{{'|'.join(RESTART_POLICIES)}}} | -no_phase_saving | -no_preprocess | -no_inprocess"
+             " | -jobs N | -timeout SECS | -mem_limit MB | -results FILE.{jsonl|csv} | -portfolio N | -no_share | -cube N | -cube_budget N | -proof FILE | -text_proof | -cache DIR | -cache_size MB"
+             f" | -sls [{'|'.join(SLS_ALGORITHMS)}] | -sls_flips N | -enumerate [N] | -count | -count_cache MB"
+             " | -conflict_budget N | -propagation_budget N | -time_budget SECS | -mem_budget MB | -checkpoint FILE] *.cnf")
+    
+    if len(sys.argv) < 2:
+        print(usage)
+        sys.exit(1)
+    
+    args = sys.argv[1:]
+    cnf_files = []
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        i += 1
+        if arg == "-restart":
+            if i >= len(args) or args[i] not in RESTART_POLICIES:
+                print(usage)
+                sys.exit(1)
+            restarts = args[i]
+            i += 1
+        elif arg == "-sls":
+            # Algorithm name is optional
+            sls = "probsat"
+            if i < len(args) and args[i] in SLS_ALGORITHMS:
+                sls = args[i]
+                i += 1
+        elif arg == "-enumerate":
+            # Limit on the number of models is optional
+            enumerateModels = True
+            if i < len(args) and args[i].isdigit():
+                modelLimit = int(args[i])
+                i += 1
+        elif arg == "-count":
+            countModels = True
+        elif arg == "-no_phase_saving":
+            phaseSaving = False
+        elif arg == "-no_preprocess":
+            preprocess = False
+        elif arg == "-no_inprocess":
+            inprocess = False
+        elif arg == "-no_share":
+            shareClauses = False
+        elif arg == "-text_proof":
+            binaryProof = False
+        elif arg in ("-jobs", "-timeout", "-mem_limit", "-results", "-portfolio", "-cube", "-cube_budget", "-progress", "-proof", "-cache", "-cache_size",
+                     "-sls_flips", "-count_cache", "-conflict_budget", "-propagation_budget", "-time_budget", "-mem_budget", "-checkpoint"):
+            if i >= len(args):
+                print(usage)
+                sys.exit(1)
+            value = args[i]
+            i += 1
+            try:
+                if arg == "-jobs":
+                    jobs = max(1, int(value))
+                elif arg == "-timeout":
+                    timeout = float(value)
+                elif arg == "-mem_limit":
+                    memLimit = int(value)
+                elif arg == "-portfolio":
+                    portfolio = max(1, int(value))
+                elif arg == "-cube":
+                    cubeJobs = max(1, int(value))
+                elif arg == "-cube_budget":
+                    cubeBudget = max(1, int(value))
+                elif arg == "-progress":
+                    progress = max(1, int(value))
+                elif arg == "-proof":
+                    proofPath = value
+                elif arg == "-cache":
+                    cacheDir = value
+                elif arg == "-cache_size":
+                    cacheSize = max(1, int(value))
+                elif arg == "-sls_flips":
+                    slsFlips = max(0, int(value))
+                elif arg == "-count_cache":
+                    countCache = max(1, int(value))
+                elif arg == "-conflict_budget":
+                    conflictBudget = max(0, int(value))
+                elif arg == "-propagation_budget":
+                    propagationBudget = max(0, int(value))
+                elif arg == "-time_budget":
+                    timeBudget = float(value)
+                elif arg == "-mem_budget":
+                    memBudget = max(1, int(value))
+                elif arg == "-checkpoint":
+                    checkpointPath = value
+                else:
+                    resultsPath = value
+            except ValueError:
+                print(usage)
+                sys.exit(1)
+        elif arg == "-dpll":
+            useDPLL = True
+        elif arg == "-no_vsids":
+            useCDCL = True
+        elif arg == "-debug":
+            debug = True
+        elif arg == "-metrics":
+            showMetrics = True
+        elif arg == "-json":
+            showMetrics = True
+            jsonMetrics = True
+        else:
+            cnf_files.append(arg)
+
+    if len(cnf_files) == 1:
+        cnf_files = glob.glob(cnf_files[0])
+
+    if not cnf_files:
+        print("No CNF files provided.")
+        sys.exit(1)
+
+    # A proof is written for one file, by the CDCL solver in this process
+    if proofPath is not None and (len(cnf_files) > 1 or useDPLL or portfolio is not None or cubeJobs is not None or jobs is not None
+                                  or resultsPath is not None or timeout is not None or memLimit is not None):
+        print("-proof needs a single file solved with CDCL, without batch, portfolio or cube mode")
+        sys.exit(1)
+
+    if portfolio is not None and cubeJobs is not None:
+        print("-portfolio and -cube cant be used together")
+        sys.exit(1)
+
+    # Budgets stop the CDCL solver of each file with RESULT:UNKNOWN. A checkpoint belongs to one file, and the search continues from it
+    # when the same command is run again
+    budgeted = any(budget is not None for budget in (conflictBudget, propagationBudget, timeBudget, memBudget))
+    if (budgeted or checkpointPath is not None) and (useDPLL or portfolio is not None or cubeJobs is not None or enumerateModels or countModels):
+        print("Budgets and -checkpoint need the CDCL solver, without portfolio, cube, enumerate or count mode")
+        sys.exit(1)
+    if checkpointPath is not None and (len(cnf_files) > 1 or proofPath is not None):
+        print("-checkpoint needs a single file, without -proof")
+        sys.exit(1)
+
+    options = dict(DEFAULT_OPTIONS, dpll=useDPLL, vsids=not useCDCL, restarts=restarts, phase_saving=phaseSaving, preprocess=preprocess, inprocess=inprocess, debug=debug,
+                   profile=showMetrics, progress=progress, proof=proofPath, proof_binary=binaryProof, cache=cacheDir, cache_size=cacheSize,
+                   sls=sls, sls_flips=slsFlips, conflict_budget=conflictBudget, propagation_budget=propagationBudget, time_budget=timeBudget,
+                   mem_budget=memBudget, checkpoint=checkpointPath)
+
+    # Model enumeration and counting run in this process, on the formula as it is read
+    if enumerateModels or countModels:
+        if (useDPLL or portfolio is not None or cubeJobs is not None or jobs is not None or resultsPath is not None or timeout is not None
+            or memLimit is not None or proofPath is not None or sls is not None):
+            print("-enumerate and -count cant be used with -dpll, -sls, -proof, batch, portfolio or cube mode")
+            sys.exit(1)
+        for cnf_file in cnf_files:
+            try:
+                start_time = time.time()
+                # Circuits need the full Tseitin encoding, so every model has one value for each gate
+                formula, circuit = load_formula(cnf_file, plaisted_greenbaum=False)
+                if countModels:
+                    counter = ModelCounter(formula, countCache)
+                    count = counter.count()
+                    print(f"RESULT:{'SAT' if count else 'UNSAT'}")
+                    print(f"COUNT:{count}")
+                    stats = counter.stats()
+                else:
+                    # Models are printed as they are found
+                    count = 0
+                    for model in enumerate_models(formula, modelLimit, use_vsids=not useCDCL):
+                        if count == 0:
+                            print("RESULT:SAT")
+                        count += 1
+                        if circuit is not None:
+                            print("INPUTS:" + " ".join([f"{name}={int(val)}" for name, val in circuit.input_values(model).items()]), flush=True)
+                        else:
+                            print("ASSIGNMENT:" + " ".join([f"{abs(lit)}={'1' if lit > 0 else '0'}" for lit in model]), flush=True)
+                    if count == 0:
+                        print("RESULT:UNSAT")
+                    print(f"MODELS:{count}")
+                    stats = {}
+                if (jsonMetrics):
+                    print(json.dumps(dict({"file": cnf_file, "models": count, "time": time.time() - start_time}, **stats)))
+                elif (debug or showMetrics):
+                    if stats:
+                        print(f"Decisions: {stats['decisions']}, components: {stats['components']}, cache hits: {stats['cache_hits']}, "
+                              f"evicted: {stats['evicted']}")
+                    print(f"Processing time: {time.time() - start_time:.4f} seconds")
+            except Exception as e:
+                print(f"Failed to parse {cnf_file}: {e}")
+        sys.exit(0)
+
+    # Batch mode: instances run in worker processes and results are streamed as JSON Lines or CSV (stdout if no -results file)
+    # Without -portfolio or -cube, -timeout and -mem_limit also need worker processes
+    if jobs is not None or resultsPath is not None or (portfolio is None and cubeJobs is None and (timeout is not None or memLimit is not None)):
+        out = sys.stdout if resultsPath is None else open(resultsPath, "w", newline="")
+        writer = ResultWriter(out, "jsonl" if resultsPath is None else ResultWriter.format_of(resultsPath))
+        start_time = time.time()
+        results = run_batch(cnf_files, options, jobs or 1, timeout, memLimit, writer)
+        if out is not sys.stdout:
+            out.close()
+
+        if (debug or showMetrics):
+            statusCounts = {}
+            for result in results:
+                statusCounts[result["status"]] = statusCounts.get(result["status"], 0) + 1
+            print("\n==============================", file=sys.stderr)
+            print(f"Wall clock time: {time.time() - start_time:.4f} seconds", file=sys.stderr)
+            print(", ".join(f"{status}: {count}" for status, count in sorted(statusCounts.items())), file=sys.stderr)
+        sys.exit(0)
+
+    # With -json, metrics are printed as one JSON object per file instead
+    verbose = debug or (showMetrics and not jsonMetrics)
+    for cnf_file in cnf_files:
+        if (verbose):
+            print("\n")
+        try:
+            if portfolio is not None:
+                # Portfolio mode: diversified solvers race on the file, and the first answer is used
+                if (verbose):
+                    print(f"--- Solving {cnf_file} using a portfolio of {portfolio} solvers ---")
+                configs = portfolio_configs(options, portfolio)
+                result = run_portfolio(cnf_file, configs, timeout, memLimit, shareClauses)
+                if (result["status"] == "ERROR"):
+                    raise RuntimeError(result["error"])
+                if (result["status"] not in ("SAT", "UNSAT")):
+                    print(f"RESULT:{result['status']}")
+                    continue
+                if (verbose):
+                    winner = configs[result["config"]]
+                    print(f"Solved by solver {result['config']}: {mode_name(winner)}, restart {winner['restarts']}, decay {winner['decay']}, "
+                          f"phase {int(winner['default_phase'])}, seed {winner['seed']}")
+            elif cubeJobs is not None:
+                # Cube-and-conquer mode: the cubes of a lookahead are solved by a pool of worker processes
+                if (verbose):
+                    print(f"--- Solving {cnf_file} by cube-and-conquer with {cubeJobs} workers ---")
+                result = run_cube_and_conquer(cnf_file, options, cubeJobs, timeout, memLimit, budget=cubeBudget)
+                if (result["status"] not in ("SAT", "UNSAT")):
+                    print(f"RESULT:{result['status']}")
+                    continue
+                if (verbose):
+                    stats = result["stats"]
+                    print(f"Cubes: {stats['cubes']}, refuted: {stats['refuted']}, re-split: {stats['splits']}, pruned: {stats['pruned']}, "
+                          f"conflicts: {result['conflicts']}, lookahead time: {stats['lookahead_time']:.4f} seconds")
+            else:
+                if (verbose):
+                    print(f"--- Solving {cnf_file} using {mode_name(options)} ---")
+                result = solve_instance(cnf_file, options)
+            iter_count = result["iterations"]
+            single_file_processing_time = result["time"]
+
+            if (result["status"] == "UNSAT"):
+                print("RESULT:UNSAT")
+            elif (result["status"] == "UNKNOWN"):
+                # A budget ran out or the run was interrupted
+                print("RESULT:UNKNOWN")
+                if (verbose):
+                    print(f"Stopped by {result['stats']['stopped_by']}" + (f", state saved to {checkpointPath}" if checkpointPath is not None else ""))
+            else: 
+                print("RESULT:SAT")
+                assignStr = "ASSIGNMENT:" + " ".join([f"{abs(lit)}={'1' if lit > 0 else '0'}" for lit in result["model"]])
+                print(assignStr)
+                if result.get("inputs") is not None:
+                    print("INPUTS:" + " ".join([f"{name}={int(val)}" for name, val in result["inputs"].items()]))
+
+            stats = result.get("stats", {})
+            if (jsonMetrics):
+                print(json.dumps(dict({"file": cnf_file, "status": result["status"], "time": single_file_processing_time}, **stats)))
+            elif (verbose):
+                print(f"Number of iterations: {iter_count:.2f}")
+                if result["conflicts"] is not None and "propagations" in stats:
+                    print(f"Number of conflicts: {result['conflicts']}, decisions: {result['decisions']}, restarts: {result['restarts']}")
+                    print(f"Propagations: {stats['propagations']}, learned clauses: {stats['learned']}, deleted: {stats['deleted']}, "
+                          f"average length: {stats['avg_learned_len']:.2f}, average LBD: {stats['avg_lbd']:.2f}")
+                    print(f"Parse time: {stats['parse_time']:.4f}, preprocess: {stats.get('preprocess_time', 0.0):.4f}, "
+                          f"propagate: {stats['propagate_time']:.4f}, analyze: {stats['analyze_time']:.4f} seconds")
+                print(f"Processing time: {single_file_processing_time:.4f} seconds")
+                
+            total_iterations += iter_count
+            file_count += 1
+            total_processing_time += single_file_processing_time
+        except Exception as e:
+            print(f"Failed to parse {cnf_file}: {e}")
+            continue  # Skip broken files
+
+
+    if (verbose):
+        avg_iter_count = total_iterations / max(file_count, 1)
+        print("\n==============================")
+        print(f"Total Processing time: {total_processing_time:.4f} seconds")
+        print(f"Average number of iterations over {file_count} successful files: {avg_iter_count:.2f}")
@@ -0,0 +1,120 @@
+from typing import *
+import copy
+import multiprocessing
+import multiprocessing.connection
+import time
+from batch import start_worker, receive_result
+
+# Portfolio mode for mySAT.py.
+# Several differently configured CDCL solvers race on the same file, each in its own process. The first one to answer wins,
+# and the others are killed. Solvers that use VSIDS also exchange the unit and binary clauses they learn through shared memory.
+
+# Restart policy, VSIDS decay factor and default phase of the portfolio members after the first
+# Members past the end of the table reuse it, and differ by their random seed
+PORTFOLIO_TABLE = [
+    ("luby", 0.95, True),
+    ("geometric", 0.9, False),
+    ("glucose", 0.85, True),
+    ("luby", 0.99, False),
+    ("glucose", 0.99, False),
+    ("geometric", 0.95, True),
+    ("none", 0.9, False),
+]
+
+# Returns n solver configurations. The first is options unchanged, the rest use CDCL w/ VSIDS with the settings from PORTFOLIO_TABLE
+def portfolio_configs(options: Dict[str, Any], n: int) -> List[Dict[str, Any]]:
+    configs = [dict(options)]
+    for k in range(1, n):
+        restarts, decay, default_phase = PORTFOLIO_TABLE[(k - 1) % len(PORTFOLIO_TABLE)]
+        configs.append(dict(options, dpll=False, vsids=True, restarts=restarts, decay=decay, default_phase=default_phase, seed=k))
+    return configs
+
+# Append only log of short learned clauses in shared memory, that every portfolio worker can read
+# Each entry is [sender, size, lits...] with literal codes, and buffer[0] is the end of the log
+# Each worker gets its own copy from for_worker, which remembers how far that worker has read. Once the buffer is full no more clauses are sent
+class ClauseExchange:
+
+    def __init__(self, capacity: int = 1 << 20):
+        self.buffer = multiprocessing.Array("i", capacity)
+        self.buffer[0] = 1
+        self.worker_id = -1
+        self.read_pos = 1
+
+    # Copy of the exchange used by one worker
+    def for_worker(self, worker_id: int) -> "ClauseExchange":
+        exchange = copy.copy(self)
+        exchange.worker_id = worker_id
+        return exchange
+
+    # Publishes a learned clause to the other workers
+    def send(self, lits: List[int]):
+        buffer = self.buffer
+        with buffer.get_lock():
+            head = buffer[0]
+            end = head + 2 + len(lits)
+            if (end > len(buffer)):
+                return
+            buffer[head] = self.worker_id
+            buffer[head + 1] = len(lits)
+            buffer[head + 2:end] = lits
+            buffer[0] = end
+
+    # Returns the clauses other workers sent since the last call
+    def receive(self) -> List[List[int]]:
+        buffer = self.buffer
+        if (buffer[0] == self.read_pos):
+            return []
+        with buffer.get_lock():
+            head = buffer[0]
+            data = buffer[self.read_pos:head]
+        self.read_pos = head
+
+        clauses = []
+        pos = 0
+        while (pos < len(data)):
+            sender, size = data[pos], data[pos + 1]
+            if (sender != self.worker_id):
+                clauses.append(data[pos + 2:pos + 2 + size])
+            pos += 2 + size
+        return clauses
+
+# Races the configurations on cnf_file, one process each
+# timeout is the wall clock limit of the whole race in seconds, and mem_limit the memory limit of each worker in MB
+# Returns the result row of the first worker that found SAT or UNSAT, with the index of its configuration in config.
+# If none did, the row is TIMEOUT, or the failure of the last worker
+def run_portfolio(cnf_file: str, configs: List[Dict[str, Any]], timeout: float = None, mem_limit: int = None, share: bool = True) -> Dict[str, Any]:
+    exchange = ClauseExchange() if share else None
+    start = time.time()
+    running: Dict[multiprocessing.connection.Connection, Tuple[int, multiprocessing.Process]] = {}
+    for k, config in enumerate(configs):
+        conn, proc = start_worker(cnf_file, config, mem_limit, exchange.for_worker(k) if share else None)
+        running[conn] = (k, proc)
+
+    result = None
+    failed = None
+    try:
+        while (running and result is None):
+            wait_time = None if timeout is None else max(0, start + timeout - time.time())
+            ready = multiprocessing.connection.wait(list(running), wait_time)
+            if (not ready):
+                break
+
+            for conn in ready:
+                k, proc = running.pop(conn)
+                row = receive_result(conn, proc, cnf_file, mem_limit)
+                row["config"] = k
+                if (row["status"] in ("SAT", "UNSAT")):
+                    result = row
+                    break
+                failed = row
+    finally:
+        # Cancel the workers that are still solving
+        for conn, (k, proc) in running.items():
+            proc.kill()
+            proc.join()
+            conn.close()
+
+    if (result is None):
+        result = failed if (failed is not None and not running) else {"file": cnf_file, "status": "TIMEOUT"}
+    result["time"] = time.time() - start
+    return result
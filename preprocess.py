@@ -0,0 +1,317 @@
+from typing import *
+from array import array
+from SAT_structs import *
+
+# CNF preprocessor, run on the formula before it is given to SAT_solver.
+# Clauses are copied into sets of literal codes with occurrence lists per literal, and simplified with
+#   - top level unit propagation
+#   - pure literal elimination
+#   - backward subsumption and self-subsuming strengthening (each new or changed clause removes or shortens the clauses it subsumes)
+#   - forward subsumption of resolvents (a resolvent that an existing clause subsumes isnt added)
+#   - bounded variable elimination as in SatELite: a variable is replaced by all resolvents of its positive and negative clauses,
+#     if that doesnt add clauses and no resolvent is longer than the size limit
+# The result is an equisatisfiable formula over the same variable numbers. Clauses removed by elimination are kept on a stack,
+# so extend_model can assign the eliminated variables in a model of the simplified formula.
+# If a DRATWriter is given, every clause that is derived or changed is logged to it before the clauses it replaces are deleted,
+# so a DRAT proof of the solver on the simplified formula also holds for the original one.
+
+class Preprocessor:
+
+    # max_resolvent_size: longest resolvent bounded variable elimination may add
+    # max_occurrences: variables in more clauses than this arent eliminated
+    # grow: number of clauses elimination may add
+    # max_steps: budget of clauses visited by subsumption and resolution, simplification stops when it is used up
+    # max_lits: formulas with more literals than this are left unchanged, copying them would cost more than preprocessing saves
+    # proof: DRATWriter that derived and deleted clauses are logged to, if set
+    def __init__(self, formula: CNF_Formula, max_resolvent_size: int = 20, max_occurrences: int = 40, grow: int = 0, max_steps: int = 2000000,
+                 max_lits: int = 1000000, proof = None):
+        self.formula = formula
+        self.proof = proof
+        self.skipped = len(formula.lits) - formula.wasted > max_lits
+        self.num_vars = formula.num_vars
+        self.max_resolvent_size = max_resolvent_size
+        self.max_occurrences = max_occurrences
+        self.grow = grow
+        self.steps = max_steps
+
+        self.clauses: List[Set[int]] = []   # Literal codes of each clause, None if removed
+        self.sig: List[int] = []            # Bit (var_idx % 64) of every variable in the clause, to skip most subset tests
+        self.occurs: List[Set[int]] = [set() for _ in range(2 * self.num_vars + 2)]    # Clause indexes containing each literal code
+
+        self.value = bytearray([L_UNDEF]) * (2 * self.num_vars + 2)   # Top level value of each literal code
+        self.units: List[int] = []          # Assigned literals that havent been propagated
+        self.eliminated = bytearray(self.num_vars + 1)
+        self.elim_stack: List[Tuple[int, List[int]]] = []     # (pivot literal, clause) of each removed clause, in removal order
+        self.unsat = False
+
+        self.queue: List[int] = []          # Clauses to run backward subsumption with
+        self.queued: Set[int] = set()
+        self.touched: Set[int] = set()      # Variables whose clauses changed since they were last tried for elimination
+
+        self.subsumed_cnt = 0
+        self.strengthened_cnt = 0
+        self.pure_cnt = 0
+        self.eliminated_cnt = 0
+
+        if (self.skipped):
+            return
+        lits = formula.lits
+        for cref in formula.crefs():
+            start = formula.clause_start[cref]
+            self.add(lits[start:start + formula.clause_size[cref]])
+
+    # Simplifies the formula. Returns the simplified formula, which has an empty clause if the formula is UNSAT
+    def simplify(self) -> CNF_Formula:
+        if (self.skipped):
+            return self.formula
+        self.propagate()
+        self.eliminate_pure()
+        self.subsume_queued()
+
+        while (not self.unsat and self.touched and self.steps > 0):
+            # Try cheap variables first, cost is the number of resolvents
+            candidates = sorted(self.touched, key=lambda var_idx: len(self.occurs[2 * var_idx]) * len(self.occurs[2 * var_idx + 1]))
+            self.touched = set()
+            for var_idx in candidates:
+                if (self.unsat or self.steps <= 0):
+                    break
+                if (self.eliminated[var_idx] or self.value[2 * var_idx] != L_UNDEF):
+                    continue
+                if (self.eliminate_var(var_idx)):
+                    self.propagate()
+                    self.subsume_queued()
+
+        return self.to_formula()
+
+    # Adds clause, given as literal codes. Tautologies and satisfied clauses are skipped, false literals are dropped,
+    # and unit clauses are assigned instead of stored. Returns the clause index, or -1 if the clause wasnt stored
+    # derived is set for clauses that arent in the input formula, which are logged to the proof
+    def add(self, lits: Sequence[int], derived: bool = False) -> int:
+        value = self.value
+        clause = set()
+        for lit in lits:
+            if (value[lit] == L_TRUE or lit ^ 1 in clause):
+                return -1
+            if (value[lit] == L_UNDEF):
+                clause.add(lit)
+
+        if (self.proof is not None and (derived or len(clause) < len(lits))):
+            self.proof.add(clause)
+        if (len(clause) <= 1):
+            if (not clause):
+                self.unsat = True
+            else:
+                self.assign(next(iter(clause)))
+            return -1
+
+        idx = len(self.clauses)
+        self.clauses.append(clause)
+        sig = 0
+        for lit in clause:
+            self.occurs[lit].add(idx)
+            self.touched.add(lit >> 1)
+            sig |= 1 << ((lit >> 1) & 63)
+        self.sig.append(sig)
+        self.enqueue(idx)
+        return idx
+
+    def remove(self, idx: int):
+        if (self.proof is not None):
+            self.proof.delete(self.clauses[idx])
+        for lit in self.clauses[idx]:
+            self.occurs[lit].discard(idx)
+            self.touched.add(lit >> 1)
+        self.clauses[idx] = None
+
+    # Removes literal from clause
+    def strengthen(self, idx: int, lit: int):
+        clause = self.clauses[idx]
+        self.strengthened_cnt += 1
+        if (self.proof is not None):
+            self.proof.add(clause - {lit})
+
+        if (len(clause) == 2):
+            self.remove(idx)
+            self.assign(next(iter(clause - {lit})))
+            return
+
+        if (self.proof is not None):
+            self.proof.delete(clause)
+        clause.discard(lit)
+        self.occurs[lit].discard(idx)
+        self.touched.add(lit >> 1)
+
+        sig = 0
+        for other in clause:
+            sig |= 1 << ((other >> 1) & 63)
+        self.sig[idx] = sig
+        self.enqueue(idx)
+
+    def enqueue(self, idx: int):
+        if (idx not in self.queued):
+            self.queued.add(idx)
+            self.queue.append(idx)
+
+    # Assigns literal at the top level
+    def assign(self, lit: int):
+        if (self.value[lit] == L_TRUE):
+            return
+        if (self.value[lit] == L_FALSE):
+            self.unsat = True
+            return
+        self.value[lit] = L_TRUE
+        self.value[lit ^ 1] = L_FALSE
+        self.units.append(lit)
+
+    # Removes clauses satisfied by the assigned literals, and the false literals from the other clauses
+    def propagate(self):
+        while (self.units and not self.unsat):
+            lit = self.units.pop()
+            for idx in list(self.occurs[lit]):
+                self.remove(idx)
+            for idx in list(self.occurs[lit ^ 1]):
+                if (self.clauses[idx] is not None):
+                    self.strengthen(idx, lit ^ 1)
+
+    # Removes the clauses of variables that only appear in one sign. They are kept for extend_model, which sets that sign
+    def eliminate_pure(self):
+        for var_idx in range(1, self.num_vars + 1):
+            if (self.eliminated[var_idx] or self.value[2 * var_idx] != L_UNDEF):
+                continue
+            pos, neg = self.occurs[2 * var_idx + 1], self.occurs[2 * var_idx]
+            if (pos and not neg):
+                self.eliminate(var_idx, 2 * var_idx + 1)
+            elif (neg and not pos):
+                self.eliminate(var_idx, 2 * var_idx)
+            else:
+                continue
+            self.pure_cnt += 1
+
+    # Moves the clauses containing pivot (and its negation) to the elimination stack
+    def eliminate(self, var_idx: int, pivot: int):
+        for lit in (pivot, pivot ^ 1):
+            for idx in list(self.occurs[lit]):
+                self.elim_stack.append((lit, sorted(self.clauses[idx])))
+                self.remove(idx)
+        self.eliminated[var_idx] = True
+
+    # Runs backward subsumption with every queued clause
+    def subsume_queued(self):
+        while (self.queue and not self.unsat):
+            idx = self.queue.pop()
+            self.queued.discard(idx)
+            if (self.clauses[idx] is not None):
+                self.backward_subsume(idx)
+            self.propagate()
+            if (self.steps <= 0):
+                self.queue = []
+                self.queued = set()
+
+    # Removes the clauses that clause idx subsumes, and strengthens the clauses it subsumes after flipping one of its literals
+    def backward_subsume(self, idx: int):
+        clause = self.clauses[idx]
+        sig = self.sig[idx]
+
+        # Every such clause contains the variable of clause with the fewest occurrences
+        best = min(clause, key=lambda lit: len(self.occurs[lit]) + len(self.occurs[lit ^ 1]))
+        candidates = list(self.occurs[best]) + list(self.occurs[best ^ 1])
+        self.steps -= len(candidates)
+        for other_idx in candidates:
+            other = self.clauses[other_idx]
+            if (other_idx == idx or other is None or len(other) < len(clause) or sig & ~self.sig[other_idx]):
+                continue
+
+            diff = clause - other
+            if (not diff):
+                self.remove(other_idx)
+                self.subsumed_cnt += 1
+            elif (len(diff) == 1):
+                lit = next(iter(diff))
+                if (lit ^ 1 in other):
+                    self.strengthen(other_idx, lit ^ 1)
+            if (self.clauses[idx] is None):
+                break
+
+    # True if an existing clause subsumes lits
+    def forward_subsumed(self, lits: Set[int]) -> bool:
+        sig = 0
+        for lit in lits:
+            sig |= 1 << ((lit >> 1) & 63)
+        for lit in lits:
+            for idx in self.occurs[lit]:
+                self.steps -= 1
+                if (not self.sig[idx] & ~sig and self.clauses[idx] <= lits):
+                    return True
+        return False
+
+    # Bounded variable elimination. Replaces the clauses of var_idx with their resolvents,
+    # if there are no more resolvents than removed clauses (plus grow) and each resolvent is short enough
+    # Returns True if the variable was eliminated
+    def eliminate_var(self, var_idx: int) -> bool:
+        pos = [self.clauses[idx] for idx in self.occurs[2 * var_idx + 1]]
+        neg = [self.clauses[idx] for idx in self.occurs[2 * var_idx]]
+        if (not pos and not neg):
+            return False
+        if (not pos or not neg):
+            self.eliminate(var_idx, 2 * var_idx + 1 if pos else 2 * var_idx)
+            self.pure_cnt += 1
+            return True
+        if (len(pos) + len(neg) > self.max_occurrences):
+            return False
+
+        pivots = {2 * var_idx, 2 * var_idx + 1}
+        neg_sides = [(clause - pivots, {lit ^ 1 for lit in clause} - pivots) for clause in neg]
+        limit = len(pos) + len(neg) + self.grow
+        resolvents = []
+        for clause in pos:
+            side = clause - pivots
+            for (other, negated) in neg_sides:
+                self.steps -= 1
+                # Resolvent is a tautology if the clauses clash on another variable
+                if (not side.isdisjoint(negated)):
+                    continue
+                resolvent = side | other
+                if (len(resolvent) > self.max_resolvent_size or len(resolvents) >= limit):
+                    return False
+                resolvents.append(resolvent)
+
+        # Resolvents are added before the clauses are removed, so each step of a proof follows from the clauses before it
+        for resolvent in resolvents:
+            if (not self.forward_subsumed(resolvent)):
+                self.add(resolvent, derived=True)
+        self.eliminate(var_idx, 2 * var_idx + 1)
+        self.eliminated_cnt += 1
+        return True
+
+    # Formula of the remaining clauses, over the same variable numbers. Top level assignments are added as unit clauses
+    def to_formula(self) -> CNF_Formula:
+        lits = array('i')
+        sizes = array('i')
+        if (self.unsat):
+            sizes.append(0)
+        else:
+            for var_idx in range(1, self.num_vars + 1):
+                if (self.value[2 * var_idx] != L_UNDEF):
+                    lits.append(2 * var_idx + (self.value[2 * var_idx + 1] == L_TRUE))
+                    sizes.append(1)
+            for clause in self.clauses:
+                if (clause is not None):
+                    lits.extend(sorted(clause))
+                    sizes.append(len(clause))
+
+        formula = CNF_Formula(num_vars=self.num_vars)
+        formula.add_clauses(lits, sizes)
+        formula.count_appearances()
+        return formula
+
+    # Completes a model of the simplified formula into a model of the original formula
+    # model is an assignment list indexed by var number (None for unassigned), like SAT_solver.solve returns
+    def extend_model(self, model: List[bool]) -> List[bool]:
+        model = [False if val is None else val for val in model]
+        model.extend([False] * (self.num_vars + 1 - len(model)))
+
+        # Undo eliminations from the last one. If a removed clause is false, its pivot literal is made true
+        for (pivot, clause) in reversed(self.elim_stack):
+            if (not any(model[lit >> 1] == (lit & 1) for lit in clause)):
+                model[pivot >> 1] = (pivot & 1) == 1
+        return model
@@ -0,0 +1,330 @@
+from typing import *
+import asyncio
+import concurrent.futures
+import itertools
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import sys
+import time
+from batch import DEFAULT_OPTIONS, limit_memory, try_solve_instance
+from client import DEFAULT_PORT
+
+# Solver service: a long running process that answers solve requests over a local socket, so a query doesnt pay for interpreter start up,
+# imports and process creation. The protocol is described in client.py, which is also the client.
+# An asyncio server reads the requests of every connection and puts them on a bounded queue. When the queue is full the server stops
+# reading from the connection until there is room, so a client that sends faster than the workers solve is slowed down by the socket
+# (backpressure) instead of growing the queue. Requests are solved by a pool of worker processes that are started once and then reused,
+# with the solver modules already imported. Each worker has a task in the server that takes the next request off the queue,
+# sends it to its worker through a pipe and waits for the result in a thread, so the event loop keeps serving other connections.
+# A request that runs past its timeout, or is cancelled while it runs, is stopped by killing its worker, which is then replaced
+# by a new one. Requests of a connection that closes are cancelled.
+
+USAGE = ("Usage: python server.py [-socket PATH | -port N] [-workers N] [-queue N] [-timeout SECS] [-mem_limit MB] [-max_request MB]"
+         " [-no_vsids | -dpll | -no_preprocess]")
+
+DEFAULT_QUEUE_SIZE = 64
+DEFAULT_MAX_REQUEST = 64    # MB, largest request line
+
+# Solver options a request can change. The others name files on the server (proof, cache, checkpoint) or print to its output,
+# so they are only set when the server is started
+CLIENT_OPTIONS = {"dpll", "vsids", "restarts", "phase_saving", "preprocess", "inprocess", "decay", "default_phase", "seed", "sls", "sls_flips",
+                  "inputs_first", "conflict_budget", "propagation_budget", "time_budget", "mem_budget"}
+
+# Entry point of a worker process. Receives (name, file, DIMACS text, options) tasks and answers each with a result row
+# A None message stops the worker
+def service_worker(mem_limit: int, conn: multiprocessing.connection.Connection):
+    limit_memory(mem_limit)
+    # Ctrl-C in the terminal reaches the whole process group, the server stops the workers itself.
+    # Workers forked while the server runs inherit its asyncio signal handling, which is reset
+    signal.set_wakeup_fd(-1)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    while (True):
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if (task is None):
+            break
+        name, cnf_file, data, options = task
+        result = try_solve_instance(name, options, data=data) if cnf_file is None else try_solve_instance(cnf_file, options)
+        conn.send(result)
+    conn.close()
+
+class Request:
+
+    def __init__(self, request_id: Any, name: str, cnf_file: str, data: bytes, options: Dict[str, Any], timeout: float,
+                 writer: asyncio.StreamWriter):
+        self.id = request_id
+        self.name = name
+        self.cnf_file = cnf_file
+        self.data = data
+        self.options = options
+        self.timeout = timeout
+        self.writer = writer        # Connection the result goes to
+        self.worker: "Worker" = None     # Worker solving it
+        self.done = False           # Answered, or cancelled
+
+class Worker:
+
+    def __init__(self, mem_limit: int):
+        self.conn, worker_conn = multiprocessing.Pipe()
+        self.proc = multiprocessing.Process(target=service_worker, args=(mem_limit, worker_conn), daemon=True)
+        self.proc.start()
+        worker_conn.close()     # Only the worker holds its end, so recv fails if it dies
+        self.killed = False
+
+    # Stops the request the worker is solving. The worker has to be replaced then
+    def kill(self):
+        self.killed = True
+        self.proc.kill()
+
+    def stop(self):
+        self.proc.kill()
+        self.proc.join()
+        self.conn.close()
+
+class SolverService:
+
+    # workers: number of worker processes, queue_size: requests waiting for a worker before connections are no longer read
+    # timeout: default wall clock limit of a request in seconds, mem_limit: memory limit of each worker in MB
+    # options: solver options of requests that dont change them
+    def __init__(self, workers: int = 1, queue_size: int = DEFAULT_QUEUE_SIZE, timeout: float = None, mem_limit: int = None,
+                 options: Dict[str, Any] = None, max_request: int = DEFAULT_MAX_REQUEST):
+        self.worker_cnt = workers
+        self.timeout = timeout
+        self.mem_limit = mem_limit
+        self.options = dict(DEFAULT_OPTIONS, **(options or {}))
+        self.max_request = max_request * 1024 * 1024
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self.workers: List[Worker] = []
+        self.threads = concurrent.futures.ThreadPoolExecutor(workers)    # One thread waits on each busy worker
+        self.tasks: List[asyncio.Task] = []
+        self.server: asyncio.AbstractServer = None
+        self.busy_cnt = 0
+        self.answered_cnt = 0
+        self.ids = itertools.count(1)   # Ids of requests that dont have one
+
+    # Starts the workers and listens on a Unix socket if socket_path is given, otherwise on localhost port
+    async def start(self, socket_path: str = None, port: int = DEFAULT_PORT):
+        for slot in range(self.worker_cnt):
+            self.workers.append(Worker(self.mem_limit))
+            self.tasks.append(asyncio.create_task(self.run_worker(slot)))
+        if (socket_path is not None):
+            self.server = await asyncio.start_unix_server(self.handle_connection, socket_path, limit=self.max_request)
+        else:
+            self.server = await asyncio.start_server(self.handle_connection, "127.0.0.1", port, limit=self.max_request)
+
+    async def stop(self):
+        self.server.close()
+        for task in self.tasks:
+            task.cancel()
+        for worker in self.workers:
+            worker.stop()
+        self.threads.shutdown(wait=False)
+
+    # Sends message, and waits until the connection has taken it so replies to a client that doesnt read dont pile up in memory
+    async def reply(self, writer: asyncio.StreamWriter, message: Dict[str, Any]):
+        if (writer.is_closing()):
+            return
+        writer.write(json.dumps(message).encode() + b"\n")
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass    # Client is gone, handle_connection cancels its requests
+
+    async def finish(self, request: Request, result: Dict[str, Any]):
+        if (request.done):
+            return
+        request.done = True
+        self.answered_cnt += 1
+        await self.reply(request.writer, dict(result, id=request.id))
+
+    # Task of worker slot: solves requests from the queue one at a time
+    async def run_worker(self, slot: int):
+        loop = asyncio.get_running_loop()
+        while (True):
+            request = await self.queue.get()
+            if (request.done):
+                continue    # Cancelled while queued
+
+            worker = self.workers[slot]
+            request.worker = worker
+            self.busy_cnt += 1
+            start_time = time.time()
+            timed_out = False
+            try:
+                worker.conn.send((request.name, request.cnf_file, request.data, request.options))
+                received = loop.run_in_executor(self.threads, worker.conn.recv)
+                done, _ = await asyncio.wait([received], timeout=request.timeout)
+                if (not done):
+                    # Killing the worker ends the wait for its result
+                    timed_out = True
+                    worker.kill()
+                result = await received
+            except (EOFError, OSError):
+                worker.proc.join()
+                if (timed_out):
+                    result = {"file": request.name, "status": "TIMEOUT", "time": time.time() - start_time}
+                elif (worker.killed):
+                    result = None   # Cancelled, already answered
+                else:
+                    # Worker died without a result. SIGKILL is what the OOM killer sends
+                    status = "MEMOUT" if (self.mem_limit is not None and worker.proc.exitcode == -9) else "ERROR"
+                    result = {"file": request.name, "status": status, "error": f"worker exited with code {worker.proc.exitcode}"}
+                worker.killed = True
+            if (worker.killed):
+                worker.stop()
+                self.workers[slot] = Worker(self.mem_limit)
+            self.busy_cnt -= 1
+            request.worker = None
+            if (result is not None):
+                await self.finish(request, result)
+
+    # Reads the requests of one connection
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        requests: Dict[Any, Request] = {}   # Unanswered requests of this connection, by id
+        try:
+            while (True):
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    await self.reply(writer, {"status": "ERROR", "error": f"request is larger than {self.max_request} bytes"})
+                    break
+                except ConnectionError:
+                    break
+                if (not line):
+                    break
+                if (not line.strip()):
+                    continue
+                try:
+                    message = json.loads(line)
+                    if (not isinstance(message, dict)):
+                        raise ValueError("request is not a JSON object")
+                except ValueError as e:
+                    await self.reply(writer, {"status": "ERROR", "error": f"invalid request: {e}"})
+                    continue
+
+                for request_id in [request_id for request_id, request in requests.items() if request.done]:
+                    del requests[request_id]
+                op = message.get("op", "solve")
+                if (op == "solve"):
+                    request = await self.make_request(message, writer)
+                    if (request is not None):
+                        requests[request.id] = request
+                        await self.queue.put(request)
+                elif (op == "cancel"):
+                    request = requests.get(message.get("id"))
+                    if (request is not None):
+                        await self.cancel(request)
+                elif (op == "status"):
+                    await self.reply(writer, {"id": message.get("id"), "workers": self.worker_cnt, "busy": self.busy_cnt,
+                                              "queued": self.queue.qsize(), "answered": self.answered_cnt})
+                else:
+                    await self.reply(writer, {"id": message.get("id"), "status": "ERROR", "error": f"unknown op {op}"})
+        finally:
+            # Nobody is left to read the results
+            for request in requests.values():
+                await self.cancel(request)
+            writer.close()
+
+    # Request of a solve message, None if it is invalid (it is answered with an ERROR row then)
+    async def make_request(self, message: Dict[str, Any], writer: asyncio.StreamWriter) -> Request:
+        request_id = message.get("id", next(self.ids))
+        options = message.get("options") or {}
+        refused = [key for key in options if key not in CLIENT_OPTIONS] if isinstance(options, dict) else ["options"]
+        timeout = message.get("timeout", self.timeout)
+        error = None
+        if (refused):
+            error = f"options {', '.join(map(str, refused))} cant be set by a request"
+        elif (timeout is not None and not (isinstance(timeout, (int, float)) and timeout > 0)):
+            error = "timeout must be a positive number of seconds"
+        elif (isinstance(message.get("dimacs"), str)):
+            name = message.get("name") or f"request {request_id}"
+            return Request(request_id, str(name), None, message["dimacs"].encode(), dict(self.options, **options), timeout, writer)
+        elif (isinstance(message.get("file"), str)):
+            name = message["file"]
+            return Request(request_id, name, name, None, dict(self.options, **options), timeout, writer)
+        else:
+            error = "request needs a file or dimacs"
+        await self.reply(writer, {"id": request_id, "status": "ERROR", "error": error})
+        return None
+
+    # Answers request as CANCELLED, and stops its worker if it is running
+    async def cancel(self, request: Request):
+        if (request.done):
+            return
+        # The worker is stopped before waiting on the reply, when it may have moved on to another request
+        if (request.worker is not None):
+            request.worker.kill()
+        await self.finish(request, {"file": request.name, "status": "CANCELLED"})
+
+async def serve(service: SolverService, socket_path: str = None, port: int = DEFAULT_PORT):
+    await service.start(socket_path, port)
+    print(f"Solver service listening on {socket_path or f'127.0.0.1:{port}'} with {service.worker_cnt} workers", flush=True)
+
+    # SIGINT and SIGTERM stop the server
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopped.set)
+    await stopped.wait()
+    await service.stop()
+    if (socket_path is not None and os.path.exists(socket_path)):
+        os.unlink(socket_path)
+
+if __name__ == "__main__":
+    socketPath = None
+    port = DEFAULT_PORT
+    workers = 1
+    queueSize = DEFAULT_QUEUE_SIZE
+    timeout = None
+    memLimit = None
+    maxRequest = DEFAULT_MAX_REQUEST
+    options = {}
+
+    args = sys.argv[1:]
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        i += 1
+        if arg == "-no_vsids":
+            options["vsids"] = False
+        elif arg == "-dpll":
+            options["dpll"] = True
+        elif arg == "-no_preprocess":
+            options["preprocess"] = False
+        elif arg in ("-socket", "-port", "-workers", "-queue", "-timeout", "-mem_limit", "-max_request"):
+            if i >= len(args):
+                print(USAGE)
+                sys.exit(1)
+            value = args[i]
+            i += 1
+            try:
+                if arg == "-socket":
+                    socketPath = value
+                elif arg == "-port":
+                    port = int(value)
+                elif arg == "-workers":
+                    workers = max(1, int(value))
+                elif arg == "-queue":
+                    queueSize = max(1, int(value))
+                elif arg == "-timeout":
+                    timeout = float(value)
+                elif arg == "-mem_limit":
+                    memLimit = int(value)
+                else:
+                    maxRequest = max(1, int(value))
+            except ValueError:
+                print(USAGE)
+                sys.exit(1)
+        else:
+            print(USAGE)
+            sys.exit(1)
+
+    if socketPath is not None and os.path.exists(socketPath):
+        os.unlink(socketPath)   # Left over from a server that didnt stop cleanly
+    asyncio.run(serve(SolverService(workers, queueSize, timeout, memLimit, options, maxRequest), socketPath, port))
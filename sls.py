@@ -0,0 +1,208 @@
+from typing import *
+import random
+from array import array
+from SAT_structs import *
+
+# Stochastic local search (SLS) for satisfiable formulas, used by the -sls mode of mySAT.py and to seed the saved phases of SAT_solver.
+# A complete assignment is repaired one variable flip at a time. Each clause keeps its number of true literals, and the sum of the
+# variable numbers of its true literals, which is the variable of the only true literal when there is one. From these the break count
+# (clauses that become false if the variable is flipped) and make count (false clauses that become true) of every variable are updated
+# on each flip, visiting only the clauses of the flipped variable. False clauses are kept in a list with the position of each clause in it,
+# so a random false clause is picked, added or removed in constant time.
+# Two pick rules are available:
+#   probsat: flips a variable of a random false clause, chosen with probability proportional to (eps + break)^-cb
+#   walksat: flips a variable of a random false clause that breaks nothing if there is one. Otherwise a random one with probability noise,
+#            or else the one with the fewest breaks, most makes on ties
+# Local search cant prove UNSAT, it gives up after max_flips flips. The assignment with the fewest false clauses is kept in best_value,
+# to seed the phases of the CDCL solver.
+
+SLS_ALGORITHMS = ("probsat", "walksat")
+
+DEFAULT_MAX_FLIPS = 200000
+
+class LocalSearch:
+
+    # cb and eps are the probsat parameters (cb = 2.3 is tuned for 3-SAT), noise is the walksat random walk probability
+    def __init__(self, formula: CNF_Formula, algorithm: str = "probsat", seed: int = None, cb: float = 2.3, eps: float = 1.0,
+                 noise: float = 0.567):
+        if (algorithm not in SLS_ALGORITHMS):
+            raise ValueError(f"unknown local search algorithm {algorithm}")
+        self.algorithm = algorithm
+        self.num_vars = formula.num_vars
+        self.rng = random.Random(seed)
+        self.noise = noise
+
+        # Clauses without duplicate literals. Tautologies are always true, so they are left out
+        self.clauses: List[List[int]] = []
+        self.has_empty = False
+        for cref in formula.crefs():
+            lits = list(dict.fromkeys(formula.clause_lits(cref)))
+            if (not lits):
+                self.has_empty = True
+            elif (not any(lit ^ 1 in lits for lit in lits)):
+                self.clauses.append(lits)
+
+        self.occurs: List[List[int]] = [[] for _ in range(2 * self.num_vars + 2)]     # Clause indexes containing each literal code
+        for idx, lits in enumerate(self.clauses):
+            for lit in lits:
+                self.occurs[lit].append(idx)
+
+        num_clauses = len(self.clauses)
+        self.value = bytearray(self.num_vars + 1)           # 1 if the variable is true
+        self.true_cnt = array('i', [0]) * num_clauses       # Number of true literals of each clause
+        self.true_sum = array('q', [0]) * num_clauses       # Sum of the variable numbers of the true literals of each clause
+        self.break_cnt = array('i', [0]) * (self.num_vars + 1)
+        self.make_cnt = array('i', [0]) * (self.num_vars + 1)
+        self.unsat: List[int] = []                          # False clauses
+        self.unsat_pos = array('i', [-1]) * num_clauses     # Index of each false clause in unsat
+
+        # probsat weight of each break count. A variable cant break more clauses than it is in
+        max_occurs = max((len(occ) for occ in self.occurs), default=0)
+        self.weights = [(eps + b) ** -cb for b in range(max_occurs + 1)]
+
+        self.best_value = bytearray(self.value)
+        self.best_unsat = num_clauses + 1
+        self.flip_cnt = 0
+        self.restart_cnt = 0
+
+    # Starts from an assignment: phases where given (a list of bools indexed by var number, None for no preference), random elsewhere
+    def reset(self, phases: Sequence[bool] = None):
+        rng = self.rng
+        value = self.value
+        for var_idx in range(1, self.num_vars + 1):
+            phase = phases[var_idx] if (phases is not None and var_idx < len(phases)) else None
+            value[var_idx] = (rng.random() < 0.5) if phase is None else phase
+
+        # Counts from scratch
+        true_cnt = self.true_cnt
+        true_sum = self.true_sum
+        break_cnt = self.break_cnt
+        make_cnt = self.make_cnt
+        for var_idx in range(self.num_vars + 1):
+            break_cnt[var_idx] = 0
+            make_cnt[var_idx] = 0
+        self.unsat = []
+        for idx, lits in enumerate(self.clauses):
+            true_vars = [lit >> 1 for lit in lits if value[lit >> 1] == lit & 1]
+            true_cnt[idx] = len(true_vars)
+            true_sum[idx] = sum(true_vars)
+            self.unsat_pos[idx] = -1
+            if (not true_vars):
+                self.unsat_pos[idx] = len(self.unsat)
+                self.unsat.append(idx)
+                for lit in lits:
+                    make_cnt[lit >> 1] += 1
+            elif (len(true_vars) == 1):
+                break_cnt[true_vars[0]] += 1
+        self.save_best()
+
+    def save_best(self):
+        if (len(self.unsat) < self.best_unsat):
+            self.best_unsat = len(self.unsat)
+            self.best_value[:] = self.value
+
+    # Flips var_idx and updates the counts of the clauses it is in
+    def flip(self, var_idx: int):
+        value = self.value
+        clauses = self.clauses
+        true_cnt = self.true_cnt
+        true_sum = self.true_sum
+        break_cnt = self.break_cnt
+        make_cnt = self.make_cnt
+        unsat = self.unsat
+        unsat_pos = self.unsat_pos
+
+        value[var_idx] ^= 1
+        new_true = 2 * var_idx + value[var_idx]     # Literal code that became true
+        self.flip_cnt += 1
+
+        for idx in self.occurs[new_true]:
+            cnt = true_cnt[idx]
+            true_cnt[idx] = cnt + 1
+            if (cnt == 0):
+                # Clause became true. Swap the last false clause into its place
+                pos = unsat_pos[idx]
+                last = unsat.pop()
+                if (last != idx):
+                    unsat[pos] = last
+                    unsat_pos[last] = pos
+                unsat_pos[idx] = -1
+                for lit in clauses[idx]:
+                    make_cnt[lit >> 1] -= 1
+                break_cnt[var_idx] += 1
+            elif (cnt == 1):
+                # The previous only true literal no longer breaks the clause
+                break_cnt[true_sum[idx]] -= 1
+            true_sum[idx] += var_idx
+
+        for idx in self.occurs[new_true ^ 1]:
+            cnt = true_cnt[idx] - 1
+            true_cnt[idx] = cnt
+            rest = true_sum[idx] - var_idx
+            true_sum[idx] = rest
+            if (cnt == 0):
+                unsat_pos[idx] = len(unsat)
+                unsat.append(idx)
+                for lit in clauses[idx]:
+                    make_cnt[lit >> 1] += 1
+                break_cnt[var_idx] -= 1
+            elif (cnt == 1):
+                # The remaining true literal now breaks the clause
+                break_cnt[rest] += 1
+
+    # Variable of the false clause idx to flip
+    def pick(self, idx: int) -> int:
+        lits = self.clauses[idx]
+        break_cnt = self.break_cnt
+        rng = self.rng
+
+        if (self.algorithm == "probsat"):
+            weights = self.weights
+            scores = [weights[break_cnt[lit >> 1]] for lit in lits]
+            r = rng.random() * sum(scores)
+            for lit, score in zip(lits, scores):
+                r -= score
+                if (r <= 0):
+                    return lit >> 1
+            return lits[-1] >> 1
+
+        breaks = [break_cnt[lit >> 1] for lit in lits]
+        least = min(breaks)
+        if (least == 0):
+            return rng.choice([lit >> 1 for lit, b in zip(lits, breaks) if b == 0])
+        if (rng.random() < self.noise):
+            return lits[int(rng.random() * len(lits))] >> 1
+        make_cnt = self.make_cnt
+        return max((lit >> 1 for lit, b in zip(lits, breaks) if b == least), key=make_cnt.__getitem__)
+
+    # Searches for a model for at most max_flips flips. Starts from phases if given (see reset), and from a new random assignment
+    # every restart_interval flips if that is set
+    # Returns an assignment list indexed by var number like SAT_solver.solve, or None if no model was found
+    def solve(self, max_flips: int = DEFAULT_MAX_FLIPS, phases: Sequence[bool] = None, restart_interval: int = None) -> List[bool]:
+        if (self.has_empty):
+            return None
+        self.reset(phases)
+        unsat = self.unsat
+        rng = self.rng
+        flip_limit = self.flip_cnt + max_flips
+        next_restart = None if restart_interval is None else self.flip_cnt + restart_interval
+
+        while (True):
+            unsat = self.unsat
+            if (not unsat):
+                return [None] + [self.value[var_idx] == 1 for var_idx in range(1, self.num_vars + 1)]
+            if (self.flip_cnt >= flip_limit):
+                return None
+            if (next_restart is not None and self.flip_cnt >= next_restart):
+                self.restart_cnt += 1
+                next_restart = self.flip_cnt + restart_interval
+                self.reset()
+                continue
+
+            self.flip(self.pick(unsat[int(rng.random() * len(unsat))]))
+            if (len(unsat) < self.best_unsat):
+                self.save_best()
+
+    # Best assignment found so far, as an assignment list indexed by var number
+    def best_phases(self) -> List[bool]:
+        return [None] + [self.best_value[var_idx] == 1 for var_idx in range(1, self.num_vars + 1)]
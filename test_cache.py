@@ -0,0 +1,36 @@
+from typing import *
+import json
+from SAT_structs import *
+from batch import DEFAULT_OPTIONS, solve_instance
+from cache import ResultCache
+
+CNF = "p cnf 3 3\n1 2 0\n-1 3 0\n-2 -3 0\n"
+# Same clause set, clauses and literals in another order
+SHUFFLED_CNF = "p cnf 3 3\n-3 -2 0\n3 -1 0\n2 1 0\n"
+
+def write_cnf(tmp_path, name: str, text: str) -> str:
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+def test_repeated_formula_is_answered_from_cache(tmp_path):
+    options = dict(DEFAULT_OPTIONS, cache=str(tmp_path / "cache"))
+    first = solve_instance(write_cnf(tmp_path, "a.cnf", CNF), options)
+    second = solve_instance(write_cnf(tmp_path, "b.cnf", SHUFFLED_CNF), options)
+    assert first["status"] == second["status"] == "SAT"
+    assert "cached" not in first["stats"]
+    assert second["stats"]["cached"]
+    assert second["model"] == first["model"]
+
+# A cached model is checked against the formula, and an entry whose model doesnt satisfy it is dropped
+def test_wrong_cached_model_is_dropped(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"))
+    formula = CNF_Formula.from_dimacs_file(write_cnf(tmp_path, "a.cnf", CNF), fingerprint=True)
+    cache.store(formula.fingerprint, {"status": "SAT", "model": [1, -2, 3]})
+    assert cache.lookup(formula) == {"status": "SAT", "model": [1, -2, 3]}
+
+    with open(cache.entry_path(formula.fingerprint), "w") as f:
+        json.dump({"status": "SAT", "model": [1, 2, 3], "proof": False}, f)
+    assert cache.lookup(formula) is None
+    assert cache.lookup(formula) is None
+    assert solve_instance(write_cnf(tmp_path, "b.cnf", CNF), dict(DEFAULT_OPTIONS, cache=cache.directory))["model"] != [1, 2, 3]
@@ -0,0 +1,73 @@
+from typing import *
+import os
+import random
+import pytest
+from SAT_structs import *
+from SAT_solver import SAT_solver
+from batch import DEFAULT_OPTIONS, solve_instance
+from checkpoint import save_checkpoint, load_checkpoint
+
+# Random 3-SAT at the threshold that takes a few hundred conflicts, as DIMACS text
+def random_cnf(seed: int, num_vars: int = 70) -> str:
+    rng = random.Random(seed)
+    clauses = [[rng.choice([-1, 1]) * var_idx for var_idx in rng.sample(range(1, num_vars + 1), 3)] for _ in range(round(4.26 * num_vars))]
+    return f"p cnf {num_vars} {len(clauses)}\n" + "".join(" ".join(map(str, clause)) + " 0\n" for clause in clauses)
+
+def write_cnf(tmp_path, seed: int) -> str:
+    path = tmp_path / f"r{seed}.cnf"
+    path.write_text(random_cnf(seed))
+    return str(path)
+
+def satisfies(model: List[bool], formula: CNF_Formula) -> bool:
+    return all(any(model[lit >> 1] == bool(lit & 1) for lit in formula.clause_lits(cref)) for cref in formula.crefs())
+
+# A search cut into slices of a few conflicts, each continued from a checkpoint in a new solver, gets the answer of one solve call
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_search_continues_from_checkpoints(tmp_path, seed: int):
+    cnf_file = write_cnf(tmp_path, seed)
+    expected = SAT_solver(CNF_Formula.from_dimacs_file(cnf_file)).solve(useVSIDS=True) is not None
+    checkpoint = str(tmp_path / "solver.ckp")
+
+    solver = SAT_solver(CNF_Formula.from_dimacs_file(cnf_file))
+    slices = 0
+    while (True):
+        solver.set_budget(conflicts=20)
+        model = solver.solve(useVSIDS=True)
+        if (solver.status != "UNKNOWN"):
+            break
+        slices += 1
+        conflicts = solver.conflict_cnt
+        learnts = len(solver.learnts.crefs)
+        save_checkpoint(solver, checkpoint, {"seed": seed})
+        solver, info = load_checkpoint(checkpoint)
+        assert info == {"seed": seed}
+        assert solver.conflict_cnt == conflicts
+        assert len(solver.learnts.crefs) == learnts
+    assert slices > 0
+    assert (model is not None) == expected
+    if (model is not None):
+        assert satisfies(model, CNF_Formula.from_dimacs_file(cnf_file))
+
+def test_load_rejects_other_files(tmp_path):
+    path = tmp_path / "not.ckp"
+    path.write_bytes(b"p cnf 1 1\n1 0\n")
+    with pytest.raises(ValueError):
+        load_checkpoint(str(path))
+
+# Batch mode saves the checkpoint when a budget runs out, continues from it, and deletes it once it has the answer
+def test_batch_resumes_and_removes_checkpoint(tmp_path):
+    cnf_file = write_cnf(tmp_path, 1)
+    checkpoint = str(tmp_path / "solver.ckp")
+    options = dict(DEFAULT_OPTIONS, conflict_budget=20, checkpoint=checkpoint)
+    result = solve_instance(cnf_file, options)
+    assert result["status"] == "UNKNOWN"
+    assert result["stats"]["stopped_by"] == "conflicts"
+    assert os.path.exists(checkpoint)
+
+    for _ in range(100):
+        result = solve_instance(cnf_file, options)
+        assert result["stats"]["resumed"]
+        if (result["status"] != "UNKNOWN"):
+            break
+    assert result["status"] in ("SAT", "UNSAT")
+    assert not os.path.exists(checkpoint)
@@ -0,0 +1,64 @@
+from typing import *
+import itertools
+import random
+import pytest
+from SAT_solver import SAT_solver
+from circuit import AIG, AIG_FALSE, AIG_TRUE, load_formula
+
+# Value of an AIG literal for the given input values, by evaluating the graph
+def evaluate(aig: AIG, lit: int, inputs: Sequence[bool]) -> bool:
+    values = [False] * len(aig.fanins)
+    for node, val in zip(aig.inputs, inputs):
+        values[node] = val
+    for node in range(1, len(aig.fanins)):
+        if (aig.is_and(node)):
+            a, b = aig.fanins[node]
+            values[node] = (values[a >> 1] ^ bool(a & 1)) and (values[b >> 1] ^ bool(b & 1))
+    return values[lit >> 1] ^ bool(lit & 1)
+
+# Random circuit with one output. Fanins are drawn from the last nodes, which gives deep chains with shared gates
+def random_aig(rng: random.Random, input_cnt: int, gate_cnt: int) -> AIG:
+    aig = AIG()
+    lits = [AIG_FALSE] + [aig.add_input(f"i{k}") for k in range(input_cnt)]
+    for _ in range(gate_cnt):
+        a, b = rng.sample(lits[-6:], 2) if len(lits) > 2 else (lits[-1], lits[-1])
+        lits.append(aig.add_and(a ^ rng.randint(0, 1), b ^ rng.randint(0, 1)))
+    aig.add_output(lits[-1] ^ rng.randint(0, 1), "out")
+    return aig
+
+# With its inputs fixed, the formula is SAT exactly if the circuit evaluates the output to 1
+@pytest.mark.parametrize("plaisted_greenbaum", [True, False])
+def test_encoding_matches_evaluation(plaisted_greenbaum: bool):
+    rng = random.Random(6)
+    for _ in range(60):
+        aig = random_aig(rng, rng.randint(1, 5), rng.randint(1, 12))
+        formula = aig.encode(plaisted_greenbaum)
+        solver = SAT_solver(formula)
+        for inputs in itertools.product((False, True), repeat=len(aig.inputs)):
+            assumptions = [2 * var_idx + val for var_idx, val in zip(aig.input_vars, inputs)]
+            model = solver.solve(useVSIDS=True, assumptions=assumptions)
+            assert (model is not None) == evaluate(aig, aig.outputs[0], inputs)
+
+def test_structural_hashing_and_constants():
+    aig = AIG()
+    a = aig.add_input("a")
+    b = aig.add_input("b")
+    assert aig.add_and(a, b) == aig.add_and(b, a)
+    assert aig.add_and(a, a ^ 1) == AIG_FALSE
+    assert aig.add_and(a, AIG_TRUE) == a
+    assert aig.add_or(a, AIG_TRUE) == AIG_TRUE
+
+# A miter of two XORs written differently is UNSAT, and of an XOR and an OR is SAT
+@pytest.mark.parametrize("second, sat", [("10 1\n01 1", False), ("1- 1\n-1 1", True)])
+def test_blif_miter(tmp_path, second: str, sat: bool):
+    blif = tmp_path / "miter.blif"
+    blif.write_text(".model miter\n.inputs a b\n.outputs diff\n"
+                    ".names a b x\n11 0\n00 0\n"
+                    f".names a b y\n{second}\n"
+                    ".names x y diff\n10 1\n01 1\n.end\n")
+    formula, aig = load_formula(str(blif))
+    model = SAT_solver(formula).solve(useVSIDS=True)
+    assert (model is not None) == sat
+    if (sat):
+        # XOR and OR only differ if both inputs are 1
+        assert [model[var_idx] for var_idx in aig.input_vars] == [True, True]
@@ -0,0 +1,34 @@
+from typing import *
+import glob
+import os
+import pytest
+from batch import DEFAULT_OPTIONS, solve_instance
+from drat import check_drat
+
+AIM_UNSAT = sorted(glob.glob(os.path.join(os.path.dirname(__file__), "aim", "aim-50-*-no-*.cnf")))
+
+# (x1 + x2) (x1' + x2) (x1 + x2') (x1' + x2')
+UNSAT_CNF = "p cnf 2 4\n1 2 0\n-1 2 0\n1 -2 0\n-1 -2 0\n"
+
+@pytest.mark.parametrize("proof_binary", [True, False])
+@pytest.mark.parametrize("preprocess", [True, False])
+def test_unsat_proofs_check(tmp_path, proof_binary: bool, preprocess: bool):
+    proof_file = str(tmp_path / "proof.drat")
+    for cnf_file in AIM_UNSAT:
+        options = dict(DEFAULT_OPTIONS, proof=proof_file, proof_binary=proof_binary, preprocess=preprocess)
+        assert solve_instance(cnf_file, options)["status"] == "UNSAT"
+        assert check_drat(cnf_file, proof_file) == (True, None)
+
+@pytest.mark.parametrize("proof, valid", [
+    ("2 0\n0\n", True),             # x2 is RUP, and then the empty clause is
+    ("d 1 2 0\n2 0\n0\n", False),  # x2 needs the deleted clause
+    ("0\n", False),                 # Propagation alone finds no conflict
+    ("-1 -2 0\n", False),           # No empty clause
+    ("-1 -2 0\n0\n", False),        # The step holds but doesnt help
+])
+def test_checker_on_text_proofs(tmp_path, proof: str, valid: bool):
+    cnf_file = tmp_path / "f.cnf"
+    cnf_file.write_text(UNSAT_CNF)
+    proof_file = tmp_path / "proof.drat"
+    proof_file.write_text(proof)
+    assert check_drat(str(cnf_file), str(proof_file))[0] == valid
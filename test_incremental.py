@@ -0,0 +1,79 @@
+from typing import *
+import itertools
+import random
+from SAT_structs import *
+from SAT_solver import SAT_solver
+
+def formula_of(clauses: List[List[int]], num_vars: int) -> CNF_Formula:
+    return CNF_Formula([CNF_Clause([CNF_Literal(abs(lit), lit > 0) for lit in clause]) for clause in clauses], num_vars)
+
+def code(lit: int) -> int:
+    return 2 * abs(lit) + (lit > 0)
+
+def signed(lit: int) -> int:
+    return lit >> 1 if lit & 1 else -(lit >> 1)
+
+def is_sat(clauses: List[List[int]], num_vars: int) -> bool:
+    for bits in itertools.product((False, True), repeat=num_vars):
+        if (all(any(bits[abs(lit) - 1] == (lit > 0) for lit in clause) for clause in clauses)):
+            return True
+    return False
+
+def random_clauses(rng: random.Random, num_vars: int, count: int) -> List[List[int]]:
+    return [[rng.choice([-1, 1]) * var_idx for var_idx in rng.sample(range(1, num_vars + 1), 3)] for _ in range(count)]
+
+# The failed assumptions of an UNSAT call are assumptions, and are UNSAT with the formula on their own
+def test_assumptions_and_cores():
+    rng = random.Random(3)
+    failed = 0
+    for _ in range(100):
+        num_vars = rng.randint(5, 10)
+        clauses = random_clauses(rng, num_vars, 3 * num_vars)
+        solver = SAT_solver(formula_of(clauses, num_vars))
+        for _ in range(5):
+            assumptions = [rng.choice([-1, 1]) * var_idx for var_idx in rng.sample(range(1, num_vars + 1), rng.randint(1, 4))]
+            model = solver.solve(useVSIDS=True, assumptions=[code(lit) for lit in assumptions])
+            assert (model is not None) == is_sat(clauses + [[lit] for lit in assumptions], num_vars)
+            if (model is not None):
+                assert all(model[abs(lit)] == (lit > 0) for lit in assumptions)
+                assert all(any(model[abs(lit)] == (lit > 0) for lit in clause) for clause in clauses)
+            elif (solver.ok):
+                failed += 1
+                core = [signed(lit) for lit in solver.core]
+                assert set(core) <= set(assumptions)
+                assert not is_sat(clauses + [[lit] for lit in core], num_vars)
+    assert failed > 0
+
+# Clauses added between calls are kept
+def test_add_clause_between_calls():
+    rng = random.Random(4)
+    for _ in range(50):
+        num_vars = 8
+        clauses = random_clauses(rng, num_vars, 10)
+        solver = SAT_solver(formula_of(clauses, num_vars))
+        for _ in range(12):
+            clause = random_clauses(rng, num_vars, 1)[0]
+            clauses.append(clause)
+            solver.add_clause([code(lit) for lit in clause])
+            assert (solver.solve(useVSIDS=True) is not None) == is_sat(clauses, num_vars)
+
+# Clauses added with the negation of a new variable only hold in the calls that assume the variable
+def test_retract_clauses_with_selector():
+    solver = SAT_solver(formula_of([[1, 2]], 2))
+    selector = solver.new_var()
+    solver.add_clause([code(-1), 2 * selector])
+    solver.add_clause([code(-2), 2 * selector])
+    assert solver.solve(assumptions=[2 * selector + 1]) is None
+    assert solver.core == [2 * selector + 1]
+    assert solver.solve() is not None
+
+# Inprocessing substitutes equivalent variables by one representative. Assumptions on both of them are then the same literal,
+# and the core names every assumption that literal came from
+def test_core_of_substituted_assumptions():
+    solver = SAT_solver(formula_of([[1, -2], [-1, 2], [-1, -3], [3, 4, 1]], 4))
+    assert solver.solve() is not None
+    solver.propagator.cancel_until(0)
+    assert solver.inprocessor.run()
+    assert solver.inprocessor.map_lit(code(1)) == solver.inprocessor.map_lit(code(2))
+    assert solver.solve(assumptions=[code(1), code(2), code(3)]) is None
+    assert sorted(solver.core) == sorted([code(1), code(2), code(3)])
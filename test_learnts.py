@@ -0,0 +1,37 @@
+from typing import *
+from SAT_structs import *
+
+# Literal code of variable var_idx, negated if not sign
+def lit(var_idx: int, sign: bool = True) -> int:
+    return 2 * var_idx + sign
+
+# A hyper binary clause [lit, dominator ^ 1] from probing implies its second literal. Reduce must not delete it while it is that reason
+def test_reduce_keeps_hyper_binary_reason_on_second_literal():
+    formula = CNF_Formula(num_vars=8)
+    formula.add_clause([lit(5), lit(6), lit(7)])
+    formula.count_appearances()
+    prop = CNF_Propagator(formula)
+    learnts = CNF_LearntDB(formula)
+
+    # Added like probe adds hyper binaries, so it is in TIER2 and is demoted to LOCAL by the reduce, with the lowest activity
+    binary = learnts.add([lit(1), lit(2, False)], learnts.core_lbd + 1)
+    prop.attach(binary)
+    learnts.activity[binary] = 0.0
+    for k in range(3):
+        prop.attach(learnts.add([lit(3 + k), lit(4 + k, False), lit(8)], learnts.tier2_lbd + 1))
+
+    prop.decide(lit(1, False))
+    assert prop.propagate() is None
+    assert prop.value[lit(2, False)] == L_TRUE
+    assert prop.reason[2] == binary
+
+    deleted = learnts.reduce(prop)
+    assert binary not in deleted
+    assert binary in learnts.crefs
+    assert not formula.clause_flags[binary] & CLAUSE_DELETED
+    assert len(deleted) == 2
+
+    # Once the assignment is undone the clause can go
+    prop.cancel_until(0)
+    learnts.next_reduce = 0
+    assert binary in learnts.reduce(prop)
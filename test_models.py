@@ -0,0 +1,34 @@
+from typing import *
+import itertools
+import random
+from SAT_structs import *
+from models import ModelCounter, enumerate_models
+
+def formula_of(clauses: List[List[int]], num_vars: int) -> CNF_Formula:
+    return CNF_Formula([CNF_Clause([CNF_Literal(abs(lit), lit > 0) for lit in clause]) for clause in clauses], num_vars)
+
+# Models as tuples of signed variable numbers
+def all_models(clauses: List[List[int]], num_vars: int) -> Set[Tuple[int, ...]]:
+    models = set()
+    for bits in itertools.product((False, True), repeat=num_vars):
+        if (all(any(bits[abs(lit) - 1] == (lit > 0) for lit in clause) for clause in clauses)):
+            models.add(tuple(var_idx if bits[var_idx - 1] else -var_idx for var_idx in range(1, num_vars + 1)))
+    return models
+
+# Few clauses over more variables, so formulas fall apart into components and leave variables free
+def test_count_and_enumerate_agree_with_brute_force():
+    rng = random.Random(5)
+    for _ in range(150):
+        num_vars = rng.randint(1, 11)
+        clauses = [[rng.choice([-1, 1]) * var_idx for var_idx in rng.sample(range(1, num_vars + 1), min(num_vars, rng.randint(1, 3)))]
+                   for _ in range(rng.randint(0, 2 * num_vars))]
+        expected = all_models(clauses, num_vars)
+        assert ModelCounter(formula_of(clauses, num_vars)).count() == len(expected)
+        models = [tuple(model) for model in enumerate_models(formula_of(clauses, num_vars))]
+        assert len(models) == len(expected)
+        assert set(models) == expected
+
+def test_enumerate_stops_at_limit():
+    models = list(enumerate_models(formula_of([[1, 2, 3]], 3), limit=4))
+    assert len(models) == 4
+    assert len(set(map(tuple, models))) == 4
@@ -0,0 +1,38 @@
+from typing import *
+import itertools
+import random
+from SAT_structs import *
+from SAT_solver import SAT_solver
+from preprocess import Preprocessor
+
+def formula_of(clauses: List[List[int]], num_vars: int) -> CNF_Formula:
+    return CNF_Formula([CNF_Clause([CNF_Literal(abs(lit), lit > 0) for lit in clause]) for clause in clauses], num_vars)
+
+def satisfies(model: List[bool], clauses: List[List[int]]) -> bool:
+    return all(any(model[abs(lit)] == (lit > 0) for lit in clause) for clause in clauses)
+
+def is_sat(clauses: List[List[int]], num_vars: int) -> bool:
+    return any(satisfies((None,) + bits, clauses) for bits in itertools.product((False, True), repeat=num_vars))
+
+# Mostly short clauses over few variables, so units, pure literals, subsumption and variable elimination all apply
+def random_clauses(rng: random.Random, num_vars: int) -> List[List[int]]:
+    clauses = []
+    for _ in range(rng.randint(num_vars, 4 * num_vars)):
+        size = rng.choice([1, 2, 2, 3, 3, 3, 4])
+        clauses.append([rng.choice([-1, 1]) * var_idx for var_idx in rng.sample(range(1, num_vars + 1), size)])
+    return clauses
+
+# A model of the simplified formula, extended by the preprocessor, is a model of the original formula
+def test_extend_model_satisfies_original_formula():
+    rng = random.Random(2)
+    eliminated = 0
+    for _ in range(300):
+        num_vars = rng.randint(4, 12)
+        clauses = random_clauses(rng, num_vars)
+        preprocessor = Preprocessor(formula_of(clauses, num_vars))
+        model = SAT_solver(preprocessor.simplify()).solve(useVSIDS=True)
+        eliminated += preprocessor.eliminated_cnt
+        assert (model is not None) == is_sat(clauses, num_vars)
+        if (model is not None):
+            assert satisfies(preprocessor.extend_model(model), clauses)
+    assert eliminated > 0
@@ -0,0 +1,39 @@
+from typing import *
+from SAT_structs import *
+
+# Formula of clauses given as signed variable numbers
+def formula_of(clauses: List[List[int]]) -> CNF_Formula:
+    return CNF_Formula([CNF_Clause([CNF_Literal(abs(lit), lit > 0) for lit in clause]) for clause in clauses],
+                       max(abs(lit) for clause in clauses for lit in clause))
+
+# Literal code of a signed variable number
+def code(lit: int) -> int:
+    return 2 * abs(lit) + (lit > 0)
+
+def test_propagate_implies_through_binary_and_long_clauses():
+    prop = CNF_Propagator(formula_of([[-1, 2], [-2, 3], [-1, -3, 4], [5, 6, 7]]))
+    prop.assign(code(1))
+    assert prop.propagate() is None
+    assert sorted(prop.trail) == sorted(code(lit) for lit in [1, 2, 3, 4])
+    assert prop.qhead == len(prop.trail)
+
+# After a conflict the queue is empty, whichever kind of clause it was found in
+def test_propagate_stops_at_binary_conflict():
+    prop = CNF_Propagator(formula_of([[-1, 2], [-1, -2], [2, 3, 4]]))
+    prop.assign(code(1))
+    assert prop.propagate() is not None
+    assert prop.qhead == len(prop.trail)
+
+def test_propagate_stops_at_long_clause_conflict():
+    prop = CNF_Propagator(formula_of([[-1, 2], [-1, 3], [-1, -2, -3], [4, 5, 6]]))
+    prop.assign(code(1))
+    assert prop.propagate() is not None
+    assert prop.qhead == len(prop.trail)
+
+def test_propagate_keeps_clause_with_true_literal_satisfied():
+    prop = CNF_Propagator(formula_of([[1, 2, 3], [-3, 4]]))
+    prop.assign(code(3))
+    prop.assign(code(-1))
+    assert prop.propagate() is None
+    assert code(2) not in prop.trail and code(-2) not in prop.trail
+    assert code(4) in prop.trail
@@ -0,0 +1,46 @@
+from typing import *
+import asyncio
+import json
+import pytest
+from server import SolverService
+
+# Collects what the server writes to a connection
+class FakeWriter:
+
+    def __init__(self):
+        self.lines: List[Dict[str, Any]] = []
+
+    def is_closing(self) -> bool:
+        return False
+
+    def write(self, data: bytes):
+        self.lines.append(json.loads(data))
+
+    async def drain(self):
+        pass
+
+def make_request(message: Dict[str, Any]) -> Tuple[Any, List[Dict[str, Any]]]:
+    service = SolverService(workers=1)
+    writer = FakeWriter()
+    request = asyncio.run(service.make_request(message, writer))
+    service.threads.shutdown()
+    return (request, writer.lines)
+
+# Options that name files on the server, or print to its output, can only be set when the server is started
+@pytest.mark.parametrize("option, value", [("proof", "/tmp/proof.drat"), ("cache", "/tmp/cache"), ("checkpoint", "/tmp/solver.ckp"),
+                                           ("debug", True), ("progress", 1)])
+def test_request_cant_set_server_options(option: str, value: Any):
+    request, replies = make_request({"id": 7, "dimacs": "p cnf 1 1\n1 0\n", "options": {option: value}})
+    assert request is None
+    assert len(replies) == 1
+    assert replies[0]["id"] == 7
+    assert replies[0]["status"] == "ERROR"
+    assert option in replies[0]["error"]
+
+def test_request_sets_search_options():
+    request, replies = make_request({"id": 8, "dimacs": "p cnf 1 1\n1 0\n", "options": {"vsids": False, "seed": 3, "conflict_budget": 100}})
+    assert replies == []
+    assert request.options["vsids"] is False
+    assert request.options["seed"] == 3
+    assert request.options["conflict_budget"] == 100
+    assert request.options["proof"] is None
@@ -0,0 +1,36 @@
+from typing import *
+import itertools
+import os
+import random
+import pytest
+from SAT_structs import *
+from SAT_solver import SAT_solver
+
+def formula_of(clauses: List[List[int]], num_vars: int) -> CNF_Formula:
+    return CNF_Formula([CNF_Clause([CNF_Literal(abs(lit), lit > 0) for lit in clause]) for clause in clauses], num_vars)
+
+def is_sat(clauses: List[List[int]], num_vars: int) -> bool:
+    for bits in itertools.product((False, True), repeat=num_vars):
+        if (all(any(bits[abs(lit) - 1] == (lit > 0) for lit in clause) for clause in clauses)):
+            return True
+    return False
+
+# Random 3-SAT near the threshold, so about half of the formulas are UNSAT and conflicts, learning and backjumping all happen
+def random_formulas(seed: int, count: int) -> Iterator[Tuple[List[List[int]], int]]:
+    rng = random.Random(seed)
+    for _ in range(count):
+        num_vars = rng.randint(5, 12)
+        clauses = [[rng.choice([-1, 1]) * var_idx for var_idx in rng.sample(range(1, num_vars + 1), 3)]
+                   for _ in range(round(4.3 * num_vars))]
+        yield (clauses, num_vars)
+
+@pytest.mark.parametrize("use_vsids", [False, True])
+def test_solve_agrees_with_brute_force(use_vsids: bool):
+    for clauses, num_vars in random_formulas(1, 150):
+        model = SAT_solver(formula_of(clauses, num_vars)).solve(useVSIDS=use_vsids)
+        assert (model is not None) == is_sat(clauses, num_vars)
+        if (model is not None):
+            assert all(any(model[abs(lit)] == (lit > 0) for lit in clause) for clause in clauses)
+
+def test_pigeonhole_is_unsat():
+    assert SAT_solver(CNF_Formula.from_dimacs_file(os.path.join(os.path.dirname(__file__), "cnf_bench", "hole6.cnf"))).solve(useVSIDS=True) is None